@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Асинхронная загрузка конфигураций для asyncio-сервисов (вариант 16)
+Чтение файла и разбор не блокируют цикл событий, одинаковые запросы делят один разбор
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from parser import ConfigParser
+
+# Число одновременных разборов по умолчанию
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _read(path):
+    """Читаем файл целиком как байты (выполняется в потоке ввода-вывода)"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _parse(data, path):
+    """Разбор байтов в исполнителе; функция модуля, чтобы подходил и пул процессов
+
+    path нужен для (include ...): включения читаются тут же, в исполнителе.
+    """
+    return ConfigParser().parse(data, path)
+
+
+class AsyncConfigLoader:
+    """Загрузчик конфигураций для asyncio
+
+    Файл читается в исполнителе ввода-вывода цикла, разбор идёт в
+    ограниченном исполнителе (по умолчанию ThreadPoolExecutor на
+    max_workers потоков; можно передать ProcessPoolExecutor). Запросы
+    одного и того же файла, пришедшие одновременно, ждут один общий разбор;
+    отмена или таймаут одного ожидающего не отменяют его для остальных.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, executor=None):
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers,
+                                                        thread_name_prefix='config-parse')
+        self._inflight = {}
+        self.parses = 0
+
+    async def load(self, path, timeout=None):
+        """Результат разбора файла; timeout - секунды ожидания или None"""
+        key = os.path.abspath(path)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(path))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # shield: отмена одного ожидающего не прерывает общий разбор
+        if timeout is None:
+            return await asyncio.shield(task)
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    async def load_many(self, paths, timeout=None, return_exceptions=False):
+        """Результаты для всех путей в том же порядке
+
+        timeout ограничивает всю загрузку. С return_exceptions=True ошибки
+        отдельных файлов возвращаются на их местах вместо исключения.
+        """
+        gathered = asyncio.gather(*(self.load(path) for path in paths),
+                                  return_exceptions=return_exceptions)
+        if timeout is None:
+            return await gathered
+        return await asyncio.wait_for(gathered, timeout)
+
+    def close(self):
+        """Останавливаем собственный исполнитель"""
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def _load(self, path):
+        """Чтение и разбор одного файла"""
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, _read, path)
+        self.parses += 1
+        return await loop.run_in_executor(self._executor, _parse, data, path)
+
+    def _forget(self, key, task):
+        """Убираем завершённый разбор из общих"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Исключение забрали ожидающие; помечаем его полученным
+            task.exception()
+
+
+_default_loader = None
+
+
+def _loader():
+    """Общий загрузчик модуля, создаётся при первом обращении"""
+    global _default_loader
+    if _default_loader is None:
+        _default_loader = AsyncConfigLoader()
+    return _default_loader
+
+
+async def load_config(path, timeout=None):
+    """Разбираем файл, не блокируя цикл событий"""
+    return await _loader().load(path, timeout=timeout)
+
+
+async def load_many(paths, timeout=None, return_exceptions=False):
+    """Разбираем несколько файлов одновременно, результаты в порядке путей"""
+    return await _loader().load_many(paths, timeout=timeout, return_exceptions=return_exceptions)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Пакетное преобразование конфигураций в JSON (вариант 16)
+Файлы раздаются процессам пачками, ошибка в одном файле не останавливает остальные
+"""
+
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from parser import ConfigParser
+
+# Расширение конфигураций при обходе каталогов
+CONF_SUFFIX = '.conf'
+
+# Верхняя граница размера пачки: иначе пачки перестают выравнивать нагрузку
+MAX_CHUNK = 64
+
+
+def has_magic(pattern):
+    """Есть ли в пути символы шаблона glob"""
+    return any(ch in pattern for ch in '*?[')
+
+
+def expand_inputs(inputs, stdin=None):
+    """Список (файл, имя результата) по путям, шаблонам, каталогам и '-'
+
+    '-' - список путей в stdin по одному на строку. Файлы из каталога
+    обходятся рекурсивно, имя результата повторяет путь внутри каталога.
+    Повторы отбрасываются.
+    """
+    tasks = []
+    seen = set()
+
+    def add(path, name):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            tasks.append((path, name))
+
+    for item in inputs:
+        if item == '-':
+            lines = (stdin if stdin is not None else sys.stdin).read().splitlines()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    add(line, os.path.basename(line))
+        elif os.path.isdir(item):
+            for folder, dirs, names in os.walk(item):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith(CONF_SUFFIX):
+                        path = os.path.join(folder, name)
+                        add(path, os.path.relpath(path, item))
+        elif has_magic(item):
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path):
+                    add(path, os.path.basename(path))
+        else:
+            add(item, os.path.basename(item))
+    return tasks
+
+
+def output_path(output_dir, name):
+    """Путь JSON-файла результата: расширение .conf заменяется на .json"""
+    root, ext = os.path.splitext(name)
+    if ext != CONF_SUFFIX:
+        root = name
+    return os.path.join(output_dir, root + '.json')
+
+
+def _convert_chunk(chunk, output_dir, indent):
+    """Разбираем пачку файлов в процессе-исполнителе
+
+    Возвращает по записи на файл: (путь, строка NDJSON или None, ошибка или None, размер).
+    С output_dir результат пишется в файл прямо здесь, в основной процесс
+    уходят только короткие записи.
+    """
+    parser = ConfigParser()
+    done = []
+    for path, name in chunk:
+        try:
+            size = os.path.getsize(path)
+            result = parser.parse_file(path)
+            if output_dir is not None:
+                target = output_path(output_dir, name)
+                os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+                with open(target, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=indent, ensure_ascii=False)
+                    f.write('\n')
+                line = None
+            else:
+                line = json.dumps({'path': path, 'result': result}, ensure_ascii=False)
+            done.append((path, line, None, size))
+        except SyntaxError as e:
+            done.append((path, None, f"Синтаксическая ошибка: {e}", 0))
+        except (OSError, UnicodeDecodeError) as e:
+            done.append((path, None, f"Ошибка чтения файла: {e}", 0))
+        except Exception as e:
+            done.append((path, None, f"Ошибка при обработке: {e}", 0))
+    return done
+
+
+def chunk_size(count, jobs):
+    """Размер пачки: примерно четыре пачки на исполнитель, не больше MAX_CHUNK"""
+    return max(1, min(MAX_CHUNK, count // (jobs * 4) or 1))
+
+
+def convert_many(tasks, jobs=None, output_dir=None, indent=2, chunk=None, out=None, err=None):
+    """Преобразуем файлы в JSON, раздавая их пачками ProcessPoolExecutor
+
+    Без output_dir результаты идут в out строками NDJSON ({"path", "result"}).
+    Ошибки по файлам пишутся в err и не прерывают обработку. Возвращает
+    сводку: число файлов, ошибок, байт и затраченное время.
+    """
+    out = out if out is not None else sys.stdout
+    err = err if err is not None else sys.stderr
+    jobs = jobs or os.cpu_count() or 1
+    chunk = chunk or chunk_size(len(tasks), jobs)
+    chunks = [tasks[i:i + chunk] for i in range(0, len(tasks), chunk)]
+
+    summary = {'files': len(tasks), 'failed': 0, 'bytes': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+
+    def report(done):
+        for path, line, error, size in done:
+            if error is not None:
+                summary['failed'] += 1
+                print(f"{path}: {error}", file=err)
+                continue
+            summary['bytes'] += size
+            if line is not None:
+                out.write(line + '\n')
+
+    if jobs == 1 or len(chunks) <= 1:
+        for part in chunks:
+            report(_convert_chunk(part, output_dir, indent))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_convert_chunk, part, output_dir, indent) for part in chunks]
+            for future in futures:
+                report(future.result())
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def format_summary(summary):
+    """Строка сводки с пропускной способностью"""
+    seconds = summary['seconds'] or 1e-9
+    ok = summary['files'] - summary['failed']
+    return (f"Файлов: {summary['files']}, успешно: {ok}, с ошибками: {summary['failed']}; "
+            f"{seconds:.2f} с, {summary['files'] / seconds:.0f} файлов/с, "
+            f"{summary['bytes'] / 1e6 / seconds:.2f} МБ/с")
@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк парсера конфигураций (вариант 16)
+Сравнивает исходную многопроходную реализацию с однопроходным лексером
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lexer import tokenize
+from parser import ConfigParser, _ParseState
+from cli import format_json
+from legacy_parser import LegacyConfigParser
+from incremental import IncrementalParser
+from compact import Freezer
+from lazy import parse_lazy
+from compiled import compile_file, load_compiled
+from json_output import write_json, write_events
+from schema import Schema, Section, MapOf, Field
+from columnar import parse_columnar
+
+
+def generate_config(sections=1000, keys=10, constants=50):
+    """Генерируем большой конфиг с комментариями, константами и вложенностью"""
+    parts = ['--[[\nСгенерированный конфиг для бенчмарка\n]]\n']
+    for c in range(constants):
+        if c % 2:
+            parts.append(f'(define const_{c} @"value {c}")\n')
+        else:
+            parts.append(f'(define const_{c} {c}.5)\n')
+
+    parts.append('{\n')
+    for s in range(sections):
+        parts.append(f'    C секция {s}\n    section_{s} => {{\n')
+        for k in range(keys):
+            if k % 4 == 0:
+                value = f'@"string value {s}_{k}"'
+            elif k % 4 == 1 and constants:
+                value = f'$const_{(s + k) % constants}$'
+            elif k % 4 == 2:
+                value = 'true' if (s + k) % 2 else 'false'
+            else:
+                value = f'{-s}.{k}5'
+            parts.append(f'        key_{k} => {value},\n')
+        parts.append(f'        nested => {{ inner => {{ depth => {s}.0 }} }}\n')
+        parts.append('    },\n')
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+def generate_synthetic(keys=10000, width=8, depth=3, string_length=16, comment_density=0.1,
+                       constants=20, refs=0.1, seed=0):
+    """Синтетический конфиг с настраиваемыми параметрами
+
+    keys - всего простых пар; width - простых пар в одном словаре; depth -
+    глубина вложенности секций; string_length - длина строк @"..."; 
+    comment_density - доля пар с комментарием перед ними (C и --[[ ]] по
+    очереди); constants - число define; refs - доля значений $имя$.
+    Один и тот же seed даёт один и тот же текст.
+    """
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz '
+    parts = []
+    for c in range(constants):
+        if c % 2:
+            parts.append(f'(define const_{c} @"{"v" * string_length}")\n')
+        else:
+            parts.append(f'(define const_{c} {c}.5)\n')
+
+    comments = 0
+    written = 0
+    section = 0
+    parts.append('{\n')
+    while written < keys:
+        # Секция - цепочка из depth словарей, в каждом до width простых пар
+        parts.append(f'    section_{section} => {{\n')
+        for level in range(depth):
+            indent = '    ' * (level + 2)
+            if level:
+                parts.append(f'{indent[4:]}level_{level} => {{\n')
+            for k in range(width):
+                if written >= keys:
+                    break
+                if rng.random() < comment_density:
+                    comments += 1
+                    if comments % 2:
+                        parts.append(f'{indent}C комментарий {written}\n')
+                    else:
+                        parts.append(f'{indent}--[[ комментарий\n{indent}{written} ]]\n')
+                roll = rng.random()
+                if constants and roll < refs:
+                    value = f'$const_{rng.randrange(constants)}$'
+                elif k % 3 == 0:
+                    value = '@"' + ''.join(rng.choice(letters) for _ in range(string_length)) + '"'
+                elif k % 3 == 1:
+                    value = f'{rng.randint(-999, 999)}.{rng.randint(0, 99)}'
+                else:
+                    value = 'true' if roll < 0.5 else 'false'
+                parts.append(f'{indent}key_{k} => {value},\n')
+                written += 1
+        for level in reversed(range(depth)):
+            parts.append('    ' * (level + 1) + '},\n')
+        section += 1
+    parts.append('}\n')
+    return ''.join(parts)
+
+
+def generate_nested(depth, total_keys=20000):
+    """Конфиг фиксированного размера с заданной глубиной вложенности"""
+    per_level = max(1, total_keys // depth)
+    parts = ['{\n']
+    for level in range(depth):
+        for k in range(per_level):
+            parts.append(f'    key_{k} => {level}.{k}5,\n')
+        if level < depth - 1:
+            parts.append(f'    level_{level} => {{\n')
+    parts.append('}\n' * depth)
+    return ''.join(parts)
+
+
+def measure(func, text, repeat):
+    """Лучшее время из нескольких запусков"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_parse(args):
+    """Старый и новый путь на одном и том же тексте"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    size_mb = len(text.encode('utf-8')) / 1e6
+    print(f"Размер конфига: {size_mb:.2f} МБ")
+
+    legacy = LegacyConfigParser()
+    current = ConfigParser()
+    if legacy.parse(text) != current.parse(text):
+        raise SystemExit("Результаты старого и нового парсера различаются")
+
+    old_time = measure(legacy.parse, text, args.repeat)
+    new_time = measure(current.parse, text, args.repeat)
+    print(f"Старый парсер: {old_time:.3f} с ({size_mb / old_time:.2f} МБ/с)")
+    print(f"Новый парсер:  {new_time:.3f} с ({size_mb / new_time:.2f} МБ/с)")
+    print(f"Ускорение: x{old_time / new_time:.1f}")
+
+
+def bench_depth(args):
+    """Время разбора при росте глубины: у нового парсера оно не должно расти"""
+    print(f"{'глубина':>8} {'размер, КБ':>11} {'старый, с':>10} {'новый, с':>9}")
+    legacy = LegacyConfigParser()
+    current = ConfigParser()
+    depth = 1
+    while depth <= args.max_depth:
+        text = generate_nested(depth, args.total_keys)
+        new_time = measure(current.parse, text, args.repeat)
+        try:
+            old_time = f"{measure(legacy.parse, text, args.repeat):.3f}"
+        except RecursionError:
+            old_time = "переполн."
+        print(f"{depth:>8} {len(text) / 1024:>11.0f} {old_time:>10} {new_time:>9.3f}")
+        depth *= 2
+
+
+def peak_memory(func):
+    """Пиковый объём выделенной Python памяти при вызове func"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(args):
+    """Пик памяти: чтение целиком, блоками и через mmap"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    with tempfile.NamedTemporaryFile('w', suffix='.conf', encoding='utf-8', delete=False) as f:
+        f.write(text)
+        path = f.name
+    del text
+
+    def read_text():
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    paths = [
+        ("старый парсер, f.read()", lambda: LegacyConfigParser().parse(read_text())),
+        ("новый парсер, f.read()", lambda: ConfigParser().parse(read_text())),
+        ("parse_file блоками", lambda: ConfigParser().parse_file(path)),
+        ("parse_file через mmap", lambda: ConfigParser().parse_file(path, use_mmap=True)),
+    ]
+    try:
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Размер файла: {size_mb:.2f} МБ (в пик входит и сам результат разбора)")
+        for name, func in paths:
+            peak = peak_memory(func) / 1e6
+            print(f"{name:<26} пик {peak:8.2f} МБ  (x{peak / size_mb:.1f} от файла)")
+    finally:
+        os.unlink(path)
+
+
+def bench_incremental(args):
+    """Правка одного значения: полный разбор против IncrementalParser.update"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    print(f"Строк: {text.count(chr(10))}, размер: {len(text.encode('utf-8')) / 1e6:.2f} МБ")
+
+    inc = IncrementalParser()
+    full_time = measure(inc.parse, text, args.repeat)
+    value = text.index('key_3 => ', len(text) // 2) + len('key_3 => ')
+    const = text.index('(define const_2 ') + len('(define const_2 ')
+
+    def edits(pos, count):
+        """Лучшее время update из count правок одной цифры"""
+        best = None
+        for i in range(count):
+            start = time.perf_counter()
+            inc.update(edit=(pos, pos + 1, str(i % 10)))
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    value_time = edits(value, args.repeat * 10)
+    const_time = edits(const, args.repeat * 10)
+    copy_time = measure(lambda t: t[:value] + '1' + t[value + 1:], text, args.repeat)
+    print(f"Полный разбор:         {full_time * 1000:9.3f} мс")
+    print(f"Правка значения:       {value_time * 1000:9.3f} мс")
+    print(f"Правка define:         {const_time * 1000:9.3f} мс")
+    print(f"  из них копия текста: {copy_time * 1000:9.3f} мс")
+    print(f"Полных разборов при правках: {inc.full_parses - args.repeat}")
+
+
+def bench_compact(args):
+    """Память результата: вложенные dict против FrozenNode
+
+    Без --sections конфиг - около COMPACT_KEYS ключей.
+    """
+    sections = args.sections
+    if sections is None:
+        per_section = generate_config(sections=1, keys=args.keys).count('=>')
+        sections = -(-COMPACT_KEYS // per_section)
+    text = generate_config(sections=sections, keys=args.keys)
+    print(f"Ключей: {text.count('=>')}, размер: {len(text.encode('utf-8')) / 1e6:.2f} МБ")
+
+    tracemalloc.start()
+    try:
+        tree = ConfigParser().parse(text)
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        freezer = Freezer()
+        frozen = freezer.freeze(tree)
+        freeze_time = time.perf_counter() - start
+        del tree, freezer
+        frozen_bytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    print(f"dict:       {dict_bytes / 1e6:8.2f} МБ")
+    print(f"FrozenNode: {frozen_bytes / 1e6:8.2f} МБ (x{dict_bytes / frozen_bytes:.1f} меньше), "
+          f"перевод {freeze_time:.2f} с")
+    return frozen
+
+
+def bench_lazy(args):
+    """Одно значение из большого конфига: полный разбор против ленивого"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    print(f"Строк: {text.count(chr(10))}, размер: {len(text.encode('utf-8')) / 1e6:.2f} МБ")
+    path = f'section_{args.sections // 2}.key_3'
+
+    full_time = measure(lambda t: ConfigParser().parse(t), text, args.repeat)
+    lazy_time = measure(lambda t: parse_lazy(t).get(path), text, args.repeat)
+    all_time = measure(lambda t: parse_lazy(t).to_dict(), text, args.repeat)
+    print(f"Полный разбор:               {full_time * 1000:9.3f} мс")
+    print(f"Ленивый разбор + get():      {lazy_time * 1000:9.3f} мс (x{full_time / lazy_time:.1f})")
+    print(f"Ленивый разбор + to_dict():  {all_time * 1000:9.3f} мс")
+
+
+def bench_compiled(args):
+    """Запуск сервиса: разбор исходника против загрузки скомпилированного файла"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, 'bench.conf')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(text)
+        start = time.perf_counter()
+        target = compile_file(source)
+        compile_time = time.perf_counter() - start
+        path = f'section_{args.sections // 2}.key_3'
+
+        def load(p):
+            with load_compiled(p) as config:
+                return config.get(path)
+
+        parse_time = measure(lambda p: ConfigParser().parse_file(p), source, args.repeat)
+        load_time = measure(load, source, args.repeat * 10)
+        print(f"Исходник: {os.path.getsize(source) / 1e6:.2f} МБ, скомпилированный: "
+              f"{os.path.getsize(target) / 1e6:.2f} МБ, компиляция {compile_time:.2f} с")
+        print(f"Разбор исходника:              {parse_time * 1e6:12.0f} мкс")
+        print(f"load_compiled + get():         {load_time * 1e6:12.0f} мкс (x{parse_time / load_time:.0f})")
+
+
+class _NullWriter:
+    """Приёмник вывода, который ничего не хранит"""
+
+    def write(self, text):
+        return len(text)
+
+
+def bench_json(args):
+    """JSON-вывод: json.dumps против потокового writer и вывода из событий"""
+    text = generate_config(sections=args.sections, keys=args.keys)
+    result = ConfigParser().parse(text)
+    out = _NullWriter()
+    rows = [
+        ('json.dumps, indent=2', lambda r: out.write(json.dumps(r, indent=2, ensure_ascii=False))),
+        ('write_json, indent=2', lambda r: write_json(r, out)),
+        ('json.dumps, компактный', lambda r: out.write(json.dumps(r, ensure_ascii=False, separators=(',', ':')))),
+        ('write_json, компактный', lambda r: write_json(r, out, None)),
+    ]
+    print(f"Конфиг: {len(text) / 1e6:.2f} МБ")
+    base = None
+    for title, func in rows:
+        elapsed = measure(func, result, args.repeat)
+        base = base or elapsed
+        print(f"{title:<28} {elapsed * 1000:10.1f} мс (x{base / elapsed:.2f})")
+
+    parse_dump = measure(lambda t: out.write(json.dumps(ConfigParser().parse(t), indent=2, ensure_ascii=False)),
+                         text, args.repeat)
+    streamed = measure(lambda t: write_events(ConfigParser().iterparse([t], depth=sys.maxsize), out),
+                       text, args.repeat)
+    print(f"{'разбор + json.dumps':<28} {parse_dump * 1000:10.1f} мс")
+    print(f"{'iterparse + write_events':<28} {streamed * 1000:10.1f} мс")
+
+
+def bench_errors(args):
+    """Место ошибки: на верном тексте не стоит ничего, на ошибке - поиск строки
+
+    Верный текст разбирается с остановкой на первой ошибке и со сбором
+    всех; текст с ошибками в каждой секции - сколько стоит найти строку и
+    столбец всех ошибок.
+    """
+    text = generate_config(sections=args.sections, keys=args.keys)
+    lines = text.count('\n')
+    first = measure(ConfigParser().parse, text, args.repeat)
+    collect = measure(ConfigParser(max_errors=None).parse, text, args.repeat)
+    print(f"Конфиг: {len(text) / 1e6:.2f} МБ, {lines} строк")
+    print(f"{'верный, max_errors=1':<32} {first * 1000:10.1f} мс")
+    print(f"{'верный, max_errors=None':<32} {collect * 1000:10.1f} мс (x{first / collect:.2f})")
+
+    def fail(source, max_errors):
+        try:
+            ConfigParser(max_errors=max_errors).parse(source)
+        except SyntaxError as e:
+            return e
+        raise SystemExit("Ожидалась ошибка разбора")
+
+    last = text.rstrip()[:-1] + ' broken => }\n}\n'
+    error = fail(last, 1)
+    elapsed = measure(lambda t: fail(t, 1), last, args.repeat)
+    print(f"{'ошибка в последней строке':<32} {elapsed * 1000:10.1f} мс (строка {error.lineno})")
+
+    broken = text.replace('key_3 => ', 'key_3 ')
+    error = fail(broken, None)
+    elapsed = measure(lambda t: fail(t, None), broken, args.repeat)
+    print(f"{'ошибки во всех секциях':<32} {elapsed * 1000:10.1f} мс (ошибок: {len(error.errors)})")
+
+
+def bench_schema(args):
+    """Схема: разбор с проверкой на ходу против разбора и проверки готового словаря
+
+    Полная схема проверяет все ключи секций, кроме ссылок на константы
+    разных типов; узкая описывает один ключ, остальные пропускаются и
+    словари под ними не строятся.
+    """
+    text = generate_config(sections=args.sections, keys=args.keys)
+    kinds = {0: str, 2: bool, 3: float}
+    fields = {f'key_{k}': kinds[k % 4] for k in range(args.keys) if k % 4 in kinds}
+    full = Schema(MapOf(Section(dict(fields, nested=Field(dict)), unknown='skip', name='Section')))
+    narrow = Schema(MapOf(Section({'key_0': str}, unknown='skip', name='Section')))
+    parser = ConfigParser()
+    plain = measure(parser.parse, text, args.repeat)
+    decode = measure(lambda t: full.decode(parser.parse(t)), text, args.repeat)
+    fused = measure(full.parse, text, args.repeat)
+    skipped = measure(narrow.parse, text, args.repeat)
+    print(f"Конфиг: {len(text) / 1e6:.2f} МБ, секций: {args.sections}")
+    print(f"{'parse (без схемы)':<32} {plain * 1000:10.1f} мс")
+    print(f"{'parse + Schema.decode':<32} {decode * 1000:10.1f} мс (x{plain / decode:.2f})")
+    print(f"{'Schema.parse':<32} {fused * 1000:10.1f} мс (x{plain / fused:.2f})")
+    print(f"{'Schema.parse, один ключ':<32} {skipped * 1000:10.1f} мс (x{plain / skipped:.2f})")
+
+
+def bench_threads(args):
+    """parse_many: один экземпляр в пуле потоков против разбора подряд
+
+    С GIL ускорения нет, замер показывает цену пула; на сборке без GIL
+    тексты разбираются параллельно.
+    """
+    count = os.cpu_count() or 1
+    texts = [generate_config(sections=max(1, args.sections // 16), keys=args.keys) for _ in range(count * 4)]
+    parser = ConfigParser()
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    serial = measure(lambda t: [ConfigParser().parse(text) for text in t], texts, args.repeat)
+    shared = measure(lambda t: parser.parse_many(t, jobs=1), texts, args.repeat)
+    pooled = measure(lambda t: parser.parse_many(t, jobs=count), texts, args.repeat)
+    print(f"Текстов: {len(texts)} по {len(texts[0]) / 1e3:.0f} КБ, потоков: {count}, GIL: {'да' if gil else 'нет'}")
+    print(f"{'новый ConfigParser на текст':<32} {serial * 1000:10.1f} мс")
+    print(f"{'parse_many, jobs=1':<32} {shared * 1000:10.1f} мс (x{serial / shared:.2f})")
+    print(f"{f'parse_many, jobs={count}':<32} {pooled * 1000:10.1f} мс (x{serial / pooled:.2f})")
+
+
+def bench_startup(args):
+    """Холодный запуск CLI против запроса к тёплому процессу cli.py --serve
+
+    Холодный запуск - лучшее время из повторов на процесс целиком (python
+    без импортов - для сравнения); для --serve - задержка одного запроса
+    через каналы stdin/stdout, медиана и 99-й процентиль.
+    """
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cli = os.path.join(here, 'cli.py')
+    text = generate_config(sections=max(1, args.sections // 100), keys=args.keys)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.conf')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+        def cold(command):
+            best = None
+            for _ in range(max(args.repeat, 10)):
+                start = time.perf_counter()
+                subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+            return best
+
+        bare = cold([sys.executable, '-c', 'pass'])
+        imported = cold([sys.executable, '-c', f'import sys; sys.path.insert(0, {here!r}); import cli'])
+        single = cold([sys.executable, cli, '--input', path])
+        print(f"Конфиг: {len(text) / 1e3:.0f} КБ")
+        print(f"{'python -c pass':<32} {bare * 1000:10.1f} мс")
+        print(f"{'import cli':<32} {imported * 1000:10.1f} мс")
+        print(f"{'cli.py --input':<32} {single * 1000:10.1f} мс")
+
+        requests = [('путь (кэш загрузчика)', path + '\n'),
+                    ('текст в запросе', json.dumps({'text': text}) + '\n')]
+        with subprocess.Popen([sys.executable, cli, '--serve'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              text=True, encoding='utf-8') as process:
+            for name, line in requests:
+                latencies = []
+                for _ in range(max(args.repeat, 10) * 10):
+                    start = time.perf_counter()
+                    process.stdin.write(line)
+                    process.stdin.flush()
+                    answer = process.stdout.readline()
+                    latencies.append(time.perf_counter() - start)
+                if not answer.startswith('{"result"'):
+                    raise SystemExit(f"Ошибка сервера: {answer.strip()}")
+                latencies.sort()
+                median = latencies[len(latencies) // 2]
+                tail = latencies[int(len(latencies) * 0.99)]
+                print(f"{'--serve, ' + name:<32} {median * 1000:10.2f} мс (p99 {tail * 1000:.2f} мс, "
+                      f"x{single / median:.0f} к холодному запуску)")
+            process.stdin.close()
+
+
+def generate_entities(count=20000, fields=('health', 'damage', 'speed')):
+    """Конфиг игры: count однородных секций врагов с числовыми полями"""
+    parts = ['(define base_speed 2.5)\n{\n    game => { title => @"bench", version => 1.0 },\n    enemies => {\n']
+    for i in range(count):
+        values = ', '.join(f'{field} => $base_speed$' if field == 'speed' and i % 10 == 0
+                           else f'{field} => {i % 500}.{j}' for j, field in enumerate(fields))
+        parts.append(f'        enemy_{i} => {{ {values} }},\n')
+    parts.append('    }\n}\n')
+    return ''.join(parts)
+
+
+def bench_columnar(args):
+    """Однородные секции: разбор в словари и сбор столбцов против разбора сразу в столбцы"""
+    from array import array
+
+    text = generate_entities(count=args.sections * 10)
+
+    def via_dicts(source):
+        enemies = ConfigParser().parse(source)['enemies']
+        names = list(enemies)
+        columns = {field: array('d', (entry[field] for entry in enemies.values()))
+                   for field in ('health', 'damage', 'speed')}
+        return names, columns
+
+    dicts = measure(via_dicts, text, args.repeat)
+    direct = measure(parse_columnar, text, args.repeat)
+
+    def peak(func):
+        tracemalloc.start()
+        result = func(text)
+        size = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return size
+
+    kept_dicts, peak_dicts = peak(lambda t: ConfigParser().parse(t))
+    kept_direct, peak_direct = peak(parse_columnar)
+    print(f"Конфиг: {len(text) / 1e6:.2f} МБ, секций: {args.sections * 10}")
+    print(f"{'parse + столбцы из словарей':<32} {dicts * 1000:10.1f} мс, "
+          f"результат {kept_dicts / 1e6:.1f} МБ, пик {peak_dicts / 1e6:.1f} МБ")
+    print(f"{'parse_columnar':<32} {direct * 1000:10.1f} мс (x{dicts / direct:.2f}), "
+          f"результат {kept_direct / 1e6:.1f} МБ, пик {peak_direct / 1e6:.1f} МБ")
+
+
+def bench_micro(args):
+    """Лексер и разбор на входах с длинными ключами, числами и define"""
+    count = args.sections * args.keys
+    inputs = [
+        ('ключи', '{\n' + ''.join(f'    long_identifier_name_{i} => true,\n' for i in range(count)) + '}\n'),
+        ('числа', '{\n' + ''.join(f'    n{i} => {-i}.{i:06d},\n' for i in range(count)) + '}\n'),
+        ('define', ''.join(f'(define c_{i} {i}.5)\n' for i in range(count)) + '{ x => $c_0$ }\n'),
+    ]
+    print(f"Пар во входе: {count}")
+    for name, text in inputs:
+        legacy_time = measure(LegacyConfigParser().parse, text, args.repeat)
+        lexer_time = measure(lambda t: _drain(tokenize(t)), text, args.repeat)
+        new_time = measure(ConfigParser().parse, text, args.repeat)
+        print(f"{name:<7} старый парсер {legacy_time * 1e9 / count:7.0f} нс/пару, "
+              f"лексер {lexer_time * 1e9 / count:7.0f} нс/пару, "
+              f"ConfigParser {new_time * 1e9 / count:7.0f} нс/пару")
+
+
+# Наборы параметров набора замеров: (имя, параметры generate_synthetic)
+SUITE_CASES = [
+    ('wide', dict(keys=20000, width=50, depth=1)),
+    ('nested', dict(keys=20000, width=4, depth=16)),
+    ('strings', dict(keys=10000, string_length=256)),
+    ('comments', dict(keys=20000, comment_density=0.8)),
+    ('constants', dict(keys=20000, constants=500, refs=0.6)),
+]
+
+# Допустимое замедление относительно эталона, доля
+REGRESSION_THRESHOLD = 0.15
+
+# Число секций по умолчанию; compact по умолчанию строит конфиг на COMPACT_KEYS ключей
+DEFAULT_SECTIONS = 2000
+COMPACT_KEYS = 1_000_000
+
+
+def _drain(tokens):
+    """Прогоняем лексер без разбора"""
+    for _ in tokens:
+        pass
+
+
+def _consume(tokens):
+    """Автомат разбора и подстановка констант на готовом списке токенов"""
+    state = _ParseState()
+    state.consume(iter(tokens))
+    state.resolve_refs()
+    return state.result
+
+
+def suite_stages(text, repeat, legacy=True):
+    """Лучшее время каждого этапа (секунды) на одном тексте
+
+    Для исходного парсера замеряются его проходы по отдельности, для
+    текущего - лексер, автомат разбора, весь разбор и JSON-вывод CLI.
+    """
+    current = ConfigParser()
+    result = current.parse(text)
+    stages = {}
+    if legacy:
+        old = LegacyConfigParser()
+        if old.parse(text) != result:
+            raise SystemExit("Результаты старого и нового парсера различаются")
+        stripped = old._remove_comments_safe(text)
+        stripped = re.sub(r'\(define[^)]+\)', '', stripped)
+        stages['legacy.extract_constants'] = measure(old._extract_constants, text, repeat)
+        stages['legacy.remove_comments_safe'] = measure(old._remove_comments_safe, text, repeat)
+        stages['legacy.parse_dict'] = measure(old._parse_main_dict, stripped, repeat)
+        stages['legacy.parse'] = measure(old.parse, text, repeat)
+    tokens = list(tokenize(text))
+    stages['tokenize'] = measure(lambda t: _drain(tokenize(t)), text, repeat)
+    stages['consume'] = measure(_consume, tokens, repeat)
+    stages['parse'] = measure(current.parse, text, repeat)
+    stages['json'] = measure(format_json, result, repeat)
+    return stages
+
+
+def run_suite(repeat=3, scale=1.0, legacy=True, cases=None):
+    """Замеры по всем наборам SUITE_CASES; словарь для сохранения в JSON"""
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'scale': scale,
+        'cases': {},
+    }
+    for name, params in SUITE_CASES:
+        if cases and name not in cases:
+            continue
+        params = dict(params)
+        params['keys'] = max(1, int(params['keys'] * scale))
+        text = generate_synthetic(**params)
+        size = len(text.encode('utf-8'))
+        stages = suite_stages(text, repeat, legacy)
+        report['cases'][name] = {
+            'params': params,
+            'bytes': size,
+            'seconds': stages,
+            'mb_per_s': {stage: size / 1e6 / t for stage, t in stages.items() if stage != 'json'},
+        }
+    return report
+
+
+def compare_reports(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Сравнение с эталоном: список (набор, этап, было, стало, отношение, регрессия)
+
+    Сравниваются только этапы, которые есть в обоих отчётах.
+    """
+    rows = []
+    for name, case in current['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        for stage, seconds in case['seconds'].items():
+            before = base['seconds'].get(stage)
+            if not before:
+                continue
+            ratio = seconds / before
+            rows.append((name, stage, before, seconds, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def bench_suite(args):
+    """Набор замеров: JSON-отчёт и сравнение с эталоном"""
+    cases = args.cases.split(',') if args.cases else None
+    report = run_suite(repeat=args.repeat, scale=args.scale, legacy=not args.no_legacy, cases=cases)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    if not args.baseline:
+        if not args.output:
+            print(text)
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare_reports(report, baseline, args.threshold)
+    for name, stage, before, after, ratio, regressed in rows:
+        mark = 'РЕГРЕССИЯ' if regressed else ''
+        print(f"{name:<10} {stage:<28} {before * 1000:9.2f} мс -> {after * 1000:9.2f} мс  x{ratio:.2f} {mark}")
+    regressions = sum(1 for row in rows if row[5])
+    print(f"Регрессий: {regressions} из {len(rows)} (порог +{args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк парсера конфигураций')
+    arg_parser.add_argument('--sections', type=int, default=None,
+                            help=f'Число секций (по умолчанию {DEFAULT_SECTIONS}; '
+                                 f'для compact - сколько нужно на {COMPACT_KEYS} ключей)')
+    arg_parser.add_argument('--keys', type=int, default=10, help='Ключей в секции')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Число повторов')
+    arg_parser.add_argument('--mode', choices=['parse', 'depth', 'memory', 'incremental', 'compact', 'lazy', 'suite', 'micro', 'compiled', 'json', 'errors', 'schema', 'threads', 'startup', 'columnar'],
+                            default='parse',
+                            help='parse - старый и новый путь, depth - рост глубины вложенности, '
+                                 'memory - пик памяти (tracemalloc), incremental - правка одного значения, '
+                                 'compact - память dict и FrozenNode на конфиге в 1 млн ключей, lazy - одно значение при ленивом разборе, '
+                                 'suite - набор замеров по этапам с JSON-отчётом, '
+                                 'micro - лексер и разбор на ключах, числах и define, '
+                                 'compiled - загрузка скомпилированного файла, '
+                                 'json - JSON-вывод из дерева и из событий разбора, '
+                                 'errors - сбор ошибок и поиск их места, '
+                                 'schema - разбор по схеме и проверка готового словаря, '
+                                 'threads - parse_many в пуле потоков, '
+                                 'startup - холодный запуск CLI и задержка запроса к --serve, '
+                                 'columnar - однородные секции сразу в столбцы')
+    arg_parser.add_argument('--max-depth', type=int, default=1024, help='Максимальная глубина для depth')
+    arg_parser.add_argument('--total-keys', type=int, default=20000, help='Всего ключей для depth')
+    arg_parser.add_argument('--scale', type=float, default=1.0, help='Множитель размера наборов для suite')
+    arg_parser.add_argument('--cases', help='Наборы suite через запятую (по умолчанию все)')
+    arg_parser.add_argument('--no-legacy', action='store_true', help='Не замерять исходный парсер в suite')
+    arg_parser.add_argument('--output', help='Файл для JSON-отчёта suite')
+    arg_parser.add_argument('--baseline', help='JSON-отчёт suite, с которым сравнивать')
+    arg_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                            help='Допустимое замедление относительно эталона (доля)')
+    args = arg_parser.parse_args()
+    if args.sections is None and args.mode != 'compact':
+        args.sections = DEFAULT_SECTIONS
+
+    if args.mode == 'depth':
+        bench_depth(args)
+    elif args.mode == 'memory':
+        bench_memory(args)
+    elif args.mode == 'incremental':
+        bench_incremental(args)
+    elif args.mode == 'compact':
+        bench_compact(args)
+    elif args.mode == 'lazy':
+        bench_lazy(args)
+    elif args.mode == 'compiled':
+        bench_compiled(args)
+    elif args.mode == 'json':
+        bench_json(args)
+    elif args.mode == 'errors':
+        bench_errors(args)
+    elif args.mode == 'schema':
+        bench_schema(args)
+    elif args.mode == 'threads':
+        bench_threads(args)
+    elif args.mode == 'startup':
+        bench_startup(args)
+    elif args.mode == 'columnar':
+        bench_columnar(args)
+    elif args.mode == 'micro':
+        bench_micro(args)
+    elif args.mode == 'suite':
+        sys.exit(bench_suite(args))
+    else:
+        bench_parse(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Кэш результатов разбора конфигураций (вариант 16)
+LRU в памяти процесса и необязательный каталог на диске с контрольными суммами
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import lexer
+import parser
+import symbols
+from parser import ConfigParser
+
+# Меняется при изменении формата файлов кэша
+CACHE_VERSION = 3
+
+_MAGIC = b'CFG16C'
+_DIGEST_SIZE = 32
+
+
+def _parser_version():
+    """Версия записей: формат кэша и отпечаток исходников лексера, парсера и таблицы констант
+
+    Записи, сделанные парсером с другой семантикой, не совпадут по ключу.
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode('ascii'))
+    for module in (lexer, parser, symbols):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+PARSER_VERSION = _parser_version()
+
+
+class ParseCache:
+    """LRU-кэш результатов ConfigParser.parse_file
+
+    Ключ - (путь, mtime, размер) при key='stat' или хэш содержимого при
+    key='content'. Запись хранит такие же отметки всех включённых файлов
+    и устаревает при изменении любого из них. Вытеснение по числу записей
+    и по суммарному размеру исходных файлов. На диске для каждого файла
+    хранится только последняя запись. Результаты общие для всех вызовов -
+    их нельзя изменять.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, cache_dir=None, key='stat'):
+        if key not in ('stat', 'content'):
+            raise ValueError(f"Неизвестный вид ключа кэша: {key}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.key = key
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def load(self, path, use_mmap=False):
+        """Результат разбора файла: из памяти, с диска или новым разбором"""
+        path = os.path.abspath(path)
+        cache_key, size, data = self._make_key(path)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+        # Включённые файлы проверяются вне блокировки: это чтение с диска
+        if entry is not None and self._unchanged(entry[2]):
+            with self._lock:
+                if cache_key in self._entries:
+                    self._entries.move_to_end(cache_key)
+                self.hits += 1
+            return entry[0]
+        with self._lock:
+            self.misses += 1
+
+        stored = self._load_disk(cache_key)
+        if stored is not None and self._unchanged(stored[0]):
+            marks, result = stored
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            parser = ConfigParser()
+            if data is not None:
+                # Разбираем те же байты, от которых взят хэш
+                result = parser.parse(data, path)
+            else:
+                result = parser.parse_file(path, use_mmap=use_mmap)
+                if self._make_key(path)[0] != cache_key:
+                    # Файл изменился во время разбора: результат не сохраняем
+                    return result
+            marks = self._marks(parser.dependencies)
+            self._store_disk(cache_key, (marks, result))
+
+        self._remember(cache_key, result, size, marks)
+        return result
+
+    def invalidate(self, path=None):
+        """Сбрасываем записи файла или весь кэш в памяти"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(path)
+            for cache_key in [k for k in self._entries if k[0] == path]:
+                self._bytes -= self._entries.pop(cache_key)[1]
+
+    def stats(self):
+        """Счётчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_hits': self.disk_hits,
+                'disk_writes': self.disk_writes,
+            }
+
+    def _make_key(self, path):
+        """Ключ записи, её вес в байтах и прочитанное содержимое (только для key='content')"""
+        if self.key == 'stat':
+            st = os.stat(path)
+            return (path, st.st_mtime_ns, st.st_size), st.st_size, None
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        return (path, hashlib.sha256(data).hexdigest()), len(data), data
+
+    def _marks(self, paths):
+        """Отметки включённых файлов того же вида, что ключ: (путь, mtime, размер) или (путь, хэш)"""
+        marks = []
+        for path in paths:
+            if self.key == 'stat':
+                st = os.stat(path)
+                marks.append((path, st.st_mtime_ns, st.st_size))
+            else:
+                with open(path, 'rb') as f:
+                    marks.append((path, hashlib.sha256(f.read()).hexdigest()))
+        return tuple(marks)
+
+    def _unchanged(self, marks):
+        """Не изменился ли ни один включённый файл записи; удалённый - изменение"""
+        if not marks:
+            return True
+        try:
+            return self._marks(mark[0] for mark in marks) == marks
+        except OSError:
+            return False
+
+    def _remember(self, cache_key, result, size, marks=()):
+        """Кладём запись в LRU и вытесняем самые старые сверх лимитов"""
+        with self._lock:
+            if cache_key in self._entries:
+                self._bytes -= self._entries.pop(cache_key)[1]
+            self._entries[cache_key] = (result, size, marks)
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def _disk_path(self, cache_key):
+        """Имя файла кэша на диске: каталог на исходный файл, файл на ключ"""
+        folder = hashlib.sha256(cache_key[0].encode('utf-8', 'surrogateescape')).hexdigest()
+        name = hashlib.sha256(repr((PARSER_VERSION,) + cache_key).encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, folder, name + '.pickle')
+
+    def _load_disk(self, cache_key):
+        """Читаем (отметки включений, результат) с диска; повреждённый файл считается промахом"""
+        if self.cache_dir is None:
+            return None
+        disk_path = self._disk_path(cache_key)
+        try:
+            with open(disk_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        header = len(_MAGIC) + _DIGEST_SIZE
+        payload = data[header:]
+        if data[:len(_MAGIC)] != _MAGIC or data[len(_MAGIC):header] != hashlib.sha256(payload).digest():
+            try:
+                os.unlink(disk_path)
+            except OSError:
+                pass
+            return None
+
+        return pickle.loads(payload)
+
+    def _store_disk(self, cache_key, stored):
+        """Записываем (отметки включений, результат) на диск атомарно"""
+        if self.cache_dir is None:
+            return
+        payload = pickle.dumps(stored, protocol=pickle.HIGHEST_PROTOCOL)
+        disk_path = self._disk_path(cache_key)
+        folder = os.path.dirname(disk_path)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_MAGIC + hashlib.sha256(payload).digest() + payload)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.disk_writes += 1
+        self._prune_disk(disk_path)
+
+    def _prune_disk(self, disk_path):
+        """Удаляем прежние записи того же файла: старые mtime, хэши и версии парсера"""
+        folder, keep = os.path.split(disk_path)
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            if name != keep and name.endswith('.pickle'):
+                try:
+                    os.unlink(os.path.join(folder, name))
+                except OSError:
+                    pass
@@ -3,15 +3,114 @@
 CLI интерфейс для парсера конфигураций (вариант 16)
 Вход: файл (--input)
 Выход: JSON в stdout
+
+CLI запускается тысячами раз подряд, поэтому здесь импортируется только
+нужное для обычного --input файл: остальные режимы (пакетный, --watch,
+--serve, кэш, профиль, compile) подгружают свои модули сами.
 """
 
+import os
 import sys
-import json
-import argparse
-from parser import ConfigParser
+
+from errors import ConfigSyntaxError
+
+
+def format_json(result, compact=False):
+    """JSON результата в том виде, в каком его печатает CLI"""
+    import json_output
+    return json_output.format_json(result, None if compact else 2)
+
+
+def syntax_error_text(error):
+    """Текст ошибки разбора для stderr: у каждой ошибки - место и строка файла с ^"""
+    if isinstance(error, ConfigSyntaxError):
+        return error.report("Синтаксическая ошибка: ")
+    return f"Синтаксическая ошибка: {error}"
+
+
+def error_text(error):
+    """Текст ошибки разбора, чтения или обработки файла для stderr"""
+    if isinstance(error, SyntaxError):
+        return syntax_error_text(error)
+    if isinstance(error, (OSError, UnicodeDecodeError)):
+        return f"Ошибка чтения файла: {error}"
+    return f"Ошибка при обработке: {error}"
+
+
+def load_file(path, max_errors=1, documents=False, debug=False):
+    """Обычный режим: результат файла, (include ...) подставлены
+
+    Каждый файл графа включений разбирается один раз; documents=True -
+    все словари верхнего уровня списком.
+    """
+    from include import ConfigLoader
+
+    loaded = ConfigLoader(max_errors=max_errors).load(path)
+    if debug and loaded.includes:
+        print(f"Включения: {', '.join(loaded.includes)}", file=sys.stderr)
+    return loaded.documents if documents else loaded.result
+
+
+def quick_main(argv):
+    """Самый частый вызов - --input файл [--compact] - без argparse
+
+    Возвращает код выхода или None, если аргументы нужно разбирать
+    полностью (любые другие ключи, нет такого файла, подкоманда).
+    """
+    rest = [arg for arg in argv if arg != '--compact']
+    if len(rest) != 2 or rest[0] != '--input' or rest[1].startswith('-') or not os.path.isfile(rest[1]):
+        return None
+    from json_output import write_json
+
+    try:
+        write_json(load_file(rest[1]), sys.stdout, None if len(rest) < len(argv) else 2)
+    except Exception as e:
+        print(error_text(e), file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_compile(argv):
+    """Подкоманда compile: .conf в двоичный файл для быстрого запуска сервисов"""
+    import argparse
+    import compiled
+
+    parser = argparse.ArgumentParser(
+        prog='cli.py compile',
+        description='Компиляция конфигураций в двоичный формат (загрузка через compiled.load_compiled)'
+    )
+    parser.add_argument('inputs', nargs='+', help='Файлы .conf')
+    parser.add_argument('-o', '--output', help='Путь результата (только для одного файла; '
+                                                'по умолчанию рядом с исходным, расширение .confc)')
+    args = parser.parse_args(argv)
+    if args.output and len(args.inputs) > 1:
+        print("Ошибка: --output можно задать только для одного файла", file=sys.stderr)
+        return 1
+
+    failed = 0
+    for path in args.inputs:
+        try:
+            target = compiled.compile_file(path, args.output)
+            print(f"{path} -> {target} ({os.path.getsize(target)} байт)", file=sys.stderr)
+        except SyntaxError as e:
+            print(syntax_error_text(e), file=sys.stderr)
+            failed += 1
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{path}: Ошибка чтения файла: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
 
 
 def main():
+    code = quick_main(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
+    # Подкоманда compile разбирает свои аргументы сама
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        sys.exit(run_compile(sys.argv[2:]))
+
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='Конвертер учебного конфигурационного языка в JSON (вариант 16)',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -19,13 +118,134 @@ def main():
 Примеры использования:
   python cli.py --input config.conf
   python cli.py --input server.conf > output.json
+  python cli.py --input huge.conf --mmap
+  python cli.py --input server.conf --cache-dir .confcache
+  python cli.py --input huge.conf --stats --profile parse.prof
+  python cli.py --input broken.conf --max-errors 0  # все ошибки с местом
+  python cli.py --input huge.conf --stream --compact > huge.json
+  python cli.py --input services.conf --documents     # все документы файла массивом
+  python cli.py --input enemies.conf --columnar       # однородные секции столбцами
+  python cli.py --input configs/ --watch              # NDJSON после каждого изменения
+  python cli.py --serve                               # запросы строками в stdin, ответы JSON в stdout
+  python cli.py --serve /run/confconv.sock            # то же через Unix-сокет
+  python cli.py --input configs/ 'extra/*.conf' --output-dir out --jobs 8
+  find . -name '*.conf' | python cli.py --input - > all.ndjson
+  python cli.py compile server.conf          # server.confc для compiled.load_compiled
         """
     )
 
     parser.add_argument(
         '--input',
-        required=True,
-        help='Путь к входному файлу с конфигурацией'
+        nargs='+',
+        help='Путь к входному файлу с конфигурацией; несколько путей, шаблоны, '
+             'каталоги или - (список путей в stdin) включают пакетный режим'
+    )
+
+    parser.add_argument(
+        '--serve',
+        nargs='?',
+        const='-',
+        metavar='SOCKET',
+        help='Постоянный процесс преобразования: строка запроса (путь или JSON '
+             '{"path"|"text": ...}) - строка JSON ответа; без SOCKET - stdin/stdout, '
+             'иначе Unix-сокет по этому пути'
+    )
+
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Пакетный режим даже для одного файла: NDJSON в stdout или --output-dir'
+    )
+
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Число процессов в пакетном режиме (по умолчанию - число ядер)'
+    )
+
+    parser.add_argument(
+        '--output-dir',
+        help='Каталог для JSON-файлов в пакетном режиме (иначе NDJSON в stdout)'
+    )
+
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Отобразить файл в память и разбирать байты без декодирования всего файла'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        help='Каталог кэша разобранных файлов: при повторном запуске разбор пропускается'
+    )
+
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Компактный JSON без отступов и пробелов'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Писать JSON прямо из событий разбора, не собирая словарь результата '
+             '(константы объявляются до использования, повторные ключи выводятся повторно)'
+    )
+
+    parser.add_argument(
+        '--documents',
+        action='store_true',
+        help='Вывести все словари верхнего уровня файла JSON-массивом (по умолчанию - первый)'
+    )
+
+    parser.add_argument(
+        '--columnar',
+        action='store_true',
+        help='Однородные секции (одни и те же числовые поля) выводить столбцами '
+             '{"names": [...], "columns": {поле: [...]}}'
+    )
+
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Следить за файлами и каталогами: после каждого изменения строка NDJSON '
+             '{"path", "result"} в stdout, задержка от записи до результата в stderr'
+    )
+
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        help='Пауза без записей перед разбором в режиме --watch, секунды (по умолчанию 0.1)'
+    )
+
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help='В режиме --watch опрашивать mtime вместо inotify (сетевые файловые системы)'
+    )
+
+    parser.add_argument(
+        '--max-errors',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Сколько синтаксических ошибок собрать до остановки (0 - все); '
+             'каждая выводится со строкой файла'
+    )
+
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Время и выделения памяти по этапам и счётчики разбора в stderr'
+    )
+
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='',
+        metavar='FILE',
+        help='Запустить разбор под cProfile: сводка в stderr или дамп pstats в FILE'
     )
 
     parser.add_argument(
@@ -36,39 +256,176 @@ def main():
 
     args = parser.parse_args()
 
-    # Чтение файла
-    try:
-        with open(args.input, 'r', encoding='utf-8') as f:
-            config_text = f.read()
-    except FileNotFoundError:
+    if args.serve is not None:
+        sys.exit(run_serve(args))
+    if args.input is None:
+        parser.error("нужен --input или --serve")
+    if args.watch:
+        sys.exit(run_watch(args))
+
+    # Пакетный режим: несколько входов, каталог, шаблон или список в stdin
+    single = args.input[0]
+    if (args.batch or args.output_dir or args.jobs is not None or len(args.input) > 1
+            or single == '-' or os.path.isdir(single)
+            or (not os.path.isfile(single) and _has_magic(single))):
+        sys.exit(run_batch(args))
+    args.input = single
+
+    # Проверка файла
+    if not os.path.isfile(args.input):
         print(f"Ошибка: файл '{args.input}' не найден", file=sys.stderr)
         sys.exit(1)
-    except Exception as e:
-        print(f"Ошибка чтения файла: {e}", file=sys.stderr)
+    if args.stream and (args.cache_dir or args.mmap or args.stats):
+        print("Ошибка: --stream нельзя сочетать с --cache-dir, --mmap и --stats", file=sys.stderr)
+        sys.exit(1)
+    if args.documents and (args.stream or args.cache_dir or args.mmap or args.stats):
+        print("Ошибка: --documents нельзя сочетать с --stream, --cache-dir, --mmap и --stats", file=sys.stderr)
         sys.exit(1)
+    if args.columnar and (args.stream or args.cache_dir or args.mmap or args.stats):
+        print("Ошибка: --columnar нельзя сочетать с --stream, --cache-dir, --mmap и --stats",
+              file=sys.stderr)
+        sys.exit(1)
+    indent = None if args.compact else 2
+
+    from json_output import write_json, write_events, write_documents
 
-    # Парсинг
-    config_parser = ConfigParser()
+    # Парсинг: файл читается блоками, а не целиком
+    max_errors = args.max_errors or None
+    stats = None
+    profiler = None
+    if args.profile is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
 
     try:
         if args.debug:
             print("=== ОТЛАДОЧНЫЙ РЕЖИМ ===", file=sys.stderr)
             print(f"Файл: {args.input}", file=sys.stderr)
-            print(f"Размер: {len(config_text)} символов", file=sys.stderr)
+            print(f"Размер: {os.path.getsize(args.input)} байт", file=sys.stderr)
 
-        result = config_parser.parse(config_text)
+        if args.stream:
+            from parser import ConfigParser
+            # События всех уровней: в памяти только путь к текущему словарю
+            write_events(ConfigParser().iterparse(args.input, depth=sys.maxsize), sys.stdout, indent)
+            result = None
+        elif args.columnar:
+            from columnar import load_columnar, write_columnar
+            write_columnar(load_columnar(args.input, documents=args.documents), sys.stdout, indent)
+            result = None
+        elif args.cache_dir:
+            from cache import ParseCache
+            from stats import ParseStats
+            cache = ParseCache(cache_dir=args.cache_dir)
+            stats = ParseStats() if args.stats else None
+            if stats is not None:
+                with stats.phase('cache'):
+                    result = cache.load(args.input, use_mmap=args.mmap)
+            else:
+                result = cache.load(args.input, use_mmap=args.mmap)
+            if stats is not None:
+                stats.size = os.path.getsize(args.input)
+                stats.count_tree(result)
+            if args.debug:
+                print(f"Кэш: {cache.stats()}", file=sys.stderr)
+        elif args.mmap or args.stats:
+            from parser import ConfigParser
+            config_parser = ConfigParser(stats=args.stats, max_errors=max_errors)
+            result = config_parser.parse_file(args.input, use_mmap=args.mmap)
+            stats = config_parser.stats
+        else:
+            result = load_file(args.input, max_errors, args.documents, args.debug)
 
-        # Вывод в формате JSON
-        json_output = json.dumps(result, indent=2, ensure_ascii=False)
-        print(json_output)
+        # Вывод в формате JSON: текст пишется в stdout частями
+        if result is not None:
+            write = write_documents if args.documents else write_json
+            if stats is not None:
+                with stats.phase('json'):
+                    write(result, sys.stdout, indent)
+            else:
+                write(result, sys.stdout, indent)
+
+        if profiler is not None:
+            profiler.disable()
+            if args.profile:
+                profiler.dump_stats(args.profile)
+                print(f"Профиль сохранён: {args.profile}", file=sys.stderr)
+            else:
+                import pstats
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+        if stats is not None:
+            print(stats.report(), file=sys.stderr)
 
-    except SyntaxError as e:
-        print(f"Синтаксическая ошибка: {e}", file=sys.stderr)
-        sys.exit(1)
     except Exception as e:
-        print(f"Ошибка при обработке: {e}", file=sys.stderr)
+        print(error_text(e), file=sys.stderr)
         sys.exit(1)
 
 
+def _has_magic(path):
+    """Есть ли в пути символы шаблона (как в пакетном режиме)"""
+    import batch
+    return batch.has_magic(path)
+
+
+def run_serve(args):
+    """Режим --serve: один тёплый процесс на все преобразования"""
+    import server
+
+    max_errors = args.max_errors or None
+    try:
+        if args.serve == '-':
+            server.serve_stream(sys.stdin, sys.stdout, max_errors=max_errors)
+        else:
+            server.serve_unix(args.serve, max_errors=max_errors)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_watch(args):
+    """Режим --watch: первая загрузка всех файлов, затем только изменённых"""
+    import json
+    from watch import ConfigWatcher, DEBOUNCE
+
+    def report(event):
+        if event.error is not None:
+            print(f"{event.path}: {event.error}", file=sys.stderr)
+            return
+        config = event.config
+        result = config.documents if args.documents else config.result
+        line = json.dumps({'path': event.path, 'result': result}, ensure_ascii=False)
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+        print(f"{event.path}: обновлён за {event.latency * 1000:.1f} мс", file=sys.stderr)
+
+    debounce = args.debounce if args.debounce is not None else DEBOUNCE
+    watcher = ConfigWatcher(args.input, report, debounce=debounce,
+                            backend='poll' if args.poll else 'auto')
+    if args.debug:
+        print(f"Слежение: {watcher.backend}", file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_batch(args):
+    """Пакетный режим: все входы через пул процессов, сводка в stderr"""
+    import batch
+
+    tasks = batch.expand_inputs(args.input)
+    if not tasks:
+        print("Ошибка: не найдено ни одного входного файла", file=sys.stderr)
+        return 1
+    if args.jobs is not None and args.jobs < 1:
+        print("Ошибка: --jobs должен быть положительным", file=sys.stderr)
+        return 1
+
+    summary = batch.convert_many(tasks, jobs=args.jobs, output_dir=args.output_dir)
+    print(batch.format_summary(summary), file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
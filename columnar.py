@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Столбцовое представление однородных секций (вариант 16)
+Соседние словари с одними и теми же числовыми полями сразу при разборе пишутся в массивы
+"""
+
+import json
+import sys
+from array import array
+from collections.abc import Mapping
+
+from errors import ConfigSyntaxError, locate
+from parser import ConfigParser, _ParseState, _scanner
+from symbols import _ConstRef
+
+# Место значения константы в столбце до подстановки
+_PENDING = float('nan')
+
+
+class Table(Mapping):
+    """Однородные соседние секции столбцами
+
+    names - имена секций по порядку, fields - поля (в одном порядке у
+    всех секций), columns - поле -> массив значений (array('d') или
+    numpy.ndarray) с тем же порядком строк. Как Mapping таблица
+    отдаёт секцию словарём: table['zombie'] -> {'health': 50.0, ...}.
+    """
+    __slots__ = ('names', 'fields', 'columns', '_index')
+
+    def __init__(self, names, fields, columns, index=None):
+        self.names = names
+        self.fields = fields
+        self.columns = columns
+        self._index = index if index is not None else {name: i for i, name in enumerate(names)}
+
+    def __getitem__(self, name):
+        i = self._index[name]
+        return {field: float(self.columns[field][i]) for field in self.fields}
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def position(self, name):
+        """Номер строки секции name во всех столбцах"""
+        return self._index[name]
+
+    def column(self, field):
+        """Массив значений поля field по всем секциям"""
+        return self.columns[field]
+
+    def to_dict(self):
+        """Секции обычными словарями, как у ConfigParser.parse"""
+        return {name: self[name] for name in self.names}
+
+    def to_json(self):
+        """{"names": [...], "columns": {поле: [...]}} для JSON-вывода"""
+        return {'names': list(self.names),
+                'columns': {field: self.columns[field].tolist() for field in self.fields}}
+
+    def __repr__(self):
+        return f"Table({len(self.names)} секций, поля: {', '.join(self.fields)})"
+
+
+class _Node(dict):
+    """Словарь разбора, который может оказаться таблицей
+
+    Пока все его значения - секции из одних и тех же числовых полей в
+    одном порядке, пары секций пишутся прямо в столбцы через один общий
+    объект _Row, и словарь на секцию не создаётся. Первое значение другого
+    вида переводит узел в обычный словарь (demote): готовые секции
+    становятся словарями, дальше пары хранятся как обычно.
+    """
+    __slots__ = ('state', 'tabular', 'names', 'index', 'fields', 'columns', 'refs', 'row', 'open')
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        self.tabular = True
+        self.names = []
+        self.index = {}
+        self.fields = []
+        self.columns = {}
+        # (строка, поле) -> _ConstRef, значение которой встанет в столбец в конце разбора
+        self.refs = None
+        self.row = None
+        self.open = False
+
+    def __setitem__(self, key, value):
+        if not self.tabular:
+            dict.__setitem__(self, key, value)
+        elif value is self.row and self.open:
+            self.close_row(key)
+        else:
+            self.demote()
+            dict.__setitem__(self, key, value)
+
+    def open_row(self):
+        """Общий объект для следующей секции"""
+        row = self.row
+        if row is None:
+            row = self.row = _Row(self)
+        row.filled = 0
+        self.open = True
+        return row
+
+    def close_row(self, name):
+        """Секция name закрыта: полная и с новым именем - строка таблицы"""
+        self.open = False
+        count = len(self.names)
+        if self.row.filled != len(self.fields) or not self.fields or name in self.index:
+            self.open = True
+            self.demote()
+            dict.__setitem__(self, name, self.row)
+            return
+        self.index[name] = count
+        self.names.append(name)
+        if not count:
+            # Поля известны: дальше пары секций пишутся по порядку без поиска столбца
+            self.row.order = [self.columns[field] for field in self.fields]
+
+    def demote(self):
+        """Узел - не таблица: готовые строки становятся словарями, дальше - обычный словарь"""
+        self.tabular = False
+        fields, columns, refs = self.fields, self.columns, self.refs or {}
+        moved = self.state.moved
+        for i, name in enumerate(self.names):
+            entry = {}
+            for field in fields:
+                ref = refs.get((i, field))
+                if ref is not None:
+                    entry[field] = ref
+                    if type(ref) is _ConstRef:
+                        moved[ref] = entry
+                else:
+                    entry[field] = columns[field][i]
+            dict.__setitem__(self, name, entry)
+        row = self.row
+        if row is not None:
+            row.live = False
+            row.order = None
+            if self.open:
+                # Недописанная секция: её пары уже в столбцах на строке count;
+                # ссылки на неё разбор запомнил сам
+                count = len(self.names)
+                for field in fields:
+                    column = columns[field]
+                    if len(column) > count:
+                        ref = refs.get((count, field))
+                        dict.__setitem__(row, field, ref if ref is not None else column[count])
+                # Пустая секция дальше разбирается как обычный узел и сама может стать таблицей
+                row.tabular = not dict.__len__(row)
+        self.names = self.index = self.fields = self.columns = self.refs = None
+
+
+class _Row(_Node):
+    """Открытая секция таблицы: пары уходят в столбцы строки с номером len(names)
+
+    order - столбцы в порядке полей после первой секции: число для
+    следующего по порядку поля сразу дописывается в свой столбец. Когда
+    таблица становится обычным словарём (live=False), объект остаётся
+    значением секции и дальше ведёт себя как _Node.
+    """
+    __slots__ = ('table', 'filled', 'live', 'order')
+
+    def __init__(self, table):
+        super().__init__(table.state)
+        self.tabular = False
+        self.table = table
+        self.filled = 0
+        self.live = True
+        self.order = None
+
+    def __setitem__(self, key, value):
+        order = self.order
+        if order is not None and type(value) is float:
+            filled = self.filled
+            if filled < len(order) and self.table.fields[filled] == key:
+                order[filled].append(value)
+                self.filled = filled + 1
+                return
+        self._set(key, value)
+
+    def _set(self, key, value):
+        """Пара секции в общем случае: первая секция, константа, повтор или конец таблицы"""
+        if not self.live:
+            _Node.__setitem__(self, key, value)
+            return
+        kind = type(value)
+        if kind is not float and kind is not _ConstRef:
+            self.table.demote()
+            _Node.__setitem__(self, key, value)
+            return
+        table = self.table
+        count = len(table.names)
+        column = table.columns.get(key)
+        if column is not None and len(column) > count:
+            # Повторный ключ в секции: как у словаря, значение заменяется на месте
+            column[count] = value if kind is float else _PENDING
+        else:
+            fields = table.fields
+            if count:
+                if self.filled >= len(fields) or fields[self.filled] != key:
+                    table.demote()
+                    _Node.__setitem__(self, key, value)
+                    return
+            elif column is None:
+                column = table.columns[key] = array('d')
+                fields.append(key)
+            column.append(value if kind is float else _PENDING)
+            self.filled += 1
+        if kind is _ConstRef:
+            if table.refs is None:
+                table.refs = {}
+                table.state.tables.append(table)
+            table.refs[(count, key)] = value
+        elif table.refs is not None:
+            table.refs.pop((count, key), None)
+
+
+class _ColumnarState(_ParseState):
+    """Разбор, в котором все словари - узлы _Node (event_level без ограничения)"""
+
+    def __init__(self, max_errors=1, documents=False):
+        super().__init__(event_level=sys.maxsize, documents=documents, max_errors=max_errors)
+        # Узлы со ссылками на константы в столбцах
+        self.tables = []
+        # _ConstRef из строк таблиц, ставших словарями -> словарь, где она теперь
+        self.moved = {}
+
+    def open_dict(self, parent, key, pos):
+        if type(parent) is _Row and parent.live:
+            # Вложенный словарь в секции: таблицы из этих секций не выйдет
+            parent.table.demote()
+        if isinstance(parent, _Node) and parent.tabular:
+            return parent.open_row()
+        return _Node(self)
+
+
+def _numpy(use_numpy):
+    """Модуль numpy или None: use_numpy=None - если установлен, True - обязательно"""
+    if use_numpy is False:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if use_numpy:
+            raise
+        return None
+    return numpy
+
+
+class ColumnarParser(ConfigParser):
+    """ConfigParser, который отдаёт однородные секции таблицами Table
+
+    Словарь, все значения которого - не меньше min_rows секций с одними и
+    теми же числовыми полями в одном порядке, становится Table; остальное -
+    обычные словари, как у ConfigParser.parse. Столбцы - array('d'), с
+    numpy=True или numpy=None и установленным NumPy - numpy.ndarray
+    (без копирования). (include ...) подставляются при разборе файла.
+    """
+
+    def __init__(self, min_rows=2, numpy=None, preamble=None, max_errors=1):
+        super().__init__(preamble=preamble, max_errors=max_errors)
+        self.min_rows = min_rows
+        self.numpy = numpy
+
+    def _new_state(self):
+        return _ColumnarState(max_errors=self.max_errors)
+
+    def parse_documents(self, text, path=None):
+        """Все словари верхнего уровня текста списком, в каждом однородные секции - Table"""
+        state = _ColumnarState(max_errors=self.max_errors, documents=True)
+        state.source = path
+        try:
+            state.consume(_scanner(text)(text))
+            self._finish(state)
+        except ConfigSyntaxError as e:
+            raise locate(state.failure(e), text) from None
+        return state.documents
+
+    def _finish(self, state):
+        if state.result is None:
+            state.result = _Node(state)
+        # Ссылки из строк таблиц остаются на своих местах в state.refs: константы
+        # подставляются и проверяются в порядке текста, как у ConfigParser
+        holders = {}
+        for table in state.tables:
+            if table.tabular:
+                for (i, field), ref in table.refs.items():
+                    holders[ref] = {field: ref}
+        refs = []
+        for container, key, ref in state.refs:
+            if isinstance(container, _Row) and container.get(key) is not ref:
+                # Общий объект строки уже хранит другую секцию; иначе ссылка заменена повторным ключом
+                container = state.moved.get(ref) or holders.get(ref) or container
+            refs.append((container, key, ref))
+        state.refs = refs
+        super()._finish(state)
+        # Константы в столбцах: число встаёт на место, иначе узел - обычный словарь
+        for table in state.tables:
+            if not table.tabular:
+                continue
+            values = {place: holders[ref][place[1]] for place, ref in table.refs.items()}
+            if all(type(value) is float for value in values.values()):
+                columns = table.columns
+                for (i, field), value in values.items():
+                    columns[field][i] = value
+                table.refs = None
+            else:
+                table.refs = values
+                table.demote()
+        if state.documents is not None:
+            state.documents = [self._build(document) for document in state.documents]
+            return state.documents[0] if state.documents else {}
+        return self._build(state.result)
+
+    def _build(self, root):
+        """Итоговое дерево: таблицы - Table, остальное - обычные словари; обход без рекурсии"""
+        numpy = _numpy(self.numpy)
+        min_rows = self.min_rows
+
+        def convert(node):
+            if isinstance(node, _Node) and node.tabular:
+                if len(node.names) >= min_rows:
+                    columns = node.columns
+                    if numpy is not None:
+                        columns = {field: numpy.frombuffer(column, dtype=numpy.float64)
+                                   for field, column in columns.items()}
+                    return Table(node.names, tuple(node.fields), columns, node.index), None
+                node.demote()
+            target = {}
+            return target, (node, target)
+
+        result, pending = convert(root)
+        stack = [pending] if pending is not None else []
+        while stack:
+            node, target = stack.pop()
+            for key, value in dict.items(node):
+                if isinstance(value, _Node):
+                    value, pending = convert(value)
+                    if pending is not None:
+                        stack.append(pending)
+                target[key] = value
+        return result
+
+
+def parse_columnar(text, min_rows=2, numpy=None):
+    """Разбор текста (str или байты): однородные секции - Table"""
+    return ColumnarParser(min_rows=min_rows, numpy=numpy).parse(text)
+
+
+def load_columnar(path, min_rows=2, numpy=None, documents=False):
+    """Разбор файла блоками: однородные секции - Table; documents=True - все документы списком"""
+    parser = ColumnarParser(min_rows=min_rows, numpy=numpy)
+    if documents:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parser.parse_documents(f.read(), path)
+    return parser.parse_file(path)
+
+
+def _json_default(value):
+    """Table и массивы для json.dump"""
+    if isinstance(value, Table):
+        return value.to_json()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_columnar(tree, out, indent=2):
+    """JSON дерева с таблицами: Table - {"names": [...], "columns": {поле: [...]}}"""
+    separators = None if indent is not None else (',', ':')
+    json.dump(tree, out, indent=indent, ensure_ascii=False, separators=separators, default=_json_default)
+    out.write('\n')
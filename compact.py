@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Компактное неизменяемое представление результата разбора (вариант 16)
+Узлы с __slots__, общие наборы ключей, общие одинаковые поддеревья и массивы чисел
+"""
+
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+class _Shape:
+    """Набор ключей узла: кортеж интернированных ключей и индекс ключ -> позиция
+
+    Один объект на все узлы с теми же ключами в том же порядке: у тысяч
+    соседних секций вида { health, damage, speed } ключи хранятся один раз.
+    """
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+
+class FrozenNode(Mapping):
+    """Неизменяемый словарь результата разбора
+
+    Значения хранятся кортежем, а если все они числа - массивом array('d').
+    Поддерживает интерфейс Mapping, сравнение с обычными словарями и
+    to_dict() для получения прежних вложенных dict.
+    """
+    __slots__ = ('_shape', '_values', '_hash')
+
+    def __init__(self, shape, values):
+        self._shape = shape
+        self._values = values
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._values[self._shape.index[key]]
+
+    def __iter__(self):
+        return iter(self._shape.keys)
+
+    def __len__(self):
+        return len(self._shape.keys)
+
+    def __contains__(self, key):
+        return key in self._shape.index
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self._shape.keys, tuple(self._values)))
+        return self._hash
+
+    def __repr__(self):
+        return f"FrozenNode({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Обычные вложенные словари; без рекурсии, глубина не ограничена"""
+        root = {}
+        stack = [(self, root)]
+        while stack:
+            node, target = stack.pop()
+            for key, value in zip(node._shape.keys, node._values):
+                if type(value) is FrozenNode:
+                    child = {}
+                    stack.append((value, child))
+                    value = child
+                target[key] = value
+        return root
+
+
+class Freezer:
+    """Переводит словари в FrozenNode, разделяя общие ключи и поддеревья
+
+    Один Freezer можно использовать для нескольких конфигураций: наборы
+    ключей и одинаковые поддеревья станут общими и между ними.
+    """
+
+    def __init__(self):
+        self._shapes = {}
+        self._nodes = {}
+        self.shared = 0
+
+    def freeze(self, tree):
+        """FrozenNode для вложенных словарей tree; обход без рекурсии"""
+        if type(tree) is FrozenNode:
+            return tree
+        root = []
+        # Кадр: (словарь, значения, итератор по значениям, список родителя)
+        stack = [(tree, [], iter(tree.values()), root)]
+        while stack:
+            source, values, pending, parent = stack[-1]
+            for value in pending:
+                if type(value) is dict:
+                    stack.append((value, [], iter(value.values()), values))
+                    break
+                values.append(value)
+            else:
+                stack.pop()
+                parent.append(self._node(source, values))
+        return root[0]
+
+    def _node(self, source, values):
+        """Узел из готовых значений; одинаковый узел возвращается общий"""
+        keys = tuple(source)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            shape = self._shapes[keys] = _Shape(tuple(sys.intern(key) for key in keys))
+
+        values = tuple(values)
+        # Типы в ключе: True и 1.0 равны, но это разные значения
+        memo_key = (shape, values, tuple(map(type, values)))
+        node = self._nodes.get(memo_key)
+        if node is not None:
+            self.shared += 1
+            return node
+
+        if len(values) > 1 and all(type(v) is float for v in values):
+            node = FrozenNode(shape, array('d', values))
+        else:
+            node = FrozenNode(shape, values)
+        self._nodes[memo_key] = node
+        return node
+
+
+def freeze(tree):
+    """Компактная неизменяемая копия результата ConfigParser.parse"""
+    return Freezer().freeze(tree)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Скомпилированные конфигурации (вариант 16)
+Двоичный файл с разобранным деревом: открывается через mmap, значения читаются по запросу
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+
+from cache import PARSER_VERSION
+from errors import ConfigSyntaxError, locate
+from parser import ConfigParser
+
+# Меняется при изменении двоичного формата
+FORMAT_VERSION = 2
+
+# Расширение скомпилированного файла рядом с исходным .conf
+COMPILED_SUFFIX = '.confc'
+
+_MAGIC = b'CFGB'
+
+# Заголовок: метка, версия формата, число включённых файлов, размер и mtime
+# исходника, sha256 исходника, отпечаток парсера, число строк, смещения таблицы
+# строк, данных строк и корневого словаря
+_HEADER = struct.Struct('<4sHHQq32s32sIQQQ')
+
+# Включённый файл (сразу после заголовка): размер, mtime, sha256, длина пути; затем путь
+_DEPENDENCY = struct.Struct('<Qq32sI')
+
+# Запись словаря: ключ (номер строки), тип, значение (double или номер/смещение)
+_ENTRY = struct.Struct('<IId')
+_ENTRY_REF = struct.Struct('<IIQ')
+_U32 = struct.Struct('<I')
+
+# Типы значений
+_NUMBER = 0
+_STRING = 1
+_TRUE = 2
+_FALSE = 3
+_DICT = 4
+
+
+def compiled_path(source):
+    """Путь скомпилированного файла для исходного: config.conf -> config.confc"""
+    root, ext = os.path.splitext(source)
+    return (root if ext == '.conf' else source) + COMPILED_SUFFIX
+
+
+def compile_config(result, source_data=b'', source_stat=None, dependencies=()):
+    """Двоичное представление результата разбора
+
+    source_data - байты исходного файла (для хэша), source_stat - его
+    os.stat_result (размер и mtime для быстрой проверки свежести).
+    dependencies - (путь, байты, os.stat_result) включённых файлов: их
+    отметки проверяются так же, как у исходника. Строки (ключи и
+    значения) хранятся один раз и упорядочены по байтам.
+    """
+    # Словари в порядке обхода в ширину; каждой строке - номер
+    nodes = [result]
+    strings = {}
+    i = 0
+    while i < len(nodes):
+        for key, value in nodes[i].items():
+            strings[key] = None
+            if type(value) is dict:
+                nodes.append(value)
+            elif type(value) is str:
+                strings[value] = None
+        i += 1
+
+    ordered = sorted(strings, key=lambda s: s.encode('utf-8'))
+    string_ids = {s: n for n, s in enumerate(ordered)}
+    encoded = [s.encode('utf-8') for s in ordered]
+
+    # Таблица смещений строк (count + 1 значений) и их данные
+    offsets = [0]
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    string_table = struct.pack(f'<{len(offsets)}I', *offsets)
+    string_data = b''.join(encoded)
+
+    included = bytearray()
+    for path, data, st in dependencies:
+        raw_path = os.fsencode(path)
+        included += _DEPENDENCY.pack(st.st_size, st.st_mtime_ns, hashlib.sha256(data).digest(), len(raw_path))
+        included += raw_path
+
+    table_offset = _HEADER.size + len(included)
+    data_offset = table_offset + len(string_table)
+    nodes_offset = data_offset + len(string_data)
+    nodes_offset += -nodes_offset % 8
+
+    # Смещение каждого словаря: число записей, записи, индекс записей по ключу
+    node_offsets = {}
+    position = nodes_offset
+    for node in nodes:
+        node_offsets[id(node)] = position
+        position += 8 + _ENTRY.size * len(node) + 4 * len(node)
+        position += -position % 8
+
+    out = bytearray(position)
+    for node in nodes:
+        offset = node_offsets[id(node)]
+        _U32.pack_into(out, offset, len(node))
+        entries = offset + 8
+        for n, (key, value) in enumerate(node.items()):
+            at = entries + n * _ENTRY.size
+            kind = type(value)
+            if kind is float:
+                _ENTRY.pack_into(out, at, string_ids[key], _NUMBER, value)
+            elif kind is str:
+                _ENTRY_REF.pack_into(out, at, string_ids[key], _STRING, string_ids[value])
+            elif kind is bool:
+                _ENTRY_REF.pack_into(out, at, string_ids[key], _TRUE if value else _FALSE, 0)
+            else:
+                _ENTRY_REF.pack_into(out, at, string_ids[key], _DICT, node_offsets[id(value)])
+        # Номера строк упорядочены как байты строк, поэтому индекс - сортировка по номеру ключа
+        order = sorted(range(len(node)), key=lambda n, keys=list(node): string_ids[keys[n]])
+        index = entries + _ENTRY.size * len(node)
+        if order:
+            struct.pack_into(f'<{len(order)}I', out, index, *order)
+
+    size = source_stat.st_size if source_stat is not None else len(source_data)
+    mtime = source_stat.st_mtime_ns if source_stat is not None else 0
+    header = _HEADER.pack(_MAGIC, FORMAT_VERSION, len(dependencies), size, mtime,
+                          hashlib.sha256(source_data).digest(), bytes.fromhex(PARSER_VERSION),
+                          len(encoded), table_offset, data_offset, nodes_offset)
+    out[:_HEADER.size] = header
+    out[_HEADER.size:table_offset] = included
+    out[table_offset:data_offset] = string_table
+    out[data_offset:data_offset + len(string_data)] = string_data
+    return bytes(out)
+
+
+def compile_file(source, target=None):
+    """Компилируем .conf в двоичный файл (запись атомарная); возвращает путь результата"""
+    target = target or compiled_path(source)
+    _write(target, _compile(source))
+    return target
+
+
+def _compile(source):
+    """Двоичное представление файла source вместе с отметками его включений"""
+    with open(source, 'rb') as f:
+        data = f.read()
+        st = os.fstat(f.fileno())
+    parser = ConfigParser()
+    try:
+        result = parser.parse(data, source)
+    except ConfigSyntaxError as e:
+        raise locate(e, filename=source) from None
+    dependencies = []
+    for path in parser.dependencies:
+        with open(path, 'rb') as f:
+            dependencies.append((path, f.read(), os.fstat(f.fileno())))
+    return compile_config(result, data, st, dependencies)
+
+
+def _write(target, payload):
+    """Атомарная запись: временный файл рядом и os.replace"""
+    folder = os.path.dirname(os.path.abspath(target))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class CompiledConfig:
+    """Скомпилированный файл, открытый для чтения
+
+    buffer - bytes или mmap. Заголовок проверяется сразу, дерево не
+    разбирается: root() отдаёт CompiledNode, который читает записи
+    из буфера при обращении.
+    """
+
+    def __init__(self, buffer, owner=None):
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Повреждённый скомпилированный файл: нет заголовка")
+        (magic, version, included, self.source_size, self.source_mtime, self.source_hash,
+         parser_version, count, table, data, root) = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("Не скомпилированный файл конфигурации")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата: {version}")
+        # Включённые файлы: (путь, размер, mtime, sha256)
+        self.dependencies = []
+        try:
+            at = _HEADER.size
+            for _ in range(included):
+                size, mtime, digest, length = _DEPENDENCY.unpack_from(buffer, at)
+                at += _DEPENDENCY.size
+                self.dependencies.append((os.fsdecode(bytes(buffer[at:at + length])), size, mtime, digest))
+                at += length
+            end = data + _U32.unpack_from(buffer, table + 4 * count)[0]
+            truncated = at > table or root + 8 > len(buffer) or end > len(buffer)
+        except struct.error:
+            truncated = True
+        if truncated:
+            raise ValueError("Повреждённый скомпилированный файл: обрезан")
+        self.parser_version = parser_version.hex()
+        self._buffer = buffer
+        self._owner = owner
+        self._count = count
+        self._table = table
+        self._data = data
+        self._root = root
+        self._strings = {}
+
+    @classmethod
+    def open(cls, path):
+        """Отображаем файл в память; закрыть - close() или with"""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("Повреждённый скомпилированный файл: пустой")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mapped, owner=mapped)
+        except BaseException:
+            mapped.close()
+            raise
+
+    def close(self):
+        """Закрываем отображение файла"""
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_fresh(self, source, check='stat'):
+        """Соответствует ли файл исходнику, его включениям и текущему парсеру
+
+        check='stat' сравнивает размер и mtime, а при расхождении - хэш
+        содержимого; check='content' всегда сравнивает хэш. Удалённый
+        включённый файл - не свежий.
+        """
+        if self.parser_version != PARSER_VERSION:
+            return False
+        if not _unchanged(source, self.source_size, self.source_mtime, self.source_hash, check):
+            return False
+        for path, size, mtime, digest in self.dependencies:
+            try:
+                if not _unchanged(path, size, mtime, digest, check):
+                    return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def root(self):
+        """Корневой словарь"""
+        return CompiledNode(self, self._root)
+
+    def _string(self, n):
+        """Строка по номеру; декодируется один раз"""
+        value = self._strings.get(n)
+        if value is None:
+            start, end = struct.unpack_from('<2I', self._buffer, self._table + 4 * n)
+            value = self._strings[n] = str(self._buffer[self._data + start:self._data + end], 'utf-8')
+        return value
+
+    def _raw(self, n):
+        """Байты строки по номеру без декодирования"""
+        start, end = struct.unpack_from('<2I', self._buffer, self._table + 4 * n)
+        return self._buffer[self._data + start:self._data + end]
+
+    def _value(self, kind, at):
+        """Значение записи по её типу"""
+        if kind == _NUMBER:
+            return _ENTRY.unpack_from(self._buffer, at)[2]
+        ref = _ENTRY_REF.unpack_from(self._buffer, at)[2]
+        if kind == _STRING:
+            return self._string(ref)
+        if kind == _DICT:
+            return CompiledNode(self, ref)
+        return kind == _TRUE
+
+
+def _unchanged(path, size, mtime, digest, check):
+    """Совпадает ли файл с отметками: размер, затем mtime или sha256"""
+    st = os.stat(path)
+    if st.st_size != size:
+        return False
+    if check == 'stat' and st.st_mtime_ns == mtime:
+        return True
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest() == digest
+
+
+class CompiledNode(Mapping):
+    """Словарь скомпилированного файла: ключ ищется двоичным поиском по индексу"""
+    __slots__ = ('_config', '_offset', '_len')
+
+    def __init__(self, config, offset):
+        self._config = config
+        self._offset = offset
+        self._len = _U32.unpack_from(config._buffer, offset)[0]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        config = self._config
+        buffer = config._buffer
+        entries = self._offset + 8
+        for n in range(self._len):
+            yield config._string(_U32.unpack_from(buffer, entries + n * _ENTRY.size)[0])
+
+    def __getitem__(self, key):
+        at = self._find(key)
+        if at is None:
+            raise KeyError(key)
+        return self._config._value(_U32.unpack_from(self._config._buffer, at + 4)[0], at)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def _find(self, key):
+        """Смещение записи с ключом key или None"""
+        if type(key) is not str:
+            return None
+        config = self._config
+        buffer = config._buffer
+        raw = key.encode('utf-8')
+        entries = self._offset + 8
+        index = entries + _ENTRY.size * self._len
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = entries + _U32.unpack_from(buffer, index + 4 * mid)[0] * _ENTRY.size
+            current = config._raw(_U32.unpack_from(buffer, at)[0])
+            if current == raw:
+                return at
+            if current < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def close(self):
+        """Закрываем отображение всего файла; узлы этого файла после этого не читаются"""
+        self._config.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path, default=None):
+        """Значение по пути через точку: get('server.port')"""
+        node = self
+        for key in path.split('.'):
+            if type(node) is not CompiledNode or key not in node:
+                return default
+            node = node[key]
+        return node
+
+    def to_dict(self):
+        """Всё дерево обычными словарями; обход без рекурсии"""
+        root = {}
+        stack = [(self, root)]
+        config = self._config
+        buffer = config._buffer
+        while stack:
+            node, target = stack.pop()
+            entries = node._offset + 8
+            for n in range(node._len):
+                at = entries + n * _ENTRY.size
+                key, kind = struct.unpack_from('<2I', buffer, at)
+                value = config._value(kind, at)
+                if kind == _DICT:
+                    child = {}
+                    stack.append((value, child))
+                    value = child
+                target[config._string(key)] = value
+        return root
+
+    def __repr__(self):
+        return f"CompiledNode({list(self)!r})"
+
+
+def load_compiled(source, artifact=None, check='stat'):
+    """Корневой CompiledNode конфигурации, при необходимости скомпилированной заново
+
+    Если файл artifact (по умолчанию рядом с source) устарел, повреждён
+    или его нет, source компилируется и artifact перезаписывается; когда
+    записать его нельзя, результат остаётся в памяти. Если исходника нет,
+    используется скомпилированный файл текущего парсера. Отображение
+    файла закрывает close() или with у возвращённого узла.
+    """
+    artifact = artifact or compiled_path(source)
+    try:
+        config = CompiledConfig.open(artifact)
+    except (OSError, ValueError):
+        config = None
+    if config is not None:
+        try:
+            fresh = config.is_fresh(source, check)
+        except FileNotFoundError:
+            fresh = config.parser_version == PARSER_VERSION
+        if fresh:
+            return config.root()
+        config.close()
+    payload = _compile(source)
+    try:
+        _write(artifact, payload)
+    except OSError:
+        pass
+    return CompiledConfig(payload).root()
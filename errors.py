@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Ошибки разбора с местом в исходном тексте (вариант 16)
+Строка и столбец вычисляются только при ошибке - по индексу начал строк
+"""
+
+from bisect import bisect_right
+
+
+class ConfigSyntaxError(SyntaxError):
+    """Синтаксическая ошибка конфигурации
+
+    pos - смещение места ошибки в тексте (символы для str, байты для
+    байтов); для ошибок подстановки констант вместо него symbol - имя
+    константы, место которой ищется в тексте (define=True - её объявление).
+    filename, lineno, offset (столбец с 1) и text (строка целиком)
+    заполняет locate() - разбор их не считает, пока ошибки нет. errors -
+    все ошибки одного разбора (ConfigParser(max_errors=...)), первая - сама
+    ошибка.
+    """
+
+    def __init__(self, message, pos=None, symbol=None, define=False):
+        super().__init__(message)
+        self.pos = pos
+        self.symbol = symbol
+        self.define = define
+        self.errors = [self]
+
+    def __str__(self):
+        message = self.located()
+        if len(self.errors) > 1:
+            message += f" (и ещё ошибок: {len(self.errors) - 1})"
+        return message
+
+    def __reduce__(self):
+        # Место хранится в полях SyntaxError, которые pickle сам не сохраняет
+        state = dict(self.__dict__, filename=self.filename, lineno=self.lineno,
+                     offset=self.offset, text=self.text)
+        return type(self), self.args, state
+
+    def located(self):
+        """Сообщение с файлом, строкой и столбцом, если они известны (без числа других ошибок)"""
+        if self.lineno is None:
+            return self.msg
+        place = f"строка {self.lineno}, столбец {self.offset}"
+        if self.filename:
+            place = f"{self.filename}, {place}"
+        return f"{self.msg} ({place})"
+
+    def snippet(self):
+        """Строка с ошибкой и ^ под столбцом; '' - если место неизвестно"""
+        if self.text is None:
+            return ''
+        # Табуляции переносятся в отступ, чтобы ^ встала под нужным символом
+        marker = ''.join(ch if ch == '\t' else ' ' for ch in self.text[:self.offset - 1])
+        return f"    {self.text}\n    {marker}^"
+
+    def report(self, prefix=''):
+        """Все ошибки разбора: сообщение с prefix в начале и фрагмент текста под ним"""
+        lines = []
+        for error in self.errors:
+            lines.append(prefix + error.located())
+            if error.text is not None:
+                lines.append(error.snippet())
+        return '\n'.join(lines)
+
+
+class _LineIndex:
+    """Начала строк текста; строится один раз на все ошибки разбора"""
+
+    def __init__(self, source):
+        if isinstance(source, memoryview):
+            source = source.tobytes()
+        self.source = source
+        self.newline = '\n' if isinstance(source, str) else b'\n'
+        starts = [0]
+        find = source.find
+        # Начало поиска - явно: mmap.find без него ищет от текущей позиции файла
+        pos = find(self.newline, 0)
+        while pos >= 0:
+            starts.append(pos + 1)
+            pos = find(self.newline, pos + 1)
+        self.starts = starts
+
+    def locate(self, pos):
+        """(номер строки, столбец, текст строки) для смещения pos; нумерация с 1"""
+        line = bisect_right(self.starts, pos) - 1
+        start = self.starts[line]
+        end = self.source.find(self.newline, start)
+        raw = self.source[start:end if end >= 0 else len(self.source)]
+        if isinstance(raw, str):
+            column = pos - start
+        else:
+            # Столбец в символах, как в редакторе, а не в байтах UTF-8
+            column = len(raw[:pos - start].decode('utf-8', 'replace'))
+            raw = raw.decode('utf-8', 'replace')
+        return line + 1, column + 1, raw.rstrip('\r')
+
+
+def _symbol_pos(source, error):
+    """Смещение константы ошибки подстановки: первое $имя$ или её (define имя"""
+    # lexer сам импортирует этот модуль, поэтому импорт - при первой ошибке
+    from lexer import tokenize, tokenize_bytes, CONST, DEFINE, WORD
+
+    if isinstance(source, memoryview):
+        source = source.tobytes()
+    scanner = tokenize if isinstance(source, str) else tokenize_bytes
+    previous = None
+    try:
+        for kind, value, pos in scanner(source):
+            if error.define:
+                if kind == WORD and value == error.symbol and previous is not None and previous[0] == DEFINE:
+                    return previous[2]
+            elif kind == CONST and value == error.symbol:
+                return pos
+            previous = (kind, value, pos)
+    except SyntaxError:
+        pass
+    return None
+
+
+def locate(error, source=None, filename=None):
+    """Заполняем место ошибки error и всех ошибок error.errors
+
+    source - разобранный текст (str или байты); без него, но с filename,
+    файл перечитывается - так находятся ошибки потокового разбора, от
+    текста которого в памяти остался только хвост. Ошибки, место которых
+    уже известно или не может быть найдено, не меняются. Возвращает error.
+    """
+    if not isinstance(error, ConfigSyntaxError):
+        return error
+    pending = [e for e in error.errors if e.lineno is None and (e.pos is not None or e.symbol is not None)]
+    if filename is not None:
+        for e in error.errors:
+            if not e.filename:
+                e.filename = filename
+    if not pending:
+        return error
+    if source is None:
+        if filename is None:
+            return error
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError):
+            return error
+
+    lines = _LineIndex(source)
+    for e in pending:
+        pos = e.pos if e.pos is not None else _symbol_pos(lines.source, e)
+        if pos is not None and pos <= len(lines.source):
+            e.lineno, e.offset, e.text = lines.locate(pos)
+    return error
@@ -0,0 +1,805 @@
+#!/usr/bin/env python3
+"""
+Случайные конфигурации и сверка быстрых путей разбора (вариант 16)
+Генератор по грамматике языка, сравнение каждого пути с ConfigParser.parse, сжатие расхождений;
+исходный парсер - тоже путь, его намеренные отличия перечислены явно
+"""
+
+import collections
+import itertools
+import mmap
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zlib
+from collections.abc import Mapping
+
+from cache import ParseCache
+from columnar import ColumnarParser, Table
+from compiled import CompiledConfig, compile_file
+from errors import ConfigSyntaxError, locate
+from include import ConfigLoader
+from incremental import IncrementalParser
+from lazy import parse_lazy
+from legacy_parser import LegacyConfigParser
+from lexer import tokenize, ARROW, COMMA, CONST, DEFINE, INCLUDE, JUNK, LBRACE, NUMBER, RBRACE, RPAREN, STRING, WORD, EOF
+from parser import ConfigParser
+
+# Ключи и имена констант: [_a-z][_a-z0-9]*; c - буква, с которой путают комментарий C
+_KEYS = ('a', 'b', 'c', 'cc', 'port', 'x_1', '_k', 'host', 'ab')
+_NAMES = ('n', 'p', 'q', 'v2', '_c')
+# Содержимое строк: маркеры комментариев, скобки и define внутри @"..." остаются текстом
+_STRING_PARTS = ('', 'text', ' ', 'C x', 'C', '--[[ y ]]', '--[[', ']]', '$p$', '{', '}', ',', '=>',
+                 '(define q 1.0)', 'строка', '\n', '\t', "'", '\\', '@')
+_GAPS = (' ', ' ', '\n', '\t', '  \n  ', ' C комментарий\n', '\nC\n', '--[[ c ]]', '--[[\nC x {\n]]',
+         '--[[ @"s" ]]', '--[[]]', ' --[[ $p$ ]] ')
+# Вставки для неверных текстов
+_FRAGMENTS = ('{', '}', ',', '=>', '@"', '"', '$', '$p', '(define', '(define n', ')', 'C', 'C ', '--[[',
+              ']]', '1.', '.5', '+', '-', 'X', 'true', 'ключ', '\n', '(include @"x")', '٣.٥', '1.0')
+
+
+class ConfigGenerator:
+    """Случайные тексты по грамматике языка
+
+    Словари с вложенностью до max_depth, define с числами со знаком,
+    строками и цепочками $имя$, комментарии C и --[[ ]] между любыми
+    токенами, маркеры комментариев внутри строк, несколько документов.
+    С вероятностью mutate текст портится вставкой, удалением или обрезкой,
+    чтобы сверялись и ошибки.
+    """
+
+    def __init__(self, seed=None, max_depth=3, max_pairs=5, mutate=0.3):
+        self.random = random.Random(seed)
+        self.max_depth = max_depth
+        self.max_pairs = max_pairs
+        self.mutate = mutate
+
+    def generate(self):
+        """Новый текст конфигурации"""
+        rnd = self.random
+        self._defined = []
+        parts = [self._gap(False)]
+        for _ in range(rnd.choice((0, 0, 1, 2, 3))):
+            parts += [self._define(), self._gap(False)]
+        parts.append(self._dict(0))
+        tail = rnd.random()
+        if tail < 0.15:
+            parts += [self._gap(False), self._define()]
+        elif tail < 0.25:
+            parts += [self._gap(False), self._dict(self.max_depth)]
+        elif tail < 0.3:
+            # Комментарий в самом конце: C без перевода строки, незакрытый --[[
+            parts.append(rnd.choice((' C конец', '\nC', '--[[ открыт', '--[[')))
+        parts.append(self._gap(False))
+        text = ''.join(parts)
+        if rnd.random() < self.mutate:
+            text = self._mutate(text)
+        return text
+
+    def _gap(self, required=True):
+        """Пробелы и комментарии между токенами; required - хотя бы один символ"""
+        rnd = self.random
+        if not required and rnd.random() < 0.4:
+            return ''
+        gap = rnd.choice(_GAPS)
+        if rnd.random() < 0.2:
+            gap += rnd.choice(_GAPS)
+        return gap
+
+    def _number(self):
+        rnd = self.random
+        sign = rnd.choice(('', '', '-', '+'))
+        digits = rnd.choice(('0', '1', '2', '10', '007', '65535', '٣'))
+        fraction = rnd.choice(('0', '5', '25', '000', '٥'))
+        return f'{sign}{digits}.{fraction}'
+
+    def _string(self):
+        rnd = self.random
+        return '@"' + ''.join(rnd.choice(_STRING_PARTS) for _ in range(rnd.randint(0, 3))) + '"'
+
+    def _name(self):
+        return self.random.choice(_NAMES)
+
+    def _known(self):
+        """Обычно уже объявленная константа, иногда - любое имя (неизвестная, цикл)"""
+        if self.random.random() < 0.9:
+            return self.random.choice(self._defined)
+        return self._name()
+
+    def _define(self):
+        """(define имя значение): число со знаком, строка или $имя$ другой константы"""
+        rnd = self.random
+        roll = rnd.random()
+        if roll < 0.55:
+            value = self._number()
+        elif roll < 0.8 or not self._defined:
+            value = self._string()
+        else:
+            value = f'${self._known()}$'
+        name = self._name()
+        self._defined.append(name)
+        return f'(define{self._gap()}{name}{self._gap()}{value}{self._gap(False)})'
+
+    def _value(self, depth):
+        rnd = self.random
+        roll = rnd.random()
+        if roll < 0.3:
+            return self._number()
+        if roll < 0.5:
+            return self._string()
+        if roll < 0.6:
+            return rnd.choice(('true', 'false'))
+        if roll < 0.75 and self._defined:
+            return f'${self._known()}$'
+        if depth < self.max_depth:
+            return self._dict(depth + 1)
+        return self._number()
+
+    def _dict(self, depth):
+        """{ ключ => значение, ... }: запятые можно пропускать и повторять, ключи - повторять"""
+        rnd = self.random
+        parts = ['{', self._gap(False)]
+        value = None
+        for i in range(rnd.randint(0, self.max_pairs)):
+            if i:
+                # После числа и true/false запятая обязательна, после строки, $имя$ и словаря - нет
+                bare = value[-1] in '}"$'
+                parts.append(rnd.choice((',', ',', ',', ', ,', '' if bare else ',')) + self._gap(True))
+            if depth and rnd.random() < 0.08:
+                parts += [self._define(), self._gap(True)]
+            value = self._value(depth)
+            parts += [rnd.choice(_KEYS), self._gap(False), '=>', self._gap(False), value]
+        if rnd.random() < 0.2:
+            parts.append(',')
+        parts += [self._gap(False), '}']
+        return ''.join(parts)
+
+    def _mutate(self, text):
+        """Порча текста: вставка, удаление, повтор куска или обрезка"""
+        rnd = self.random
+        for _ in range(rnd.randint(1, 2)):
+            n = len(text)
+            start = rnd.randint(0, n)
+            end = min(n, start + rnd.randint(1, 6))
+            roll = rnd.random()
+            if roll < 0.4:
+                text = text[:start] + rnd.choice(_FRAGMENTS) + text[start:]
+            elif roll < 0.7:
+                text = text[:start] + text[end:]
+            elif roll < 0.85:
+                text = text[:end] + text[start:end] + text[end:]
+            else:
+                text = text[:start]
+        return text
+
+
+class _Skip(Exception):
+    """Путь разбора к этому тексту неприменим"""
+
+
+def _plain(tree):
+    """Обычные словари из Mapping-узлов (LazyNode, Table, CompiledNode)"""
+    if isinstance(tree, Table):
+        return tree.to_dict()
+    if isinstance(tree, Mapping):
+        return {key: _plain(value) for key, value in tree.items()}
+    return tree
+
+
+def _canon(value):
+    """Сравнимый вид дерева: порядок ключей и типы значений (True - не 1.0, -0.0 - не 0.0)"""
+    if isinstance(value, dict):
+        return tuple((key, _canon(item)) for key, item in value.items())
+    return type(value).__name__, repr(value)
+
+
+def _outcome(engine, text, folder):
+    """('ok', дерево) или ('error', класс, сообщение, строка, столбец) одного пути разбора"""
+    try:
+        return 'ok', _canon(_plain(engine(text, folder)))
+    except _Skip:
+        raise
+    except ConfigSyntaxError as e:
+        if e.lineno is None:
+            locate(e, text)
+        return 'error', type(e).__name__, e.msg, e.lineno, e.offset
+    except Exception as e:
+        return 'error', type(e).__name__, str(e), None, None
+
+
+def _chunks(text):
+    """Куски для потоковых путей: длины зависят только от текста"""
+    rnd = random.Random(zlib.crc32(text.encode('utf-8')))
+    pos = 0
+    while pos < len(text):
+        size = rnd.choice((1, 2, 3, 5, 8, 13, 64))
+        yield text[pos:pos + size]
+        pos += size
+
+
+def _tokens(text):
+    """Токены текста до первой ошибки лексера"""
+    try:
+        yield from tokenize(text)
+    except ConfigSyntaxError:
+        return
+
+
+def _ordered(text, unique=False):
+    """Константы объявлены до первого использования и не переобъявляются (условие iterparse)
+
+    unique=True - ещё и ключи в каждом словаре не повторяются: в событиях
+    (путь, ключ, значение) два словаря под одним ключом неотличимы от одного.
+    """
+    defined = set()
+    previous = pending = None
+    levels = []
+    try:
+        for kind, value, _ in tokenize(text):
+            if kind == EOF:
+                break
+            if kind == LBRACE:
+                levels.append(set())
+            elif kind == RBRACE and levels:
+                levels.pop()
+            elif unique and kind == ARROW and previous == WORD and levels:
+                if key in levels[-1]:
+                    return False
+                levels[-1].add(key)
+            if previous == DEFINE and kind == WORD:
+                if value in defined:
+                    return False
+                pending = value
+            elif kind == CONST and value not in defined:
+                return False
+            elif kind == RPAREN and pending is not None:
+                # Имя объявлено после значения: (define a $a$) - не по порядку
+                defined.add(pending)
+                pending = None
+            previous, key = kind, value
+    except ConfigSyntaxError:
+        return False
+    return True
+
+
+def _write(folder, text):
+    # Разбор файла подставляет (include ...) из файлов рядом, эталон - нет: такие тексты не сверяются
+    if any(kind == INCLUDE for kind, _, _ in _tokens(text)):
+        raise _Skip
+    path = os.path.join(folder, 'case.conf')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    return path
+
+
+def _reference(text, folder):
+    return ConfigParser().parse(text)
+
+
+def _bytes(text, folder):
+    return ConfigParser().parse(text.encode('utf-8'))
+
+
+def _mmap(text, folder):
+    data = text.encode('utf-8')
+    if not data:
+        return ConfigParser().parse(b'')
+    with mmap.mmap(-1, len(data)) as buffer:
+        buffer.write(data)
+        return ConfigParser().parse(buffer)
+
+
+def _feed(text, folder):
+    parser = ConfigParser()
+    for chunk in _chunks(text):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def _file_blocks(text, folder):
+    return ConfigParser().parse_file(_write(folder, text), block_size=zlib.crc32(text.encode('utf-8')) % 61 + 8)
+
+
+def _file_mmap(text, folder):
+    return ConfigParser().parse_file(_write(folder, text), use_mmap=True)
+
+
+def _stats(text, folder):
+    return ConfigParser(stats=True).parse(text)
+
+
+def _collect(text, folder):
+    return ConfigParser(max_errors=None).parse(text)
+
+
+def _index(text, folder):
+    parser = ConfigParser(build_index=True)
+    result = parser.parse(text)
+    # Каждое простое значение находится в индексе по своему пути
+    stack = [((), result)]
+    while stack:
+        path, node = stack.pop()
+        for key, value in node.items():
+            if isinstance(value, dict):
+                stack.append(((*path, key), value))
+            elif _canon(parser.index.get('.'.join((*path, key)))) != _canon(value):
+                raise AssertionError(f"Индекс: {'.'.join((*path, key))}")
+    return result
+
+
+def _iterparse(text, folder):
+    if not _ordered(text):
+        raise _Skip
+    result = {}
+    for path, key, value in ConfigParser().iterparse(_chunks(text)):
+        result[key] = value
+    return result
+
+
+def _events_json(text, folder):
+    if not _ordered(text, unique=True):
+        raise _Skip
+    import io
+    import json
+    from json_output import write_events
+
+    out = io.StringIO()
+    write_events(ConfigParser().iterparse(_chunks(text), depth=sys.maxsize), out, None)
+    return json.loads(out.getvalue())
+
+
+def _lazy(text, folder):
+    # Уровни открываются по одному через обращение к ключам. Ошибки неоткрытых
+    # словарей находятся в порядке обращения (а заменённых повторным ключом - никогда),
+    # первую по тексту, как у ConfigParser.parse, даёт validate()
+    root = parse_lazy(text)
+    try:
+        return _plain(root)
+    finally:
+        root.validate()
+
+
+def _lazy_full(text, folder):
+    root = parse_lazy(text)
+    try:
+        return root.to_dict()
+    finally:
+        root.validate()
+
+
+def _incremental(text, folder):
+    """Правка от соседнего текста: прежний текст - этот же с одним изменённым участком"""
+    rnd = random.Random(zlib.crc32(text.encode('utf-8')))
+    parser = IncrementalParser()
+    for _ in range(3):
+        start = rnd.randint(0, len(text))
+        end = min(len(text), start + rnd.choice((0, 1, 4, 12)))
+        previous = text[:start] + rnd.choice(('', ' ', '1.0', 'x => 2.0,', '$p$', '{ }', 'C c\n')) + text[end:]
+        try:
+            parser.parse(previous)
+        except SyntaxError:
+            continue
+        return parser.update(text)[0]
+    return parser.parse(text)
+
+
+def _columnar(text, folder):
+    return ColumnarParser(min_rows=1, numpy=False).parse(text)
+
+
+def _cache(text, folder):
+    # Второй экземпляр читает результат с диска (pickle)
+    path = _write(folder, text)
+    cache_dir = os.path.join(folder, 'cache')
+    ParseCache(cache_dir=cache_dir, key='content').load(path)
+    return ParseCache(cache_dir=cache_dir, key='content').load(path)
+
+
+def _loader(text, folder):
+    # Загрузчик разбирает все документы: тексты с несколькими не сверяются
+    depth = opened = 0
+    for kind, _, _ in _tokens(text):
+        if kind == LBRACE and not depth and opened:
+            raise _Skip
+        if kind == LBRACE:
+            depth += 1
+            opened = 1
+        elif kind == RBRACE and depth:
+            depth -= 1
+    loader = ConfigLoader()
+    try:
+        return loader.load(_write(folder, text)).result
+    finally:
+        loader.close()
+
+
+def _compiled(text, folder):
+    path = _write(folder, text)
+    config = CompiledConfig.open(compile_file(path))
+    try:
+        return config.root().to_dict()
+    finally:
+        config.close()
+
+
+def _legacy(text, folder):
+    return LegacyConfigParser().parse(text)
+
+
+# Пути разбора: имя -> функция (текст, рабочий каталог); _Skip - путь к тексту неприменим
+ENGINES = {
+    'bytes': _bytes,
+    'mmap': _mmap,
+    'feed': _feed,
+    'file': _file_blocks,
+    'file_mmap': _file_mmap,
+    'stats': _stats,
+    'collect': _collect,
+    'index': _index,
+    'iterparse': _iterparse,
+    'events_json': _events_json,
+    'lazy': _lazy,
+    'lazy_full': _lazy_full,
+    'incremental': _incremental,
+    'columnar': _columnar,
+    'cache': _cache,
+    'loader': _loader,
+    'compiled': _compiled,
+    'legacy': _legacy,
+}
+
+
+_NUMBER_TEXT = re.compile(r'[+-]?\d+\.\d+')
+# Символы, которые исходный парсер читал подряд: склеенные через комментарий, они дают другой токен
+_GLUE_LEFT = re.compile(r'[\w.=@(]')
+_GLUE_RIGHT = re.compile(r'[\w.>"+-]')
+# Текст, который исходный парсер обрабатывал и внутри строк и $имён$
+_OPAQUE = re.compile(r'C[ \t\n]|--\[\[|[{}()]')
+
+
+def _spans(text):
+    """Токены с концами: (тип, значение, начало, конец); ошибка лексера - (None, сообщение, место, место)"""
+    spans = []
+    try:
+        for kind, value, pos in tokenize(text):
+            if kind == STRING:
+                end = pos + len(value) + 3
+            elif kind == CONST:
+                end = pos + len(value) + 2
+            elif kind == NUMBER:
+                end = _NUMBER_TEXT.match(text, pos).end()
+            elif kind == EOF:
+                end = pos
+            else:
+                end = pos + len(value)
+            spans.append((kind, value, pos, end))
+    except ConfigSyntaxError as e:
+        spans.append((None, e.msg, e.pos, e.pos))
+    return spans
+
+
+def _legacy_messages(text, spans, expected, got):
+    """Оба парсера отвергают текст: класс, место и часть сообщений у исходного другие"""
+    return expected[0] == got[0] == 'error'
+
+
+def _legacy_key(text, spans, expected, got):
+    """В позиции ключа не слово (скобка, =>, строка, незакрытые $ или @"): исходный парсер это пропускал"""
+    state = None
+    depth = 0
+    in_define = False
+    for kind, value, _, _ in spans:
+        if in_define:
+            # define и include до ): их форму проверяет define
+            in_define = kind not in (RPAREN, LBRACE, RBRACE, None)
+            if in_define or kind == RPAREN:
+                continue
+        if kind == DEFINE or kind == INCLUDE:
+            in_define = True
+        elif not depth:
+            # Текст после основного словаря - вне, его проверяет outside
+            if kind != LBRACE or state is not None:
+                continue
+            depth, state = 1, 'key'
+        elif state == 'key':
+            if kind == WORD:
+                state = 'arrow'
+            elif kind == RBRACE:
+                depth -= 1
+            elif kind != COMMA and kind != JUNK:
+                return kind != EOF
+        elif state == 'arrow':
+            if kind != ARROW:
+                return False
+            state = 'value'
+        elif state == 'value':
+            if kind == LBRACE:
+                depth, state = depth + 1, 'key'
+            elif kind in (STRING, CONST):
+                state = 'key'
+            elif kind == NUMBER or value in ('true', 'false'):
+                state = 'sep'
+            else:
+                return False
+        elif kind == COMMA:
+            state = 'key'
+        elif kind == RBRACE:
+            depth, state = depth - 1, 'key'
+        else:
+            return False
+    return False
+
+
+def _legacy_comments(text, spans, expected, got):
+    """Комментарий вплотную между токенами, перед именем или значением define или с (define в тексте"""
+    before = previous = None
+    end = 0
+    for kind, value, start, stop in spans:
+        gap = text[end:start]
+        if gap.strip():
+            if previous == DEFINE or previous == WORD and before == DEFINE or '(define' in gap:
+                return True
+            # Исходный парсер вырезал комментарий и склеивал соседей: c--[[ ]]k - ключ ck
+            if previous is not None and _GLUE_LEFT.match(text, end - 1) and _GLUE_RIGHT.match(text, start):
+                return True
+        before, previous = previous, kind
+        end = stop
+    return False
+
+
+def _legacy_strings(text, spans, expected, got):
+    """Комментарии, скобки и define внутри @"..." или $...$ - текст, исходный парсер их обрабатывал"""
+    return any(kind in (STRING, CONST) and _OPAQUE.search(value) for kind, value, _, _ in spans)
+
+
+def _legacy_outside(text, spans, expected, got):
+    """Строка, $имя$ или ошибка лексера вне основного словаря: исходный парсер этот текст не смотрел"""
+    depth = 0
+    done = in_define = False
+    for kind, _, _, _ in spans:
+        outside = done or not depth
+        if kind is None:
+            return outside
+        if kind == DEFINE:
+            in_define = True
+        elif kind in (RPAREN, LBRACE, RBRACE):
+            in_define = False
+        if kind == LBRACE:
+            depth += 1
+        elif kind == RBRACE and depth:
+            depth -= 1
+            done = done or not depth
+        elif kind in (STRING, CONST) and outside and not in_define:
+            return True
+    return False
+
+
+def _legacy_define(text, spans, expected, got):
+    """define не вида (define имя число-или-строка): хвост до ), $имя$ в значении, незакрытый"""
+    for i, (kind, _, _, _) in enumerate(spans):
+        if kind == DEFINE:
+            shape = tuple(span[0] for span in spans[i + 1:i + 4])
+            if shape not in ((WORD, NUMBER, RPAREN), (WORD, STRING, RPAREN)):
+                return True
+    return False
+
+
+def _legacy_include(text, spans, expected, got):
+    """(include @"путь") - новая конструкция, исходный парсер её не знал"""
+    return any(kind == INCLUDE for kind, _, _, _ in spans)
+
+
+# Намеренные отличия ConfigParser от исходного парсера (readme, «Отличия от исходного
+# парсера»): расхождение пути legacy, подпадающее под одно из них, не считается ошибкой
+LEGACY_DIFFERENCES = {
+    'messages': _legacy_messages,
+    'key': _legacy_key,
+    'comments': _legacy_comments,
+    'strings': _legacy_strings,
+    'outside': _legacy_outside,
+    'define': _legacy_define,
+    'include': _legacy_include,
+}
+
+
+def legacy_difference(text, expected, got):
+    """Имя намеренного отличия, которым объясняется расхождение с исходным парсером, или None"""
+    spans = _spans(text)
+    for name, allowed in LEGACY_DIFFERENCES.items():
+        if allowed(text, spans, expected, got):
+            return name
+    return None
+
+
+# Допустимые расхождения: путь -> функция (текст, эталон, результат) -> имя отличия или None
+ALLOWED = {'legacy': legacy_difference}
+
+
+class Mismatch:
+    """Расхождение пути engine с эталоном на тексте text (уже сжатом)"""
+    __slots__ = ('engine', 'text', 'expected', 'got', 'original')
+
+    def __init__(self, engine, text, expected, got, original):
+        self.engine = engine
+        self.text = text
+        self.expected = expected
+        self.got = got
+        self.original = original
+
+    def __repr__(self):
+        return f"Mismatch({self.engine}: {self.text!r}\n  эталон: {self.expected}\n  путь:   {self.got})"
+
+
+class FuzzReport:
+    """Итог прогона: число текстов, сверок по путям, пропусков и расхождения"""
+
+    def __init__(self, seed, engines=ENGINES):
+        self.seed = seed
+        self.cases = 0
+        self.errors = 0
+        self.checks = dict.fromkeys(engines, 0)
+        self.skipped = dict.fromkeys(engines, 0)
+        # Расхождения, объяснённые намеренными отличиями: имя отличия -> число
+        self.allowed = collections.Counter()
+        self.mismatches = []
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+    def summary(self):
+        checked = sum(self.checks.values())
+        line = (f"seed {self.seed}: текстов {self.cases} (с ошибкой {self.errors}), "
+                f"сверок {checked}, расхождений {len(self.mismatches)}")
+        if self.allowed:
+            line += ', намеренных отличий: ' + ', '.join(f'{name} {count}' for name, count in self.allowed.most_common())
+        return '\n'.join([line] + [repr(m) for m in self.mismatches])
+
+
+class DifferentialRunner:
+    """Один и тот же текст - эталону ConfigParser.parse и каждому пути из engines
+
+    Сравниваются дерево (с порядком ключей и типами значений) или класс,
+    сообщение, строка и столбец ошибки. Расхождение пути из allowed,
+    которое его функция объясняет намеренным отличием, не считается.
+    Текст с расхождением сжимается до минимального, на котором
+    расхождение остаётся.
+    """
+
+    def __init__(self, engines=None, reference=_reference, allowed=ALLOWED):
+        self.engines = dict(ENGINES if engines is None else engines)
+        self.reference = reference
+        self.allowed = allowed
+        self._folder = tempfile.TemporaryDirectory(prefix='conffuzz-')
+        self.folder = self._folder.name
+
+    def close(self):
+        self._folder.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def check(self, text, report=None):
+        """Расхождения путей на тексте text (несжатые): список (путь, эталон, результат)"""
+        expected = _outcome(self.reference, text, self.folder)
+        if report is not None:
+            report.cases += 1
+            report.errors += expected[0] == 'error'
+        found = []
+        for name, engine in self.engines.items():
+            try:
+                got = _outcome(engine, text, self.folder)
+            except _Skip:
+                if report is not None:
+                    report.skipped[name] += 1
+                continue
+            if report is not None:
+                report.checks[name] += 1
+            if got != expected:
+                reason = self._explain(name, text, expected, got)
+                if reason is None:
+                    found.append((name, expected, got))
+                elif report is not None:
+                    report.allowed[reason] += 1
+        return found
+
+    def _explain(self, name, text, expected, got):
+        """Имя намеренного отличия, объясняющего расхождение пути name, или None"""
+        allowed = self.allowed.get(name)
+        return allowed(text, expected, got) if allowed is not None else None
+
+    def differs(self, name, text):
+        """Расходится ли путь name с эталоном на тексте text"""
+        try:
+            got = _outcome(self.engines[name], text, self.folder)
+        except _Skip:
+            return False
+        expected = _outcome(self.reference, text, self.folder)
+        return got != expected and self._explain(name, text, expected, got) is None
+
+    def shrink(self, name, text, limit=3000):
+        """Минимальный текст, на котором путь name ещё расходится с эталоном
+
+        Удаляем куски строк, затем символов (ddmin), пока расхождение
+        остаётся; limit - наибольшее число проверок.
+        """
+        calls = itertools.count()
+
+        def fails(candidate):
+            return next(calls) < limit and self.differs(name, candidate)
+
+        for split in (lambda s: s.splitlines(keepends=True), list):
+            parts = split(text)
+            granularity = 2
+            while len(parts) >= 2:
+                size = -(-len(parts) // granularity)
+                for start in range(0, len(parts), size):
+                    candidate = parts[:start] + parts[start + size:]
+                    if fails(''.join(candidate)):
+                        parts = candidate
+                        granularity = max(granularity - 1, 2)
+                        break
+                else:
+                    if granularity >= len(parts):
+                        break
+                    granularity = min(granularity * 2, len(parts))
+            text = ''.join(parts)
+        if len(text) == 1 and fails(''):
+            text = ''
+        return text
+
+    def run(self, budget=1.0, seed=None, generator=None, max_cases=None, max_mismatches=5):
+        """Случайные тексты, пока не истечёт budget секунд (или max_cases текстов)
+
+        Для каждого пути сжимается и сохраняется первое расхождение, но
+        не больше max_mismatches всего. Возвращает FuzzReport.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        generator = generator or ConfigGenerator(seed)
+        report = FuzzReport(seed, self.engines)
+        deadline = time.perf_counter() + budget
+        failed = set()
+        while time.perf_counter() < deadline and (max_cases is None or report.cases < max_cases):
+            text = generator.generate()
+            for name, expected, got in self.check(text, report):
+                if name in failed or len(report.mismatches) >= max_mismatches:
+                    continue
+                failed.add(name)
+                small = self.shrink(name, text)
+                report.mismatches.append(Mismatch(
+                    name, small, _outcome(self.reference, small, self.folder),
+                    _outcome(self.engines[name], small, self.folder), text))
+        return report
+
+
+def fuzz(budget=1.0, seed=None, engines=None):
+    """Прогон на budget секунд всеми путями (или путями engines); FuzzReport"""
+    selected = None if engines is None else {name: ENGINES[name] for name in engines}
+    with DifferentialRunner(selected) as runner:
+        return runner.run(budget, seed)
+
+
+def main():
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Сверка путей разбора и исходного парсера с ConfigParser.parse')
+    arg_parser.add_argument('--budget', type=float, default=10.0, help='Время прогона, секунды')
+    arg_parser.add_argument('--seed', type=int, default=None, help='Зерно генератора (по умолчанию случайное)')
+    arg_parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                            help='Сверять только этот путь (можно повторять)')
+    args = arg_parser.parse_args()
+
+    report = fuzz(args.budget, args.seed, args.engine)
+    print(report.summary())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
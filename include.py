@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Включения и несколько документов в файле (вариант 16)
+(include @"путь") подключает константы другого файла; каждый файл разбирается один раз
+"""
+
+import errno
+import os
+import threading
+from functools import partial
+
+from errors import ConfigSyntaxError, locate
+from parser import _ParseState, _read_blocks, BLOCK_SIZE
+from symbols import SymbolTable
+
+
+def _stamp(path):
+    """Отметка версии файла: mtime и размер"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse_unit(path, max_errors=1):
+    """Разбираем один файл без подстановки констант (в том числе в процессе-исполнителе)
+
+    Возвращает документы, свои константы, пути включений и неразрешённые
+    ссылки. Ссылки указывают на словари документов: при передаче между
+    процессами всё уходит одним объектом, и связь сохраняется.
+    """
+    state = _ParseState(documents=True, max_errors=max_errors)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for chunk in _read_blocks(f, BLOCK_SIZE):
+                state.feed(chunk)
+        state.close()
+        if state.errors:
+            raise state.failure()
+    except ConfigSyntaxError as e:
+        raise locate(state.failure(e), filename=path) from None
+    return state.documents, state.constants, state.includes, state.refs
+
+
+class _Unit:
+    """Разобранный файл графа включений"""
+    __slots__ = ('path', 'stamp', 'documents', 'constants', 'includes', 'refs', 'config')
+
+    def __init__(self, path, stamp, parsed):
+        self.path = path
+        self.stamp = stamp
+        self.documents, self.constants, includes, self.refs = parsed
+        folder = os.path.dirname(path)
+        # Повторное включение того же файла ничего не меняет
+        self.includes = list(dict.fromkeys(
+            os.path.realpath(os.path.join(folder, name)) for name in includes))
+        # LoadedConfig после подстановки констант; ссылки при этом расходуются
+        self.config = None
+
+
+class LoadedConfig:
+    """Результат загрузки файла с включениями
+
+    documents - все словари верхнего уровня файла, constants - таблица
+    констант с учётом включений (общая для всех, кто включает этот файл,
+    её нельзя изменять), includes - полные пути прямых включений.
+    """
+    __slots__ = ('path', 'documents', 'constants', 'includes')
+
+    def __init__(self, path, documents, constants, includes):
+        self.path = path
+        self.documents = documents
+        self.constants = constants
+        self.includes = includes
+
+    @property
+    def result(self):
+        """Первый документ - то же, что вернул бы ConfigParser.parse"""
+        return self.documents[0] if self.documents else {}
+
+    def __repr__(self):
+        return f"LoadedConfig({self.path!r}, документов: {len(self.documents)})"
+
+
+class ConfigLoader:
+    """Загрузчик файлов с (include @"путь") и несколькими документами
+
+    Путь включения отсчитывается от каталога включающего файла. Включённый
+    файл отдаёт все свои константы вместе с константами своих включений;
+    свои define файла важнее включённых, из двух включений важнее более
+    позднее. Каждый файл разбирается один раз и хранится, пока не изменятся
+    его mtime или размер: общий фрагмент констант, включённый десятками
+    файлов, не разбирается заново, а его таблица констант не строится
+    повторно. Граф обходится волнами, файлы одной волны с jobs > 1
+    разбираются параллельно в процессах. Циклическое включение - SyntaxError.
+    max_errors - сколько ошибок одного файла собрать до остановки, как
+    в ConfigParser; ошибка указывает файл, строку и столбец.
+    """
+
+    def __init__(self, jobs=1, max_errors=1):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_errors = max_errors
+        self.parses = 0
+        self._units = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """LoadedConfig файла со всеми включениями"""
+        return self.load_many([path])[0]
+
+    def load_many(self, paths):
+        """LoadedConfig для каждого пути; общие включения разбираются один раз"""
+        roots = [os.path.realpath(path) for path in paths]
+        with self._lock:
+            units = self._collect(roots)
+            order = self._order(units, roots)
+            self._resolve(units, order)
+            return [units[path].config for path in roots]
+
+    def dependencies(self, path):
+        """Полные пути файла и всех его включений по уже разобранным файлам
+
+        Включение, которое не удалось разобрать, входит в набор без своих
+        включений.
+        """
+        root = os.path.realpath(path)
+        found = {root}
+        stack = [root]
+        with self._lock:
+            while stack:
+                unit = self._units.get(stack.pop())
+                if unit is None:
+                    continue
+                for target in unit.includes:
+                    if target not in found:
+                        found.add(target)
+                        stack.append(target)
+        return found
+
+    def close(self):
+        """Останавливаем процессы-исполнители"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _collect(self, roots):
+        """Все файлы, достижимые из roots; изменённые и новые разбираются волнами"""
+        units = {}
+        wave = list(dict.fromkeys(roots))
+        parent = {}
+        while wave:
+            stale = []
+            for path in wave:
+                try:
+                    stamp = _stamp(path)
+                except FileNotFoundError:
+                    if path in parent:
+                        raise FileNotFoundError(
+                            errno.ENOENT, f"Включаемый файл не найден (из {parent[path]})", path) from None
+                    raise
+                unit = self._units.get(path)
+                if unit is not None and unit.stamp == stamp:
+                    units[path] = unit
+                else:
+                    stale.append((path, stamp))
+            for unit in self._parse(stale):
+                units[unit.path] = self._units[unit.path] = unit
+
+            following = []
+            for path in wave:
+                for target in units[path].includes:
+                    if target not in units and target not in parent:
+                        parent[target] = path
+                        following.append(target)
+            wave = following
+        return units
+
+    def _parse(self, stale):
+        """Разбираем файлы (путь, отметка); с jobs > 1 - в процессах"""
+        self.parses += len(stale)
+        paths = [path for path, _ in stale]
+        parse = partial(_parse_unit, max_errors=self.max_errors)
+        if self.jobs == 1 or len(stale) <= 1:
+            parsed = map(parse, paths)
+        else:
+            if self._pool is None:
+                # Пул нужен только для параллельного разбора: модуль не грузится при jobs=1
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+            parsed = self._pool.map(parse, paths)
+        return [_Unit(path, stamp, result) for (path, stamp), result in zip(stale, parsed)]
+
+    def _order(self, units, roots):
+        """Файлы так, что включения идут раньше включающих; цикл - SyntaxError
+
+        Обход в глубину без рекурсии: серые вершины лежат на текущем пути,
+        и ребро в серую вершину замыкает цикл.
+        """
+        order = []
+        color = {}
+        for root in roots:
+            if root in color:
+                continue
+            color[root] = 1
+            path = [root]
+            stack = [iter(units[root].includes)]
+            while stack:
+                for target in stack[-1]:
+                    mark = color.get(target)
+                    if mark == 1:
+                        cycle = path[path.index(target):] + [target]
+                        raise SyntaxError("Циклическое включение: " + ' -> '.join(cycle))
+                    if mark is None:
+                        color[target] = 1
+                        path.append(target)
+                        stack.append(iter(units[target].includes))
+                        break
+                else:
+                    stack.pop()
+                    done = path.pop()
+                    color[done] = 2
+                    order.append(done)
+        return order
+
+    def _resolve(self, units, order):
+        """Подставляем константы в порядке order
+
+        Файл собирается заново, если он новый или заново собрано одно из
+        его включений. Подстановка расходует ссылки, поэтому уже собранный
+        файл для этого разбирается ещё раз.
+        """
+        rebuild = set()
+        for path in order:
+            unit = units[path]
+            if unit.config is None or any(target in rebuild for target in unit.includes):
+                rebuild.add(path)
+        again = [(path, units[path].stamp) for path in order
+                 if path in rebuild and units[path].config is not None]
+        for unit in self._parse(again):
+            units[unit.path] = self._units[unit.path] = unit
+
+        for path in order:
+            if path not in rebuild:
+                continue
+            unit = units[path]
+            included = {}
+            for target in unit.includes:
+                included.update(units[target].config.constants)
+            symbols = SymbolTable(unit.constants, parent=included)
+            # Сначала проверка: при ошибке ссылки файла остаются нетронутыми
+            errors = symbols.problems(unit.refs)
+            if errors:
+                if self.max_errors is not None:
+                    del errors[self.max_errors:]
+                errors[0].errors = errors
+                raise locate(errors[0], filename=path)
+            constants = dict(symbols)
+            for container, key, ref in unit.refs:
+                if container.get(key) is ref:
+                    container[key] = constants[ref.name]
+            unit.refs = []
+            unit.config = LoadedConfig(path, unit.documents, constants, list(unit.includes))
+
+
+def load_config(path, jobs=1):
+    """LoadedConfig одного файла с включениями (загрузчик без общего кэша)"""
+    with ConfigLoader(jobs) as loader:
+        return loader.load(path)
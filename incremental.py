@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Инкрементальный повторный разбор конфигураций (вариант 16)
+После правки заново разбираются только затронутые пары основного словаря
+"""
+
+from bisect import bisect_right
+
+from errors import ConfigSyntaxError, locate
+from lexer import tokenize, LBRACE, RBRACE, ARROW, WORD, CONST, DEFINE
+from parser import _ParseState, _SEP
+from symbols import _ConstRef, resolve_constants
+
+# Размер блока при поиске общего начала и конца старого и нового текста
+_COMPARE_BLOCK = 4096
+
+
+class _Observer:
+    """Следит за потоком токенов, который идёт в парсер
+
+    Запоминает начала пар основного словаря, объявления define с позициями
+    и пути всех ссылок $имя$ - в том же порядке, в каком их видит парсер.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.lbrace = None
+        self.rbrace = None
+        self.starts = []
+        self.keys = []
+        self.defines = []
+        self.refs = []
+        self._path = []
+        self._key = None
+        self._define = None
+
+    def watch(self, tokens):
+        """Пропускаем токены насквозь, собирая сведения о структуре"""
+        prev = None
+        path = self._path
+        for tok in tokens:
+            kind = tok[0]
+            if self._define is not None:
+                # (define имя значение: имя и значение идут следующими токенами;
+                # значение $имя$ - ссылка на другую константу
+                self._define.append(_ConstRef(tok[1]) if kind == CONST and len(self._define) == 2 else tok[1])
+                if len(self._define) == 3:
+                    self.defines.append(tuple(self._define))
+                    self._define = None
+            elif self.rbrace is None:
+                if kind == LBRACE:
+                    if self.depth == 0:
+                        self.lbrace = tok[2]
+                    elif prev is not None and prev[0] == ARROW:
+                        path.append(self._key)
+                    self.depth += 1
+                elif kind == RBRACE and self.depth > 0:
+                    self.depth -= 1
+                    if path and self.depth >= 1:
+                        path.pop()
+                    if self.depth == 0:
+                        self.rbrace = tok[2]
+                elif kind == ARROW and prev is not None and prev[0] == WORD:
+                    self._key = prev[1]
+                    if self.depth == 1:
+                        self.starts.append(prev[2])
+                        self.keys.append(prev[1])
+                elif kind == CONST and self.depth > 0:
+                    self.refs.append((len(self.starts) - 1, tok[1], tuple(path) + (self._key,)))
+            if kind == DEFINE:
+                self._define = [tok[2]]
+            prev = tok
+            yield tok
+
+
+def _diff(old, new, path, out):
+    """Структурная разница двух значений: ('added'|'removed'|'changed', путь, было, стало)"""
+    if type(old) is dict and type(new) is dict:
+        for key, value in old.items():
+            sub = f"{path}.{key}" if path else key
+            if key in new:
+                _diff(value, new[key], sub, out)
+            else:
+                out.append(('removed', sub, value, None))
+        for key, value in new.items():
+            if key not in old:
+                out.append(('added', f"{path}.{key}" if path else key, None, value))
+    elif type(old) is not type(new) or old != new:
+        out.append(('changed', path, old, new))
+
+
+def _same(a, b):
+    """Значения констант равны с учётом типа"""
+    return type(a) is type(b) and a == b
+
+
+def _common_prefix(a, b):
+    """Длина общего начала двух строк"""
+    limit = min(len(a), len(b))
+    pos = 0
+    while pos < limit and a[pos:pos + _COMPARE_BLOCK] == b[pos:pos + _COMPARE_BLOCK]:
+        pos += _COMPARE_BLOCK
+    limit = min(limit, pos + _COMPARE_BLOCK)
+    while pos < limit and a[pos] == b[pos]:
+        pos += 1
+    return pos
+
+
+def _common_suffix(a, b, limit):
+    """Длина общего конца двух строк, не заходящего в первые limit символов"""
+    limit = min(len(a), len(b)) - limit
+    size = 0
+    while size < limit:
+        step = min(_COMPARE_BLOCK, limit - size)
+        if a[len(a) - size - step:len(a) - size] != b[len(b) - size - step:len(b) - size]:
+            break
+        size += step
+    else:
+        return size
+    while size < limit and a[len(a) - size - 1] == b[len(b) - size - 1]:
+        size += 1
+    return size
+
+
+class IncrementalParser:
+    """Парсер, который после правки переразбирает только изменённые секции
+
+    Хранит для каждой пары основного словаря её начало в тексте, а для
+    каждой ссылки $имя$ - путь и словарь, где она стоит, сгруппированные по
+    ключу пары. update() находит изменённый участок, заново разбирает пары,
+    которые он задевает, и пересчитывает только ссылки на изменившиеся
+    константы. Если правка затрагивает сами скобки основного словаря или
+    ключи повторяются, выполняется полный разбор.
+    """
+
+    def __init__(self):
+        self.text = None
+        self.result = None
+        self.constants = {}
+        self.full_parses = 0
+        self._lbrace = None
+        self._rbrace = None
+        self._starts = []
+        self._keys = []
+        self._unique = False
+        self._refs = {}
+        self._defines = []
+
+    def parse(self, text):
+        """Полный разбор с запоминанием структуры"""
+        state = _ParseState()
+        observer = _Observer()
+        try:
+            state.consume(observer.watch(tokenize(text)))
+            refs = self._group_refs(observer, state)
+            state.resolve_refs()
+        except ConfigSyntaxError as e:
+            raise locate(e, text) from None
+
+        self.text = text
+        self.result = state.result if state.result is not None else {}
+        self.constants = state.constants
+        self._lbrace = observer.lbrace
+        self._rbrace = observer.rbrace
+        self._starts = observer.starts
+        self._keys = observer.keys
+        self._unique = len(set(observer.keys)) == len(observer.keys)
+        self._refs = refs
+        self._defines = observer.defines
+        self.full_parses += 1
+        return self.result
+
+    def update(self, text=None, edit=None):
+        """Применяем новый текст или правку (начало, конец, замена) к старому тексту
+
+        Возвращает (новое дерево, список изменений). Неизменённые секции
+        переиспользуются, поэтому прежнее дерево может измениться. При
+        синтаксической ошибке состояние парсера остаётся прежним.
+        """
+        old_text = self.text
+        if old_text is None:
+            raise ValueError("Сначала нужен полный разбор parse()")
+
+        if edit is not None:
+            start, end, replacement = edit
+            text = old_text[:start] + replacement + old_text[end:]
+            old_end = end
+            new_end = start + len(replacement)
+        else:
+            start = _common_prefix(old_text, text)
+            suffix = _common_suffix(old_text, text, start)
+            old_end = len(old_text) - suffix
+            new_end = len(text) - suffix
+
+        if start == old_end and start == new_end:
+            return self.result, []
+
+        changes = None
+        if self._lbrace is not None and self._rbrace is not None and self._unique:
+            try:
+                if self._lbrace < start and old_end <= self._rbrace:
+                    changes = self._update_body(text, start, old_end, new_end)
+                elif old_end <= self._lbrace or start > self._rbrace:
+                    changes = self._update_outside(text, start, old_end, new_end)
+            except ConfigSyntaxError as e:
+                raise locate(e, text) from None
+
+        if changes is None:
+            old_result = self.result
+            self.parse(text)
+            changes = []
+            _diff(old_result, self.result, '', changes)
+        return self.result, changes
+
+    def _update_body(self, text, start, old_end, new_end):
+        """Правка внутри основного словаря: переразбираем задетые пары"""
+        delta = new_end - old_end
+        starts = self._starts
+
+        # Задетые пары [first, last]; вставка на границе относится к предыдущей паре
+        first = max(bisect_right(starts, start - 1) - 1, 0)
+        last = bisect_right(starts, old_end) - 1
+        region_start = starts[first] if starts and first > 0 else self._lbrace + 1
+        if last + 1 < len(starts):
+            region_end = starts[last + 1]
+        else:
+            region_end = self._rbrace
+        boundary = region_end + delta
+
+        # Лексер должен дойти ровно до неизменённой границы
+        tokens = [(LBRACE, '{', region_start - 1)]
+        try:
+            for tok in tokenize(text, region_start):
+                if tok[2] >= boundary:
+                    if tok[2] != boundary:
+                        return None
+                    break
+                tokens.append(tok)
+
+            state = _ParseState()
+            observer = _Observer()
+            state.consume(observer.watch(tokens))
+            # Число или true/false перед следующей парой требует запятой
+            if state.state == _SEP and region_end != self._rbrace:
+                return None
+            state.consume(observer.watch([(RBRACE, '}', boundary)]))
+        except SyntaxError:
+            return None
+        if observer.rbrace != boundary or state.result is None:
+            return None
+
+        # Новые ключи не должны совпадать с ключами соседних пар
+        untouched = last + 1
+        old_result = self.result
+        old_keys = self._keys[first:untouched]
+        region_keys = observer.keys
+        replaced = set(old_keys)
+        if len(set(region_keys)) != len(region_keys):
+            return None
+        for key in region_keys:
+            if key in old_result and key not in replaced:
+                return None
+
+        defines = (
+            [d for d in self._defines if d[0] < region_start]
+            + observer.defines
+            + [(d[0] + delta,) + d[1:] for d in self._defines if d[0] >= region_end]
+        )
+        constants, changed = self._fold_defines(defines)
+
+        region = state.result
+        region_refs = self._group_refs(observer, state)
+        # Неизвестная константа - ошибка и в значении, заменённом повторным ключом
+        for _, name, _ in observer.refs:
+            if name not in constants:
+                raise ConfigSyntaxError(f"Неопределённая константа: ${name}$", symbol=name)
+
+        # Ссылки соседних пар пересчитываются, только если их константа изменилась
+        changes = []
+        if changed:
+            outside = [refs for key, refs in self._refs.items() if key not in replaced]
+            self._apply_constants(outside, constants, changed, changes)
+
+        for refs in region_refs.values():
+            for name, _, container, key in refs:
+                (region if container is None else container)[key] = constants[name]
+
+        for key in old_keys:
+            if key not in region:
+                changes.append(('removed', key, old_result[key], None))
+        for key in region_keys:
+            if key in old_result:
+                _diff(old_result[key], region[key], key, changes)
+            else:
+                changes.append(('added', key, None, region[key]))
+
+        # Соседние пары не меняются, сдвигаются только позиции после правки
+        if region_keys == old_keys:
+            new_keys = self._keys
+            result = old_result
+            for key in region_keys:
+                result[key] = region[key]
+        else:
+            # Основной словарь собирается заново, чтобы сохранить порядок ключей
+            new_keys = self._keys[:first] + region_keys + self._keys[untouched:]
+            result = {}
+            for key in new_keys:
+                result[key] = region[key] if key in region else old_result[key]
+        for key in old_keys:
+            self._refs.pop(key, None)
+        self._refs.update(region_refs)
+
+        self.text = text
+        self.result = result
+        self.constants = constants
+        self._rbrace += delta
+        if delta:
+            self._starts = starts[:first] + observer.starts + [s + delta for s in starts[untouched:]]
+        else:
+            starts[first:untouched] = observer.starts
+        self._keys = new_keys
+        self._defines = defines
+        return changes
+
+    def _update_outside(self, text, start, old_end, new_end):
+        """Правка до или после основного словаря: там бывают только define"""
+        delta = new_end - old_end
+        before = old_end <= self._lbrace
+        if before:
+            zone_start, zone_end = 0, self._lbrace + delta
+        else:
+            zone_start, zone_end = self._rbrace + 1, len(text)
+
+        state = _ParseState()
+        observer = _Observer()
+        try:
+            tokens = []
+            for tok in tokenize(text, zone_start):
+                if tok[2] >= zone_end:
+                    # Перед словарём граница - его открывающая скобка
+                    if before and (tok[2] != zone_end or tok[0] != LBRACE):
+                        return None
+                    break
+                if tok[0] == LBRACE:
+                    return None
+                tokens.append(tok)
+            state.consume(observer.watch(tokens))
+        except SyntaxError:
+            return None
+        if state.state != 0:
+            return None
+
+        if before:
+            defines = observer.defines + [(d[0] + delta,) + d[1:] for d in self._defines if d[0] > self._lbrace]
+        else:
+            defines = [d for d in self._defines if d[0] < self._rbrace] + observer.defines
+        constants, changed = self._fold_defines(defines)
+
+        changes = []
+        self._apply_constants(self._refs.values(), constants, changed, changes)
+
+        self.text = text
+        self.constants = constants
+        self._defines = defines
+        if before:
+            self._lbrace += delta
+            self._rbrace += delta
+            self._starts = [s + delta for s in self._starts]
+        return changes
+
+    def _fold_defines(self, defines):
+        """Таблица констант по объявлениям в порядке текста и изменившиеся имена
+
+        Константы через другие константы вычисляются сразу, поэтому правка
+        одного define отмечает изменившимися и все зависящие от него.
+        """
+        constants = {}
+        for _, name, value in defines:
+            constants[name] = value
+        resolve_constants(constants)
+        old = self.constants
+        changed = {name for name in old.keys() | constants.keys()
+                   if name not in old or name not in constants or not _same(old[name], constants[name])}
+        return constants, changed
+
+    def _apply_constants(self, groups, constants, changed, changes):
+        """Пересчитываем только ссылки на изменившиеся константы"""
+        if not changed:
+            return
+        refs = [ref for group in groups for ref in group if ref[0] in changed]
+        # Сначала проверяем все ссылки, чтобы ошибка не оставила дерево изменённым наполовину
+        for name, _, _, _ in refs:
+            if name not in constants:
+                raise ConfigSyntaxError(f"Неопределённая константа: ${name}$", symbol=name)
+        result = self.result
+        for name, path, container, key in refs:
+            if container is None:
+                container = result
+            old_value = container[key]
+            container[key] = constants[name]
+            changes.append(('changed', '.'.join(path), old_value, constants[name]))
+
+    @staticmethod
+    def _group_refs(observer, state):
+        """Оставшиеся в дереве ссылки по ключам пар: (имя, путь, словарь, ключ)
+
+        Ссылки прямо в основном словаре хранятся без словаря (None): он
+        собирается заново при правках.
+        """
+        grouped = {}
+        top = state.result
+        keys = observer.keys
+        for (index, name, path), (container, key, ref) in zip(observer.refs, state.refs):
+            if container.get(key) is ref:
+                if container is top:
+                    container = None
+                grouped.setdefault(keys[index], []).append((name, path, container, key))
+        return grouped
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Плоский индекс путей результата разбора (вариант 16)
+Строится тем же проходом, что и разбор: путь через точку -> значение, имя ключа -> пути
+"""
+
+import re
+from bisect import bisect_left
+
+_MAGIC = re.compile(r'[*?\[]')
+
+
+def _segment_regex(segment):
+    """Регулярное выражение одного сегмента шаблона: * и ? не выходят за точку"""
+    out = []
+    i = 0
+    n = len(segment)
+    while i < n:
+        ch = segment[i]
+        if ch == '*':
+            out.append('[^.]*')
+        elif ch == '?':
+            out.append('[^.]')
+        elif ch == '[':
+            end = segment.find(']', i + 2)
+            if end < 0:
+                out.append(re.escape(ch))
+            else:
+                body = segment[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return ''.join(out)
+
+
+def compile_glob(pattern):
+    """Шаблон пути вида enemies.*.speed: символы шаблона действуют в пределах сегмента"""
+    return re.compile(r'\.'.join(_segment_regex(s) for s in pattern.split('.')) + r'\Z')
+
+
+class ConfigIndex:
+    """Индекс путей одного результата разбора
+
+    Заполняется парсером по мере чтения пар (ConfigParser(build_index=True)),
+    поэтому повторный обход дерева не нужен. get и offset - O(1), пути по
+    имени ключа - O(1), обход по префиксу - O(log n) на поиск начала плюс
+    число найденных путей.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._offsets = {}
+        self._names = {}
+        self._refs = []
+        self._sorted = None
+
+    def add(self, keys, value, pos):
+        """Запоминаем значение по пути keys (кортеж ключей) и его позицию в тексте"""
+        path = '.'.join(keys)
+        old = self._values.get(path, self)
+        if old is self:
+            self._names.setdefault(keys[-1], []).append(path)
+            self._sorted = None
+        elif type(old) is dict:
+            # Повторный ключ заменил словарь: его пути больше не в результате
+            self._drop_children(path)
+        self._values[path] = value
+        self._offsets[path] = pos
+
+    def add_ref(self, keys, name, pos):
+        """Ссылка $имя$: значение подставит resolve после разбора"""
+        self.add(keys, None, pos)
+        self._refs.append(('.'.join(keys), name, pos))
+
+    def resolve(self, constants):
+        """Подставляем значения констант (все они уже проверены разбором)"""
+        values = self._values
+        offsets = self._offsets
+        for path, name, pos in self._refs:
+            # Ссылка могла быть заменена повторным ключом
+            if offsets.get(path) == pos:
+                values[path] = constants[name]
+        self._refs = []
+
+    def _drop_children(self, path):
+        """Удаляем все пути внутри path"""
+        start = path + '.'
+        for child in [p for p in self._values if p.startswith(start)]:
+            del self._values[child]
+            del self._offsets[child]
+            self._names[child.rsplit('.', 1)[1]].remove(child)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, path):
+        return path in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def get(self, path, default=None):
+        """Значение по пути через точку: get('enemies.boss.health')"""
+        return self._values.get(path, default)
+
+    def offset(self, path):
+        """Позиция значения в исходном тексте (символы для str, байты для bytes)"""
+        return self._offsets[path]
+
+    def paths(self, name):
+        """Все пути, оканчивающиеся ключом name, в порядке разбора"""
+        return list(self._names.get(name, ()))
+
+    def prefix(self, prefix):
+        """Пары (путь, значение) внутри пути prefix в порядке сортировки путей"""
+        if self._sorted is None:
+            self._sorted = sorted(self._values)
+        ordered = self._sorted
+        start = prefix + '.' if prefix else ''
+        values = self._values
+        for i in range(bisect_left(ordered, start), len(ordered)):
+            path = ordered[i]
+            if not path.startswith(start):
+                break
+            yield path, values[path]
+
+    def glob(self, pattern):
+        """Пары (путь, значение) для шаблона вида enemies.*.speed
+
+        Если последний сегмент без символов шаблона, кандидаты берутся из
+        индекса имён, иначе - из префикса до первого сегмента с шаблоном.
+        """
+        segments = pattern.split('.')
+        if not _MAGIC.search(pattern):
+            if pattern in self._values:
+                yield pattern, self._values[pattern]
+            return
+
+        match = compile_glob(pattern).match
+        values = self._values
+        if not _MAGIC.search(segments[-1]):
+            candidates = self._names.get(segments[-1], ())
+        else:
+            literal = []
+            for segment in segments:
+                if _MAGIC.search(segment):
+                    break
+                literal.append(segment)
+            candidates = (path for path, _ in self.prefix('.'.join(literal)))
+        for path in candidates:
+            if match(path):
+                yield path, values[path]
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Потоковый JSON-вывод результата разбора (вариант 16)
+Текст пишется в файл частями по мере обхода дерева или прямо из событий iterparse
+"""
+
+import io
+from json.encoder import encode_basestring
+
+# Сколько кусков копить перед записью в файл
+FLUSH_PARTS = 8192
+
+_INFINITY = float('inf')
+
+
+def _float(value):
+    """Число так же, как его пишет json.dumps"""
+    if value != value:
+        return 'NaN'
+    if value == _INFINITY:
+        return 'Infinity'
+    if value == -_INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+class _Layout:
+    """Разделители одного формата: с отступом indent или компактный (indent=None)"""
+
+    def __init__(self, indent):
+        self.indent = indent
+        self.key_sep = ': ' if indent is not None else ':'
+        self._first = {}
+        self._next = {}
+        self._close = {}
+
+    def first(self, level):
+        """Перед первой парой словаря уровня level"""
+        sep = self._first.get(level)
+        if sep is None:
+            sep = self._first[level] = '\n' + ' ' * (self.indent * level) if self.indent is not None else ''
+        return sep
+
+    def next(self, level):
+        """Перед следующей парой словаря уровня level"""
+        sep = self._next.get(level)
+        if sep is None:
+            sep = self._next[level] = ',' + self.first(level)
+        return sep
+
+    def close(self, level):
+        """Закрывающая скобка словаря уровня level"""
+        sep = self._close.get(level)
+        if sep is None:
+            sep = self._close[level] = self.first(level - 1) + '}'
+        return sep
+
+
+def _write_dict(tree, parts, layout, level, out):
+    """Дописываем в parts словарь tree, открытый на уровне level; обход без рекурсии"""
+    append = parts.append
+    if not tree:
+        append('{}')
+        return
+    append('{')
+    key_sep = layout.key_sep
+    stack = [iter(tree.items())]
+    level += 1
+    first = True
+    while stack:
+        for key, value in stack[-1]:
+            append(layout.first(level) if first else layout.next(level))
+            first = False
+            append(encode_basestring(key))
+            append(key_sep)
+            kind = type(value)
+            if kind is str:
+                append(encode_basestring(value))
+            elif kind is float:
+                append(_float(value))
+            elif kind is bool:
+                append('true' if value else 'false')
+            elif kind is dict:
+                if not value:
+                    append('{}')
+                    continue
+                append('{')
+                stack.append(iter(value.items()))
+                level += 1
+                first = True
+                break
+            else:
+                raise TypeError(f"Object of type {kind.__name__} is not JSON serializable")
+            if len(parts) >= FLUSH_PARTS:
+                out.write(''.join(parts))
+                parts.clear()
+        else:
+            stack.pop()
+            append(layout.close(level))
+            level -= 1
+
+
+def write_json(tree, out, indent=2):
+    """Пишем tree в out частями; с indent=2 текст совпадает с
+    json.dumps(tree, indent=2, ensure_ascii=False) и завершается переводом строки
+
+    indent=None - компактный вывод с разделителями (',', ':'), как у
+    json.dumps(tree, separators=(',', ':')); он тоже пишется частями по
+    FLUSH_PARTS кусков, и весь текст документа в памяти не собирается.
+    """
+    parts = []
+    _write_dict(tree, parts, _Layout(indent), 0, out)
+    parts.append('\n')
+    out.write(''.join(parts))
+
+
+def write_documents(documents, out, indent=2):
+    """Несколько документов JSON-массивом; текст как у json.dumps(documents, indent=indent)"""
+    if not documents:
+        out.write('[]\n')
+        return
+    layout = _Layout(indent)
+    parts = ['[']
+    for n, tree in enumerate(documents):
+        parts.append(layout.next(1) if n else layout.first(1))
+        _write_dict(tree, parts, layout, 1, out)
+    parts.append(layout.first(0) + ']')
+    parts.append('\n')
+    out.write(''.join(parts))
+
+
+def format_json(tree, indent=2):
+    """Тот же текст одной строкой (без завершающего перевода строки)"""
+    buffer = io.StringIO()
+    write_json(tree, buffer, indent)
+    return buffer.getvalue()[:-1]
+
+
+def write_events(events, out, indent=2):
+    """Пишем JSON прямо из событий iterparse, не собирая словарь результата
+
+    events - (путь, ключ, значение) из iterparse с глубиной, не меньшей
+    глубины вложенности файла (значения - не словари, кроме пустых {}).
+    Словари открываются и закрываются по смене пути. Повторный ключ, в
+    отличие от разбора в словарь, записывается ещё раз.
+    """
+    layout = _Layout(indent)
+    key_sep = layout.key_sep
+    parts = []
+    append = parts.append
+    opened = []
+    first = True
+    append('{')
+    for path, key, value in events:
+        # Закрываем словари, которых нет в новом пути, и открываем недостающие
+        common = 0
+        limit = min(len(path), len(opened))
+        while common < limit and path[common] == opened[common]:
+            common += 1
+        while len(opened) > common:
+            append(layout.close(len(opened) + 1))
+            opened.pop()
+            first = False
+        for name in path[common:]:
+            append(layout.first(len(opened) + 1) if first else layout.next(len(opened) + 1))
+            append(encode_basestring(name))
+            append(key_sep)
+            append('{')
+            opened.append(name)
+            first = True
+
+        level = len(opened) + 1
+        append(layout.first(level) if first else layout.next(level))
+        first = False
+        append(encode_basestring(key))
+        append(key_sep)
+        kind = type(value)
+        if kind is str:
+            append(encode_basestring(value))
+        elif kind is float:
+            append(_float(value))
+        elif kind is bool:
+            append('true' if value else 'false')
+        else:
+            _write_dict(value, parts, layout, level, out)
+        if len(parts) >= FLUSH_PARTS:
+            out.write(''.join(parts))
+            parts.clear()
+
+    while opened:
+        append(layout.close(len(opened) + 1))
+        opened.pop()
+    append(layout.close(1) if not first else '}')
+    append('\n')
+    out.write(''.join(parts))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Ленивый разбор конфигураций (вариант 16)
+Вложенный словарь запоминается как участок текста и разбирается при первом обращении
+"""
+
+import re
+from collections.abc import Mapping
+
+from errors import ConfigSyntaxError, locate
+from lexer import tokenize, LBRACE, RBRACE, ARROW, STRING
+from parser import _ParseState
+
+# Всё, что влияет на поиск парной скобки: скобки, строки, константы, комментарии и define
+_SPAN_STOP = re.compile(r'[{}$]|@"|C(?=[ \t\n])|--\[\[|\(define')
+
+
+class _Span:
+    """Участок текста вложенного словаря: от { до позиции после парной }"""
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+def _skip_dict(text, pos, base=0):
+    """Конец словаря, начатого { в позиции pos, и есть ли в нём define
+
+    Токены не строятся: ищутся только скобки, а строки, константы и
+    комментарии перепрыгиваются целиком, как это делает лексер. Место
+    ошибки - смещение от начала всего текста (base - смещение text в нём).
+    """
+    search = _SPAN_STOP.search
+    start = pos
+    depth = 0
+    has_define = False
+    while True:
+        m = search(text, pos)
+        if m is None:
+            raise ConfigSyntaxError("Непарные фигурные скобки", base + start)
+        found = m.group()
+        pos = m.end()
+        if found == '{':
+            depth += 1
+        elif found == '}':
+            depth -= 1
+            if depth == 0:
+                return pos, has_define
+        elif found == '$':
+            end = text.find('$', pos)
+            if end < 0:
+                end = text.find('\n', pos)
+                raise ConfigSyntaxError(f"Незакрытая константа: ${text[pos:end if end != -1 else len(text)]}",
+                                        base + pos - 1)
+            pos = end + 1
+        elif found == '@"':
+            end = text.find('"', pos)
+            if end < 0:
+                raise ConfigSyntaxError("Незакрытая строка", base + pos - 2)
+            pos = end + 1
+        elif found == '--[[':
+            end = text.find(']]', pos)
+            pos = len(text) if end < 0 else end + 2
+        elif found == 'C':
+            end = text.find('\n', pos)
+            pos = len(text) if end < 0 else end
+        else:
+            has_define = True
+
+
+def _lazy_tokens(text, base):
+    """Токены одного уровня: вложенные словари заменены строкой-участком _Span
+
+    Глубина считается так же, как её видит разбор: до первой { и после
+    закрытия основного словаря скобки не учитываются. Словари, внутри
+    которых есть define, разбираются сразу: константы общие для всего
+    текста и нужны до первого обращения.
+    """
+    pos = 0
+    depth = 0
+    opened = False
+    prev = None
+    while True:
+        restart = None
+        for tok in tokenize(text, pos, True, base):
+            kind = tok[0]
+            if kind == LBRACE:
+                if depth == 1 and prev == ARROW:
+                    start = tok[2] - base
+                    try:
+                        end, has_define = _skip_dict(text, start, base)
+                    except ConfigSyntaxError:
+                        # Словарь не закрыт: разбираем его сразу, ошибка будет та же, что у полного разбора
+                        has_define = True
+                    if not has_define:
+                        yield (STRING, _Span(start, end), tok[2])
+                        restart = end
+                        break
+                if depth or not opened:
+                    depth += 1
+                    opened = True
+            elif kind == RBRACE and depth:
+                depth -= 1
+            prev = kind
+            yield tok
+        if restart is None:
+            return
+        pos = restart
+        prev = STRING
+
+
+class LazyNode(Mapping):
+    """Словарь результата, вложенные словари которого разбираются по требованию
+
+    Уровень разбирается при первом обращении к узлу, вложенный словарь -
+    при первом обращении к его ключу, после чего узел запоминается.
+    Синтаксические ошибки в ещё не открытых словарях проявятся при
+    обращении к ним или сразу - через validate(). Смещение ошибки (pos)
+    отсчитывается от начала всего текста; строку и столбец корневой узел
+    находит сам, для вложенного - errors.locate(e, text).
+    """
+    __slots__ = ('_text', '_base', '_constants', '_values')
+
+    def __init__(self, text, base=0, constants=None):
+        self._text = text
+        self._base = base
+        self._constants = constants
+        self._values = None
+
+    def _load(self):
+        """Разбираем свой уровень"""
+        values = self._values
+        if values is None:
+            state = _ParseState()
+            if self._constants is not None:
+                state.constants = self._constants
+            try:
+                state.consume(_lazy_tokens(self._text, self._base))
+                state.resolve_refs()
+            except ConfigSyntaxError:
+                # Первая ошибка - та же, что у полного разбора: она может быть и в пропущенном словаре
+                self._parse_all()
+                raise
+            self._constants = state.constants
+            values = self._values = state.result if state.result is not None else {}
+        return values
+
+    def __getitem__(self, key):
+        values = self._load()
+        value = values[key]
+        if type(value) is _Span:
+            value = values[key] = LazyNode(self._text[value.start:value.end],
+                                           self._base + value.start, self._constants)
+        return value
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __repr__(self):
+        return f"LazyNode({list(self._load())!r})"
+
+    def get(self, path, default=None):
+        """Значение по пути через точку: get('server.port')"""
+        node = self
+        for key in path.split('.'):
+            if not isinstance(node, Mapping) or key not in node:
+                return default
+            node = node[key]
+        return node
+
+    def to_dict(self):
+        """Полностью разобранное дерево из обычных словарей
+
+        Ещё не открытые узлы разбираются целиком за один проход.
+        """
+        if self._values is None:
+            return self._parse_all()
+        root = {}
+        stack = [(self, root)]
+        while stack:
+            node, target = stack.pop()
+            for key in node._values:
+                value = node[key]
+                if type(value) is LazyNode:
+                    if value._values is None:
+                        value = value._parse_all()
+                    else:
+                        child = {}
+                        stack.append((value, child))
+                        value = child
+                target[key] = value
+        return root
+
+    def validate(self):
+        """Полный разбор текста узла: синтаксические ошибки выявляются сразу"""
+        try:
+            self._parse_all()
+        except ConfigSyntaxError as e:
+            if self._base:
+                raise
+            raise locate(e, self._text) from None
+
+    def _parse_all(self):
+        """Обычный разбор всего текста узла"""
+        state = _ParseState()
+        if self._constants is not None:
+            state.constants = dict(self._constants)
+        state.consume(tokenize(self._text, 0, True, self._base))
+        state.resolve_refs()
+        return state.result if state.result is not None else {}
+
+
+def parse_lazy(text):
+    """Ленивый результат разбора: основной уровень разбирается сразу, остальное - по требованию"""
+    root = LazyNode(text)
+    try:
+        root._load()
+    except ConfigSyntaxError as e:
+        raise locate(e, text) from None
+    return root
+
+
+def load_lazy(path):
+    """Ленивый разбор файла"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_lazy(f.read())
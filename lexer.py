@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Лексер учебного конфигурационного языка (вариант 16)
+Один проход по тексту: комментарии пропускаются на лету, на выходе поток токенов
+"""
+
+import re
+
+from errors import ConfigSyntaxError
+
+# Типы токенов
+LBRACE = 'LBRACE'      # {
+RBRACE = 'RBRACE'      # }
+ARROW = 'ARROW'        # =>
+COMMA = 'COMMA'        # ,
+STRING = 'STRING'      # @"текст"
+NUMBER = 'NUMBER'      # [+-]?\d+\.\d+
+WORD = 'WORD'          # идентификатор, true/false и прочие слова
+CONST = 'CONST'        # $имя$
+DEFINE = 'DEFINE'      # (define
+INCLUDE = 'INCLUDE'    # (include
+RPAREN = 'RPAREN'      # )
+JUNK = 'JUNK'          # любой другой символ
+EOF = 'EOF'
+
+# Пробелы и комментарии: C до конца строки (сам перевод строки не съедается), --[[ ... ]] (незакрытый - до конца текста)
+_SKIP = re.compile(r'(?:\s+|C(?=[ \t\n])[^\n]*|--\[\[(?:.*?\]\]|.*))*', re.DOTALL)
+# Только законченные пробелы и комментарии: после них остаётся открытый комментарий
+_SKIP_DONE = re.compile(r'(?:\s+|C(?=[ \t\n])[^\n]*(?=\n)|--\[\[.*?\]\])*', re.DOTALL)
+# Начало числа, которое может продолжиться в следующем куске
+_NUMBER_HEAD = re.compile(r'[+-]?\d*\.?\d*')
+_STRING = re.compile(r'@"([^"]*)"')
+_CONST = re.compile(r'\$([^$]*)\$')
+_NUMBER = re.compile(r'[+-]?\d+\.\d+')
+# Слово не захватывает C, за которым начинается однострочный комментарий;
+# цикл развёрнут: без альтернативы на каждом символе слово сопоставляется втрое быстрее
+_WORD = re.compile(r'(?:[^\WC]|C(?![ \t\n]))[^\WC]*(?:C(?![ \t\n])[^\WC]*)*')
+# Пробелы без комментариев: полный _SKIP нужен, только если дальше C или -
+_SPACE = re.compile(r'\s*')
+_COMMENT_START = frozenset('C-')
+# Символы, с которых может начаться число (и не-ASCII цифры Unicode)
+_NUMBER_START = frozenset('+-.0123456789')
+
+_SIMPLE = {'{': LBRACE, '}': RBRACE, ',': COMMA, ')': RPAREN}
+
+
+# Самый длинный токен фиксированной длины - (include
+_LOOKAHEAD = 8
+
+
+def tokenize(text, pos=0, final=True, base=0):
+    """Разбиваем текст на токены (тип, значение, позиция)
+
+    При final=False текст считается началом потока: токены, которые могут
+    продолжиться в следующем куске, не выдаются. Вместо них последним идёт
+    маркер (None, закрывающая последовательность, позиция), с которой нужно
+    продолжить после подачи новых данных. Закрывающая последовательность
+    задана, если с этой позиции начинается незакрытый комментарий, строка
+    или константа: тогда их не нужно просматривать заново, достаточно искать
+    её в новых данных. base добавляется к позициям токенов.
+    """
+    skip = _SKIP.match
+    space = _SPACE.match
+    comment_start = _COMMENT_START
+    number_start = _NUMBER_START
+    simple = _SIMPLE
+    n = len(text)
+    if final:
+        stop = n
+        tail = n + 1
+    else:
+        stop = n - _LOOKAHEAD
+        tail = n
+
+    while True:
+        start = pos
+        pos = space(text, pos).end()
+        if pos < n and text[pos] in comment_start:
+            pos = skip(text, pos).end()
+        if pos >= stop:
+            if final:
+                yield (EOF, None, base + n)
+            elif pos < n:
+                yield (None, None, pos)
+            else:
+                # Комментарий, дошедший до конца куска, может быть не закрыт
+                pos = _SKIP_DONE.match(text, start).end()
+                if pos >= n:
+                    yield (None, None, pos)
+                else:
+                    yield (None, '\n' if text[pos] == 'C' else ']]', pos)
+            return
+
+        ch = text[pos]
+
+        # Односимвольные токены
+        kind = simple.get(ch)
+        if kind is not None:
+            yield (kind, ch, base + pos)
+            pos += 1
+            continue
+
+        # Строка @"..."
+        if ch == '@' and text.startswith('@"', pos):
+            m = _STRING.match(text, pos)
+            if m is None:
+                if not final:
+                    yield (None, '"', pos)
+                    return
+                raise ConfigSyntaxError("Незакрытая строка", base + pos)
+            yield (STRING, m.group(1), base + pos)
+            pos = m.end()
+            continue
+
+        # Константа $имя$
+        if ch == '$':
+            m = _CONST.match(text, pos)
+            if m is None:
+                if not final:
+                    yield (None, '$', pos)
+                    return
+                end = text.find('\n', pos)
+                rest = text[pos + 1:end if end != -1 else n]
+                raise ConfigSyntaxError(f"Незакрытая константа: ${rest}", base + pos)
+            yield (CONST, m.group(1), base + pos)
+            pos = m.end()
+            continue
+
+        if ch == '=' and text.startswith('=>', pos):
+            yield (ARROW, '=>', base + pos)
+            pos += 2
+            continue
+
+        if ch == '(':
+            if text.startswith('(define', pos):
+                yield (DEFINE, '(define', base + pos)
+                pos += 7
+                continue
+            if text.startswith('(include', pos):
+                yield (INCLUDE, '(include', base + pos)
+                pos += 8
+                continue
+
+        # Число или слово; дошедшее до конца куска может продолжиться
+        if ch in number_start or ch >= '\x80':
+            m = _NUMBER.match(text, pos)
+            if m is not None:
+                end = m.end()
+                if end >= tail:
+                    yield (None, None, pos)
+                    return
+                yield (NUMBER, float(m.group()), base + pos)
+                pos = end
+                continue
+
+            # Длинное число, разрезанное границей куска, похоже на слово или знак
+            if not final and _NUMBER_HEAD.match(text, pos).end() >= n:
+                yield (None, None, pos)
+                return
+
+        m = _WORD.match(text, pos)
+        if m is not None:
+            end = m.end()
+            if end >= tail:
+                yield (None, None, pos)
+                return
+            yield (WORD, m.group(), base + pos)
+            pos = end
+            continue
+
+        yield (JUNK, ch, base + pos)
+        pos += 1
+
+
+# Те же токены для bytes, memoryview и mmap: все структурные символы ASCII,
+# поэтому в UTF-8 декодируются только значения строк, ключей и констант.
+# \s для байтов - только ASCII-пробелы, поэтому перечисляем все, что видит str.isspace
+_SKIP_B = re.compile(rb'(?:[ \t\n\r\f\v\x1c-\x1f]+|C(?=[ \t\n])[^\n]*|--\[\[(?:.*?\]\]|.*))*', re.DOTALL)
+_SKIP_DONE_B = re.compile(rb'(?:[ \t\n\r\f\v\x1c-\x1f]+|C(?=[ \t\n])[^\n]*(?=\n)|--\[\[.*?\]\])*', re.DOTALL)
+_NUMBER_HEAD_B = re.compile(rb'[+-]?[\d\x80-\xff]*\.?[\d\x80-\xff]*')
+_STRING_B = re.compile(rb'@"([^"]*)"')
+_CONST_B = re.compile(rb'\$([^$]*)\$')
+# \d в str - любые цифры Unicode: многобайтовые кандидаты проверяются после декодирования
+_NUMBER_B = re.compile(rb'[+-]?[\d\x80-\xff]+\.[\d\x80-\xff]+')
+# Байты старше 0x7f - части многобайтовых символов, относим их к слову,
+# а затем проверяем декодированный кусок по правилам tokenize
+_WORD_B = re.compile(rb'(?:[^\WC]|C(?![ \t\n])|[\x80-\xff])[0-9A-BD-Z_a-z\x80-\xff]*'
+                     rb'(?:C(?![ \t\n])[0-9A-BD-Z_a-z\x80-\xff]*)*')
+_SPACE_B = re.compile(rb'[ \t\n\r\f\v\x1c-\x1f]*')
+_COMMENT_START_B = frozenset(b'C-')
+_NUMBER_START_B = frozenset(b'+-.0123456789')
+_LINE_B = re.compile(rb'[^\n]*')
+
+_SIMPLE_B = {ord('{'): LBRACE, ord('}'): RBRACE, ord(','): COMMA, ord(')'): RPAREN}
+_AT = ord('@')
+_DOLLAR = ord('$')
+_EQUALS = ord('=')
+_LPAREN = ord('(')
+_C = ord('C')
+
+
+def tokenize_bytes(data, pos=0, final=True, base=0):
+    """Разбиваем байтовый текст в UTF-8 на токены без декодирования всего текста
+
+    Принимает bytes, bytearray, memoryview и mmap. Значения токенов те же,
+    что у tokenize, позиции считаются в байтах.
+    """
+    skip = _SKIP_B.match
+    space = _SPACE_B.match
+    comment_start = _COMMENT_START_B
+    number_start = _NUMBER_START_B
+    simple = _SIMPLE_B
+    # Повторяющиеся слова декодируются один раз
+    words = {}
+    n = len(data)
+    if final:
+        stop = n
+        tail = n + 1
+    else:
+        stop = n - _LOOKAHEAD
+        tail = n
+
+    while True:
+        start = pos
+        pos = space(data, pos).end()
+        if pos < n and data[pos] in comment_start:
+            pos = skip(data, pos).end()
+        if pos >= stop:
+            if final:
+                yield (EOF, None, base + n)
+            elif pos < n:
+                yield (None, None, pos)
+            else:
+                pos = _SKIP_DONE_B.match(data, start).end()
+                if pos >= n:
+                    yield (None, None, pos)
+                else:
+                    yield (None, b'\n' if data[pos] == _C else b']]', pos)
+            return
+
+        ch = data[pos]
+
+        kind = simple.get(ch)
+        if kind is not None:
+            yield (kind, chr(ch), base + pos)
+            pos += 1
+            continue
+
+        if ch == _AT and data[pos + 1:pos + 2] == b'"':
+            m = _STRING_B.match(data, pos)
+            if m is None:
+                if not final:
+                    yield (None, b'"', pos)
+                    return
+                raise ConfigSyntaxError("Незакрытая строка", base + pos)
+            yield (STRING, m.group(1).decode('utf-8'), base + pos)
+            pos = m.end()
+            continue
+
+        if ch == _DOLLAR:
+            m = _CONST_B.match(data, pos)
+            if m is None:
+                if not final:
+                    yield (None, b'$', pos)
+                    return
+                rest = _LINE_B.match(data, pos + 1).group().decode('utf-8', 'replace')
+                raise ConfigSyntaxError(f"Незакрытая константа: ${rest}", base + pos)
+            yield (CONST, m.group(1).decode('utf-8'), base + pos)
+            pos = m.end()
+            continue
+
+        if ch == _EQUALS and data[pos + 1:pos + 2] == b'>':
+            yield (ARROW, '=>', base + pos)
+            pos += 2
+            continue
+
+        if ch == _LPAREN:
+            if data[pos:pos + 7] == b'(define':
+                yield (DEFINE, '(define', base + pos)
+                pos += 7
+                continue
+            if data[pos:pos + 8] == b'(include':
+                yield (INCLUDE, '(include', base + pos)
+                pos += 8
+                continue
+
+        if ch in number_start or ch >= 0x80:
+            m = _NUMBER_B.match(data, pos)
+            if m is not None:
+                end = m.end()
+                if end >= tail:
+                    yield (None, None, pos)
+                    return
+                raw = m.group()
+                if raw.isascii():
+                    yield (NUMBER, float(raw), base + pos)
+                    pos = end
+                    continue
+                m = _NUMBER.match(raw.decode('utf-8'))
+                if m is not None:
+                    yield (NUMBER, float(m.group()), base + pos)
+                    pos += len(m.group().encode('utf-8'))
+                    continue
+
+            if not final and _NUMBER_HEAD_B.match(data, pos).end() >= n:
+                yield (None, None, pos)
+                return
+
+        m = _WORD_B.match(data, pos)
+        if m is not None:
+            end = m.end()
+            if end >= tail:
+                yield (None, None, pos)
+                return
+            raw = m.group()
+            word = words.get(raw)
+            if word is None:
+                word = raw.decode('utf-8')
+                if not raw.isascii() and _WORD.fullmatch(word) is None:
+                    # Не всякий многобайтовый символ - буква: пробел или мусор, как в str
+                    m = _WORD.match(word)
+                    if m is not None:
+                        word = m.group()
+                        yield (WORD, word, base + pos)
+                        pos += len(word.encode('utf-8'))
+                        continue
+                    ch = word[0]
+                    if not ch.isspace():
+                        yield (JUNK, ch, base + pos)
+                    pos += len(ch.encode('utf-8'))
+                    continue
+                words[raw] = word
+            yield (WORD, word, base + pos)
+            pos = end
+            continue
+
+        yield (JUNK, chr(ch), base + pos)
+        pos += 1
@@ -4,295 +4,875 @@
 Полная версия с поддержкой констант и обработкой ошибок
 """
 
-import json
+import errno
+import mmap
+import os
 import re
-
-
-class ConfigParser:
-    def __init__(self):
+import threading
+from collections import ChainMap
+from itertools import chain
+
+from lexer import (
+    tokenize, tokenize_bytes, LBRACE, RBRACE, ARROW, COMMA, STRING, NUMBER, WORD, CONST,
+    DEFINE, INCLUDE, RPAREN, JUNK, EOF,
+)
+from errors import ConfigSyntaxError, locate
+from index import ConfigIndex
+from symbols import _ConstRef, SymbolTable, lookup, resolve_constants
+
+_IDENT = re.compile(r'[_a-z][_a-z0-9]*\Z')
+
+# Размер блока при чтении файла частями
+BLOCK_SIZE = 1 << 16
+
+# Концы комментариев, которые ждёт незаконченный поток
+_BLOCK_END = (']]', b']]')
+_LINE_END = ('\n', b'\n')
+
+# Состояния разбора
+_TOP = 0         # до основного словаря
+_KEY = 1         # ожидается ключ или }
+_ARROW = 2       # ожидается =>
+_VALUE = 3       # ожидается значение
+_SEP = 4         # после числа или true/false: , или }
+_DONE = 5        # основной словарь закрыт
+_DEF_NAME = 6    # (define имя
+_DEF_VALUE = 7   # (define имя значение
+_DEF_CLOSE = 8   # (define имя значение)
+_INC_PATH = 9    # (include
+_INC_CLOSE = 10  # (include @"путь"
+_SKIP_PAIR = 11  # после ошибки: до , или } текущего словаря
+_SKIP_DEFINE = 12  # после ошибки в define или include: до )
+
+# Токены, которые после ошибки разбираются ещё раз в режиме пропуска
+_RESYNC = (LBRACE, RBRACE, COMMA, RPAREN)
+
+
+def _load_includes(path, includes, max_errors=1):
+    """Константы включений файла path и полные пути всех включённых файлов
+
+    Включения загружает include.ConfigLoader: путь отсчитывается от
+    каталога файла, из двух включений важнее более позднее, циклическое
+    включение - SyntaxError.
+    """
+    # include сам импортирует этот модуль, поэтому импорт - при первом включении
+    from include import ConfigLoader
+
+    folder = os.path.dirname(os.path.realpath(path))
+    targets = list(dict.fromkeys(os.path.realpath(os.path.join(folder, name)) for name in includes))
+    constants = {}
+    files = set()
+    with ConfigLoader(max_errors=max_errors) as loader:
+        try:
+            loaded = loader.load_many(targets)
+        except FileNotFoundError as e:
+            if e.filename in targets:
+                raise FileNotFoundError(
+                    errno.ENOENT, f"Включаемый файл не найден (из {os.fspath(path)})", e.filename) from None
+            raise
+        for config in loaded:
+            constants.update(config.constants)
+        for target in targets:
+            files |= loader.dependencies(target)
+    return constants, sorted(files)
+
+
+def _scanner(source):
+    """Лексер под тип источника: str или байты (bytes, memoryview, mmap)"""
+    return tokenize if isinstance(source, str) else tokenize_bytes
+
+
+def _replay(tokens, error=None):
+    """Токены из списка, затем ошибка лексера, на которой он остановился"""
+    yield from tokens
+    if error is not None:
+        raise error
+
+
+def _slices(text, size=BLOCK_SIZE):
+    """Текст в памяти кусками по size - для разбора со статистикой тем же путём, что файл"""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def _timed_blocks(f, block_size, stats):
+    """Куски файла, время чтения - в этап read статистики"""
+    blocks = _read_blocks(f, block_size)
+    while True:
+        with stats.phase('read'):
+            chunk = next(blocks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _read_blocks(f, block_size):
+    """Куски файла до конца; подходит и для текстового, и для двоичного режима"""
+    while True:
+        chunk = f.read(block_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class _EventDict(dict):
+    """Словарь не глубже уровня событий iterparse: пары уходят в очередь
+
+    Вложенные _EventDict уже отдали свои пары сами, поэтому пропускаются;
+    пустой вложенный словарь отдаётся событием со значением {}.
+    """
+    __slots__ = ('path', 'events', 'constants', 'empty')
+
+    def __init__(self, path, events, constants):
+        super().__init__()
+        self.path = path
+        self.events = events
+        self.constants = constants
+        self.empty = True
+
+    def __setitem__(self, key, value):
+        self.empty = False
+        if type(value) is _EventDict:
+            if value.empty:
+                self.events.append((self.path, key, {}))
+            return
+        if type(value) is _ConstRef:
+            value = lookup(self.constants, value.name)
+        self.events.append((self.path, key, value))
+
+
+class _ParseState:
+    """Состояние одного разбора; позволяет продолжать разбор по кускам"""
+
+    def __init__(self, event_level=-1, index=None, documents=False, max_errors=1):
         self.constants = {}
+        self.refs = []
+        # Есть ли define через другую константу: (define b $a$)
+        self.chained = False
+        self.result = None
+        # С documents=True после основного словаря разбираются и следующие
+        self.documents = [] if documents else None
+        # Пути (include @"путь") в порядке появления
+        self.includes = []
+        # Файл разбираемого текста: от его каталога ищутся включения (None - текст без файла)
+        self.source = None
+        # Вызывается с путём каждого закрытого (include ...) - для событий iterparse
+        self.on_include = None
+        self.stack = []
+        self.keys = []
+        self.state = _TOP
+        self.key = None
+        self.def_name = None
+        self.def_value = None
+        self.def_return = _TOP
+        # Необработанный хвост потока и его позиция в исходном тексте
+        self.buffer = ''
+        self.offset = 0
+        # Чего ждёт незакрытый комментарий, строка или константа в конце потока
+        self.closer = None
+        self.pending = []
+        # Уровень вложенности, пары которого отдаются событиями (-1 - выключено)
+        self.event_level = event_level
+        self.events = []
+        # ConfigIndex, заполняемый по мере разбора (None - не строится)
+        self.index = index
+        # Собранные ошибки, если разбор не останавливается на первой (max_errors != 1)
+        self.errors = [] if max_errors != 1 else None
+        self.max_errors = max_errors
+        # Глубина вложенных скобок, пропускаемых после ошибки
+        self.skip = 0
+        # ParseStats, если лексер и разбор каждого куска замеряются (None - не замеряются)
+        self.stats = None
+
+    def feed(self, chunk):
+        """Разбираем все токены куска, которые уже не могут продолжиться
+
+        Незакрытые комментарий, строка или константа не просматриваются
+        заново с каждым куском: в новых данных ищется только их конец.
+        """
+        if not isinstance(chunk, (str, bytes)):
+            chunk = bytes(chunk)
+        closer = self.closer
+        pos = 0
+        if closer is None:
+            buffer = self.buffer + chunk if self.buffer else chunk
+        elif closer in _BLOCK_END:
+            # От комментария --[[ хранится только последний символ на случай ]]
+            buffer = self.buffer + chunk
+            pos = buffer.find(closer)
+            if pos < 0:
+                self._drop(buffer, len(buffer) - 1)
+                return
+            pos += 2
+        elif closer in _LINE_END:
+            buffer = chunk
+            pos = chunk.find(closer)
+            if pos < 0:
+                self.offset += len(chunk)
+                return
+        else:
+            # Куски строки или константы склеиваются один раз, когда пришёл её конец
+            self.pending.append(chunk)
+            if chunk.find(closer) < 0:
+                return
+            buffer = chunk[:0].join(self.pending)
+            self.pending = []
+
+        stats = self.stats
+        if stats is None:
+            tokens = list(_scanner(buffer)(buffer, pos, False, self.offset))
+        else:
+            with stats.phase('tokenize'):
+                tokens = list(_scanner(buffer)(buffer, pos, False, self.offset))
+        _, closer, hold = tokens.pop()
+        if closer in _BLOCK_END:
+            self._drop(buffer, max(hold + 4, len(buffer) - 1))
+        elif closer in _LINE_END:
+            self._drop(buffer, len(buffer))
+        else:
+            self._drop(buffer, hold)
+            if closer is not None:
+                self.pending = [self.buffer]
+        self.closer = closer
+        if stats is None:
+            self.consume(tokens)
+        else:
+            stats.count_tokens(tokens)
+            with stats.phase('parse'):
+                self.consume(tokens)
+
+    def _drop(self, buffer, keep):
+        """Оставляем в буфере только хвост, начиная с позиции keep"""
+        self.buffer = buffer[keep:]
+        self.offset += keep
+
+    def close(self):
+        """Дочитываем хвост потока"""
+        buffer = self.buffer
+        if self.pending:
+            buffer = buffer[:0].join(self.pending)
+        elif self.closer is not None:
+            # Незакрытый комментарий тянется до конца текста
+            self.offset += len(buffer)
+            buffer = buffer[:0]
+        self.buffer = ''
+        self.pending = []
+        self.closer = None
+        tokens = _scanner(buffer)(buffer, 0, True, self.offset)
+        stats = self.stats
+        if stats is None:
+            self.consume(tokens)
+            return
+        # Ошибка лексера - после последнего токена, как при обычном разборе:
+        # синтаксическая ошибка раньше неё выигрывает
+        scanned = []
+        error = None
+        with stats.phase('tokenize'):
+            try:
+                scanned.extend(tokens)
+            except ConfigSyntaxError as e:
+                error = e
+        stats.count_tokens(scanned)
+        with stats.phase('parse'):
+            self.consume(_replay(scanned, error))
+
+    def consume(self, tokens):
+        """Разбираем поток токенов за один проход без рекурсии
+
+        Открытые словари лежат в явном стеке, поэтому глубина вложенности
+        не ограничена стеком вызовов, а каждый токен обрабатывается один раз.
+        Словарь попадает в родителя, когда закрывается его скобка.
+
+        Ошибка несёт смещение токена, на котором она найдена. При сборе
+        ошибок (errors не None) разбор продолжается: до запятой или
+        закрывающей скобки текущего словаря, после ошибки в define или
+        include - до её ). Токен-скобка, на котором нашлась ошибка,
+        разбирается ещё раз уже в режиме пропуска.
+        """
+        constants = self.constants
+        refs = self.refs
+        ident = _IDENT.match
+        stack = self.stack
+        keys = self.keys
+        current = stack[-1] if stack else None
+        state = self.state
+        key = self.key
+        def_name = self.def_name
+        def_value = self.def_value
+        def_return = self.def_return
+        event_level = self.event_level
+        index = self.index
+        skip = self.skip
+        tokens = iter(tokens)
+        kind = pos = None
+
+        while True:
+            try:
+                for kind, value, pos in tokens:
+                    if state == _KEY:
+                        if kind == WORD:
+                            if not ident(value):
+                                raise ConfigSyntaxError(f"Неправильный идентификатор: {value}", pos)
+                            key = value
+                            state = _ARROW
+                        elif kind == RBRACE:
+                            done = stack.pop()
+                            if stack:
+                                current = stack[-1]
+                                current[keys.pop()] = done
+                            else:
+                                current = None
+                                state = self._document_done(done)
+                        elif kind == COMMA or kind == JUNK:
+                            # Лишние запятые и посторонние символы между парами пропускаем
+                            pass
+                        elif kind == DEFINE:
+                            def_return = _KEY
+                            state = _DEF_NAME
+                        elif kind == INCLUDE:
+                            def_return = _KEY
+                            state = _INC_PATH
+                        elif kind == EOF:
+                            raise ConfigSyntaxError("Непарные фигурные скобки", pos)
+                        else:
+                            raise ConfigSyntaxError(f"Неправильный идентификатор: {value}", pos)
+
+                    elif state == _ARROW:
+                        if kind != ARROW:
+                            raise ConfigSyntaxError(f"Ожидалось => после ключа {key}", pos)
+                        state = _VALUE
+
+                    elif state == _VALUE:
+                        # Строка
+                        if kind == STRING:
+                            current[key] = value
+                            state = _KEY
+                        # Словарь
+                        elif kind == LBRACE:
+                            if len(stack) <= event_level:
+                                current = self.open_dict(current, key, pos)
+                            else:
+                                current = {}
+                            keys.append(key)
+                            stack.append(current)
+                            state = _KEY
+                        # Константа
+                        elif kind == CONST:
+                            ref = _ConstRef(value)
+                            refs.append((current, key, ref))
+                            current[key] = ref
+                            state = _KEY
+                        # Число или true/false
+                        elif kind == NUMBER:
+                            current[key] = value
+                            state = _SEP
+                        elif kind == WORD and value == 'true':
+                            current[key] = True
+                            state = _SEP
+                        elif kind == WORD and value == 'false':
+                            current[key] = False
+                            state = _SEP
+                        elif kind == EOF:
+                            raise ConfigSyntaxError("Непарные фигурные скобки", pos)
+                        else:
+                            raise ConfigSyntaxError(f"Непонятное значение: {value}", pos)
+                        if index is not None:
+                            if kind == LBRACE:
+                                index.add(tuple(keys), current, pos)
+                            elif kind == CONST:
+                                index.add_ref((*keys, key), value, pos)
+                            else:
+                                index.add((*keys, key), current[key], pos)
+
+                    elif state == _SEP:
+                        # После числа и true/false обязательна запятая или конец словаря
+                        if kind == COMMA:
+                            state = _KEY
+                        elif kind == RBRACE:
+                            done = stack.pop()
+                            if stack:
+                                current = stack[-1]
+                                current[keys.pop()] = done
+                                state = _KEY
+                            else:
+                                current = None
+                                state = self._document_done(done)
+                        elif kind == EOF:
+                            raise ConfigSyntaxError("Непарные фигурные скобки", pos)
+                        else:
+                            raise ConfigSyntaxError(f"Непонятное значение: {value}", pos)
+
+                    elif state == _TOP or state == _DONE:
+                        # Вне основного словаря важны только define, include и первая {
+                        # (в режиме документов - каждая {)
+                        if kind == DEFINE:
+                            def_return = state
+                            state = _DEF_NAME
+                        elif kind == INCLUDE:
+                            def_return = state
+                            state = _INC_PATH
+                        elif kind == LBRACE and (state == _TOP or self.documents is not None):
+                            if event_level >= 0:
+                                current = self.open_dict(None, None, pos)
+                            else:
+                                current = {}
+                            stack.append(current)
+                            state = _KEY
+
+                    elif state == _DEF_NAME:
+                        if kind != WORD or not ident(value):
+                            raise ConfigSyntaxError(
+                                f"Неправильное имя константы: {value if kind == WORD else ''}", pos)
+                        def_name = value
+                        state = _DEF_VALUE
+
+                    elif state == _DEF_VALUE:
+                        if kind == CONST:
+                            value = _ConstRef(value)
+                            self.chained = True
+                        elif kind != STRING and kind != NUMBER:
+                            raise ConfigSyntaxError(
+                                f"Некорректное число в define: {value if value is not None else ''}", pos)
+                        def_value = value
+                        state = _DEF_CLOSE
+
+                    elif state == _DEF_CLOSE:
+                        if kind != RPAREN:
+                            raise ConfigSyntaxError(f"Ожидалась ) после значения константы {def_name}", pos)
+                        constants[def_name] = def_value
+                        state = def_return
+
+                    elif state == _INC_PATH:
+                        if kind != STRING:
+                            raise ConfigSyntaxError(
+                                f"Ожидался путь @\"...\" после (include: {value if value is not None else ''}", pos)
+                        self.includes.append(value)
+                        state = _INC_CLOSE
+
+                    elif state == _INC_CLOSE:
+                        if kind != RPAREN:
+                            raise ConfigSyntaxError(f"Ожидалась ) после (include @\"{self.includes[-1]}\"", pos)
+                        if self.on_include is not None:
+                            self.on_include(self.includes[-1])
+                        state = def_return
+
+                    elif state == _SKIP_PAIR:
+                        # После ошибки: до , или } текущего словаря, вложенные скобки считаются
+                        if kind == LBRACE:
+                            skip += 1
+                        elif kind == RBRACE:
+                            if skip:
+                                skip -= 1
+                            else:
+                                done = stack.pop()
+                                if stack:
+                                    current = stack[-1]
+                                    current[keys.pop()] = done
+                                    state = _KEY
+                                else:
+                                    current = None
+                                    state = self._document_done(done)
+                        elif kind == COMMA and not skip:
+                            state = _KEY
+                        elif kind == EOF:
+                            raise ConfigSyntaxError("Непарные фигурные скобки", pos)
+
+                    elif state == _SKIP_DEFINE:
+                        # После ошибки в define или include: до ), скобка словаря её прерывает
+                        if kind == RPAREN:
+                            state = def_return
+                        elif kind == LBRACE or kind == RBRACE or kind == COMMA or kind == EOF:
+                            state = def_return
+                            tokens = chain(((kind, value, pos),), tokens)
+                            break
+                else:
+                    break
+            except ConfigSyntaxError as error:
+                if error.pos is None and error.symbol is None:
+                    # Ошибка контейнера (например, схемы) - место текущего токена
+                    error.pos = pos
+                if self.errors is None:
+                    raise
+                self._collect(error)
+                if kind == EOF or error.pos != pos:
+                    # Конец текста или ошибка лексера: токенов дальше нет
+                    break
+                if state == _DEF_NAME or state == _DEF_VALUE or state == _DEF_CLOSE \
+                        or state == _INC_PATH or state == _INC_CLOSE:
+                    state = _SKIP_DEFINE
+                else:
+                    state = _SKIP_PAIR
+                    skip = 0
+                if kind in _RESYNC:
+                    tokens = chain(((kind, value, pos),), tokens)
+
+        self.state = state
+        self.key = key
+        self.def_name = def_name
+        self.def_value = def_value
+        self.def_return = def_return
+        self.skip = skip
+
+    def open_dict(self, parent, key, pos):
+        """Контейнер словаря уровня не глубже event_level (parent None - основной)
+
+        Здесь - _EventDict для iterparse; подклассы строят свои контейнеры:
+        им передаются пары словаря через __setitem__, закрытый вложенный
+        словарь - тоже парой в родителя.
+        """
+        path = (*self.keys, key) if parent is not None else ()
+        return _EventDict(path, self.events, self.constants)
+
+    def _collect(self, error):
+        """Запоминаем ошибку; на max_errors-й разбор останавливается"""
+        errors = self.errors
+        errors.append(error)
+        if self.max_errors is not None and len(errors) >= self.max_errors:
+            raise self.failure(error)
+
+    def failure(self, error=None):
+        """Ошибка, которую выбрасывает разбор: первая из собранных, в errors - все
+
+        error - ошибка, прервавшая разбор (например, лексера при чтении
+        куска); без сбора ошибок она и возвращается.
+        """
+        errors = self.errors
+        if errors is None:
+            return error
+        if error is not None and not any(e is error for e in errors):
+            errors.append(error)
+        head = errors[0]
+        head.errors = errors
+        return head
+
+    def _document_done(self, done):
+        """Закрыт словарь верхнего уровня: первый - результат, остальные - документы"""
+        if self.result is None:
+            self.result = done
+        if self.documents is not None:
+            self.documents.append(done)
+        return _DONE
+
+    def resolve_refs(self):
+        """Подставляем значения констант вместо ссылок $имя$"""
+        constants = self.constants
+        if self.chained:
+            resolve_constants(constants)
+            self.chained = False
+        for container, key, ref in self.refs:
+            if ref.name not in constants:
+                raise ConfigSyntaxError(f"Неопределённая константа: ${ref.name}$", symbol=ref.name)
+            # Ссылка, заменённая повторным ключом, не подставляется
+            if container.get(key) is ref:
+                container[key] = constants[ref.name]
+        self.refs = []
+
+
+class _LastParse(threading.local):
+    """Итоги последнего разбора и незаконченный feed() - свои в каждом потоке"""
 
-    def parse(self, text):
-        """Основной метод парсинга"""
-        # 1. Собираем константы
-        self._extract_constants(text)
-
-        # 2. Удаляем комментарии
-        text = self._remove_comments_safe(text)
-
-        # 3. Удаляем define из текста
-        text = re.sub(r'\(define[^)]+\)', '', text)
-
-        # 4. Парсим основной словарь
-        result = self._parse_main_dict(text)
-
-        return result
-
-    def _remove_comments_safe(self, text):
-        """Удаляем комментарии, но не внутри строк"""
-        result = []
-        i = 0
-        in_string = False
-
-        while i < len(text):
-            # Проверяем начало строки @"
-            if text[i:i + 2] == '@"' and not in_string:
-                in_string = True
-                result.append(text[i])
-                i += 1
-                continue
-
-            # Конец строки
-            if text[i] == '"' and in_string:
-                in_string = False
-
-            # Комментарии только вне строк
-            if not in_string:
-                # Однострочный комментарий C
-                if text[i] == 'C' and (i + 1 < len(text)) and text[i + 1] in ' \t\n':
-                    # Пропускаем до конца строки
-                    while i < len(text) and text[i] != '\n':
-                        i += 1
-                    continue
-
-                # Многострочный комментарий --[[
-                if text[i:i + 4] == '--[[':
-                    # Пропускаем до ]]
-                    i += 4
-                    while i < len(text) and text[i:i + 2] != ']]':
-                        i += 1
-                    i += 2  # Пропускаем ]]
-                    continue
-
-            result.append(text[i])
-            i += 1
-
-        return ''.join(result)
-
-    def _extract_constants(self, text):
-        """Извлекаем константы (define ...)"""
+    def __init__(self):
         self.constants = {}
+        self.symbols = None
+        self.includes = []
+        self.dependencies = []
+        self.index = None
+        self.stats = None
+        self.stream = None
 
-        i = 0
-        while i < len(text):
-            if text[i:i + 7] == '(define':
-                i += 7
 
-                # Пропускаем пробелы
-                while i < len(text) and text[i] in ' \t\n\r':
-                    i += 1
+def _per_thread(name, doc):
+    """Атрибут ConfigParser, который хранится отдельно для каждого потока"""
 
-                # Имя константы
-                name_start = i
-                while i < len(text) and (text[i].isalpha() or text[i] == '_' or text[i].isdigit()):
-                    i += 1
-                const_name = text[name_start:i]
+    def get(self):
+        return getattr(self._last, name)
 
-                if not const_name or not re.match(r'^[_a-z][_a-z0-9]*$', const_name):
-                    raise SyntaxError(f"Неправильное имя константы: {const_name}")
-
-                # Пропускаем пробелы
-                while i < len(text) and text[i] in ' \t\n\r':
-                    i += 1
-
-                # Значение константы
-                value_start = i
-
-                # Строка
-                if text[i:i + 2] == '@"':
-                    i += 2
-                    while i < len(text) and text[i] != '"':
-                        i += 1
-                    const_value = text[value_start + 2:i]
-                    i += 1  # Пропускаем "
-
-                # Число
-                else:
-                    start_num = i
-                    if text[i] in '+-':
-                        i += 1
+    def set(self, value):
+        setattr(self._last, name, value)
 
-                    while i < len(text) and (text[i].isdigit() or text[i] == '.'):
-                        i += 1
+    return property(get, set, doc=doc)
 
-                    num_str = text[start_num:i]
-                    if not re.match(r'^[+-]?\d+\.\d+$', num_str):
-                        raise SyntaxError(f"Некорректное число в define: {num_str}")
 
-                    const_value = float(num_str)
-
-                # Сохраняем константу
-                self.constants[const_name] = const_value
-
-                # Ищем закрывающую скобку
-                while i < len(text) and text[i] != ')':
-                    i += 1
-                i += 1
-            else:
-                i += 1
-
-    def _parse_main_dict(self, text):
-        """Парсим основной словарь"""
-        # Ищем первый словарь { ... }
-        start = text.find('{')
-        if start == -1:
-            return {}
-
-        # Находим парную закрывающую скобку
-        depth = 0
-        end = start
-
-        for i in range(start, len(text)):
-            if text[i] == '{':
-                depth += 1
-            elif text[i] == '}':
-                depth -= 1
-                if depth == 0:
-                    end = i + 1
-                    break
-
-        if depth != 0:
-            raise SyntaxError("Непарные фигурные скобки")
-
-        dict_text = text[start:end]
-        return self._parse_dict(dict_text)
+class ConfigParser:
+    """Однопроходный парсер; один экземпляр можно разбирать из многих потоков
+
+    Настройки задаются при создании и дальше не меняются, состояние
+    каждого разбора - свой _ParseState. Итоги последнего разбора
+    (constants, symbols, includes, dependencies, index, stats) и незаконченный
+    feed()/close() хранятся отдельно для каждого потока, поэтому потоки
+    не видят чужих итогов. Преамбула только читается: её константы
+    вычисляются при создании парсера, и менять её (update) во время
+    разборов нельзя.
+    """
 
-    def _parse_dict(self, text):
-        """Парсим словарь"""
-        if not text or text[0] != '{' or text[-1] != '}':
-            return {}
-
-        content = text[1:-1].strip()
-        if not content:
-            return {}
-
-        result = {}
-        i = 0
-
-        while i < len(content):
-            # Пропускаем пробелы
-            while i < len(content) and content[i] in ' \t\n\r':
-                i += 1
-
-            if i >= len(content):
-                break
-
-            # Ключ
-            key_start = i
-            while i < len(content) and (content[i].isalpha() or content[i] == '_' or content[i].isdigit()):
-                i += 1
-            key = content[key_start:i]
-
-            if not key:
-                # Если пустой ключ, пропускаем
-                i += 1
-                continue
-
-            # Проверяем ключ
-            if not re.match(r'^[_a-z][_a-z0-9]*$', key):
-                raise SyntaxError(f"Неправильный идентификатор: {key}")
-
-            # Пропускаем пробелы
-            while i < len(content) and content[i] in ' \t\n\r':
-                i += 1
-
-            # Проверяем =>
-            if i + 2 > len(content) or content[i:i + 2] != '=>':
-                raise SyntaxError(f"Ожидалось => после ключа {key}")
-            i += 2
-
-            # Пропускаем пробелы
-            while i < len(content) and content[i] in ' \t\n\r':
-                i += 1
-
-            # Значение
-            value_start = i
-
-            # Константа
-            if content[i] == '$':
-                i += 1
-                const_start = i
-                while i < len(content) and content[i] != '$':
-                    i += 1
-                const_name = content[const_start:i]
-
-                if i >= len(content):
-                    raise SyntaxError(f"Незакрытая константа: ${const_name}")
-
-                if const_name not in self.constants:
-                    raise SyntaxError(f"Неопределённая константа: ${const_name}$")
-
-                value = self.constants[const_name]
-                i += 1  # Пропускаем $
-
-            # Строка
-            elif content[i:i + 2] == '@"':
-                i += 2
-                str_start = i
-                while i < len(content) and content[i] != '"':
-                    i += 1
-
-                if i >= len(content):
-                    raise SyntaxError("Незакрытая строка")
-
-                value = content[str_start:i]
-                i += 1  # Пропускаем "
-
-            # Словарь
-            elif content[i] == '{':
-                depth = 1
-                dict_start = i
-                i += 1
-
-                while i < len(content) and depth > 0:
-                    if content[i] == '{':
-                        depth += 1
-                    elif content[i] == '}':
-                        depth -= 1
-                    i += 1
-
-                if depth > 0:
-                    raise SyntaxError("Непарные фигурные скобки")
-
-                dict_text = content[dict_start:i]
-                value = self._parse_dict(dict_text)
-
-            # Число или true/false
+    constants = _per_thread('constants', "Константы последнего разбора в этом потоке")
+    # SymbolTable последнего разбора: зависимости констант и места подстановки
+    symbols = _per_thread('symbols', "SymbolTable последнего разбора в этом потоке")
+    # Пути (include @"путь") последнего разбора; при разборе файла их константы
+    # подставляются через include.ConfigLoader
+    includes = _per_thread('includes', "Пути (include) последнего разбора в этом потоке")
+    # Полные пути всех включённых файлов (с вложенными включениями) - для проверки свежести кэшей
+    dependencies = _per_thread('dependencies', "Включённые файлы последнего разбора в этом потоке")
+    # С build_index=True после разбора в index лежит ConfigIndex результата
+    index = _per_thread('index', "ConfigIndex последнего разбора в этом потоке")
+    # С stats=True после parse и parse_file в stats лежит ParseStats
+    stats = _per_thread('stats', "ParseStats последнего разбора в этом потоке")
+    _stream = _per_thread('stream', "Состояние feed() в этом потоке")
+
+    def __init__(self, build_index=False, stats=False, preamble=None, max_errors=1):
+        # Общая таблица констант (SymbolTable или словарь), видимая во всех разборах;
+        # свои define текста её перекрывают
+        if isinstance(preamble, SymbolTable):
+            # Всё вычисляется сейчас, чтобы разборы из разных потоков её только читали
+            preamble.resolve_all()
+        self.preamble = preamble
+        self.build_index = build_index
+        self.collect_stats = stats
+        # Сколько ошибок собрать до остановки (None - все); SyntaxError разбора
+        # несёт их в errors, первая ошибка - само исключение
+        self.max_errors = max_errors
+        self._last = _LastParse()
+
+    def parse(self, text, path=None):
+        """Основной метод парсинга
+
+        text - str или байты в UTF-8 (bytes, memoryview, mmap); байты
+        не декодируются целиком, декодируются только ключи и строки.
+        path - файл, из которого прочитан text: (include ...) ищутся от
+        его каталога и подставляются; без path константы включений не
+        известны.
+        """
+        if self.collect_stats:
+            from stats import ParseStats
+            stats = ParseStats()
+            stats.size = len(text.encode('utf-8')) if isinstance(text, str) else len(text)
+            try:
+                return self._parse_with_stats(_slices(text), stats, path)
+            except ConfigSyntaxError as e:
+                raise locate(e, text) from None
+        # Один проход лексера: комментарии пропускаются, define разбираются на месте
+        state = self._new_state()
+        state.source = path
+        try:
+            state.consume(_scanner(text)(text))
+            return self._finish(state)
+        except ConfigSyntaxError as e:
+            # Строка и столбец считаются только здесь, когда ошибка уже есть
+            raise locate(state.failure(e), text) from None
+
+    def parse_documents(self, text, path=None):
+        """Все словари верхнего уровня текста списком; константы общие для всех; path - как у parse"""
+        state = _ParseState(documents=True, max_errors=self.max_errors)
+        state.source = path
+        try:
+            state.consume(_scanner(text)(text))
+            self._finish(state)
+        except ConfigSyntaxError as e:
+            raise locate(state.failure(e), text) from None
+        return state.documents
+
+    def parse_many(self, texts, jobs=None):
+        """Результаты разбора текстов (str или байты) списком, в пуле из jobs потоков
+
+        Все потоки разбирают одним экземпляром. С GIL потоки не ускоряют
+        сам разбор, но не мешают друг другу; на сборке CPython без GIL
+        (3.13t) тексты разбираются параллельно. Ошибка - первая по порядку
+        текстов, как у map(). jobs=None - по числу процессоров.
+        """
+        texts = list(texts)
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(texts) <= 1:
+            return [self.parse(text) for text in texts]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(jobs, len(texts))) as pool:
+            return list(pool.map(self.parse, texts))
+
+    def feed(self, chunk):
+        """Передаём очередной кусок текста для инкрементального разбора (в этом потоке)"""
+        if self._stream is None:
+            self._stream = self._new_state()
+        try:
+            self._stream.feed(chunk)
+        except ConfigSyntaxError as e:
+            state = self._stream
+            self._stream = None
+            raise state.failure(e) from None
+
+    def close(self):
+        """Завершаем инкрементальный разбор и возвращаем результат
+
+        Ошибка несёт смещение в переданном тексте; строку и столбец
+        заполняет errors.locate(e, text), если текст сохранён.
+        """
+        state = self._stream if self._stream is not None else self._new_state()
+        self._stream = None
+        try:
+            state.close()
+            return self._finish(state)
+        except ConfigSyntaxError as e:
+            raise state.failure(e) from None
+
+    def parse_file(self, path, block_size=BLOCK_SIZE, use_mmap=False):
+        """Разбираем файл, читая его блоками фиксированного размера
+
+        С use_mmap=True файл отображается в память и разбирается как байты.
+        При сборе статистики лексер и разбор замеряются по каждому блоку.
+        Для места ошибки файл перечитывается.
+        (include ...) подставляются через include.ConfigLoader.
+        """
+        try:
+            return self._parse_file(path, block_size, use_mmap)
+        except ConfigSyntaxError as e:
+            raise locate(e, filename=os.fspath(path)) from None
+
+    def _parse_file(self, path, block_size, use_mmap):
+        """Разбор файла без поиска места ошибки"""
+        if self.collect_stats and not use_mmap:
+            from stats import ParseStats
+            stats = ParseStats()
+            with open(path, 'r', encoding='utf-8') as f:
+                stats.size = os.fstat(f.fileno()).st_size
+                return self._parse_with_stats(_timed_blocks(f, block_size, stats), stats, path)
+
+        if use_mmap:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return self.parse(b'', path)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self.parse(data, path)
+
+        self._stream = self._new_state()
+        self._stream.source = path
+        with open(path, 'r', encoding='utf-8') as f:
+            for chunk in _read_blocks(f, block_size):
+                self.feed(chunk)
+        return self.close()
+
+    def iterparse(self, source, depth=0, block_size=BLOCK_SIZE):
+        """Отдаём события (путь, ключ, значение) по мере разбора
+
+        События выдаются для пар словарей уровня depth (0 - основной словарь)
+        сразу после того, как пара полностью прочитана, и в памяти не
+        остаются. С более высоких уровней приходят только простые значения.
+
+        source - путь к файлу, файловый объект (текстовый или двоичный) или
+        итерируемый набор кусков текста. Константа должна быть объявлена
+        до первого использования в такой паре. Разбор останавливается на
+        первой ошибке; строка и столбец в ней есть, если source - путь.
+        Если source - путь, константы (include ...) доступны сразу после
+        включения.
+        """
+        state = _ParseState(event_level=depth)
+        parents = [self.preamble] if self.preamble is not None else []
+        dependencies = set()
+        events = state.events
+
+        if isinstance(source, (str, os.PathLike)):
+            included = {}
+            parents.insert(0, included)
+
+            def include(name):
+                constants, files = _load_includes(source, [name], self.max_errors)
+                included.update(constants)
+                dependencies.update(files)
+
+            state.on_include = include
+            f = open(source, 'r', encoding='utf-8')
+        else:
+            f = None
+        if parents:
+            state.constants = ChainMap({}, *parents)
+        try:
+            if f is not None:
+                chunks = _read_blocks(f, block_size)
+            elif hasattr(source, 'read'):
+                chunks = _read_blocks(source, block_size)
             else:
-                val_start = i
-                while i < len(content) and content[i] not in ',}':
-                    i += 1
-
-                val_str = content[val_start:i].strip()
-
-                # Булевы значения
-                if val_str == 'true':
-                    value = True
-                elif val_str == 'false':
-                    value = False
-                # Число
-                elif re.match(r'^[+-]?\d+\.\d+$', val_str):
-                    value = float(val_str)
-                else:
-                    raise SyntaxError(f"Непонятное значение: {val_str}")
-
-            # Сохраняем пару
-            result[key] = value
-
-            # Пропускаем пробелы
-            while i < len(content) and content[i] in ' \t\n\r':
-                i += 1
-
-            # Запятая
-            if i < len(content) and content[i] == ',':
-                i += 1
+                chunks = source
+
+            for chunk in chunks:
+                state.feed(chunk)
+                if events:
+                    state.resolve_refs()
+                    yield from events
+                    events.clear()
+            state.close()
+            state.resolve_refs()
+        except ConfigSyntaxError as e:
+            if f is None:
+                raise
+            raise locate(e, filename=os.fspath(source)) from None
+        finally:
+            if f is not None:
+                f.close()
+
+        self.constants = dict(state.constants)
+        self.includes = state.includes
+        self.dependencies = sorted(dependencies)
+        self.symbols = None
+        yield from events
+        events.clear()
+
+    def _parse_with_stats(self, chunks, stats, path=None):
+        """Разбор кусков тем же потоковым путём, что feed/close, с замером этапов
+
+        Лексер и разбор замеряются по каждому куску, токены считаются по
+        спискам кусков - список токенов всего текста не строится.
+        """
+        self.stats = stats
+        state = self._new_state()
+        state.source = path
+        state.stats = stats
+        try:
+            for chunk in chunks:
+                state.feed(chunk)
+            state.close()
+            with stats.phase('constants'):
+                result = self._finish(state)
+        except ConfigSyntaxError as e:
+            raise state.failure(e) from None
+        stats.count_tree(result)
+        return result
 
+    def _new_state(self):
+        """Состояние нового разбора, с индексом путей при build_index"""
+        return _ParseState(index=ConfigIndex() if self.build_index else None, max_errors=self.max_errors)
+
+    def _finish(self, state):
+        """Подставляем константы и отдаём результат разбора"""
+        parent = self.preamble
+        dependencies = []
+        if state.source is not None and state.includes:
+            # Константы включений - под своими define текста, над преамбулой
+            included, dependencies = _load_includes(state.source, state.includes, self.max_errors)
+            parent = ChainMap(included, parent) if parent is not None else included
+        symbols = SymbolTable(state.constants, parent=parent)
+        if state.errors is None:
+            symbols.resolve_all()
+        else:
+            for error in symbols.problems(state.refs):
+                state._collect(error)
+            if state.errors:
+                raise state.failure()
+        symbols.bind(state.refs)
+        state.refs = []
+        result = state.result if state.result is not None else {}
+        for tree in state.documents if state.documents is not None else (result,):
+            symbols.attach(tree)
+        self.symbols = symbols
+        self.constants = dict(symbols)
+        self.includes = state.includes
+        self.dependencies = dependencies
+        if state.index is not None:
+            state.index.resolve(symbols)
+        self.index = state.index
         return result
 
 
 # CLI интерфейс
 def main_cli():
     """CLI для тестирования"""
+    import json
     import sys
 
     if len(sys.argv) < 2:
@@ -302,18 +882,14 @@ def main_cli():
 
     filename = sys.argv[1]
 
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            config_text = f.read()
-    except FileNotFoundError:
-        print(f"Ошибка: файл '{filename}' не найден")
-        sys.exit(1)
-
     parser = ConfigParser()
 
     try:
-        result = parser.parse(config_text)
+        result = parser.parse_file(filename)
         print(json.dumps(result, indent=2, ensure_ascii=False))
+    except FileNotFoundError:
+        print(f"Ошибка: файл '{filename}' не найден")
+        sys.exit(1)
     except SyntaxError as e:
         print(f"Синтаксическая ошибка: {e}")
         sys.exit(1)
@@ -323,6 +899,8 @@ def main_cli():
 
 
 if __name__ == "__main__":
+    import json
+
     # Тестовый пример
     test_config = """
     (define port 8080.0)
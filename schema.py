@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Схема конфигурации (вариант 16)
+Ключи, типы и умолчания проверяются во время разбора, результат - объекты с __slots__
+"""
+
+import sys
+
+from errors import ConfigSyntaxError
+from parser import ConfigParser, _ParseState
+from symbols import _ConstRef
+
+_MISSING = object()
+# Значение ключа, не прошедшее проверку: при сборе ошибок ключ не считается отсутствующим
+_INVALID = object()
+
+# Типы значений поля и то, как значение приходит из разбора
+_KINDS = {float: float, int: float, str: str, bool: bool, dict: dict}
+
+_KIND_NAMES = {float: 'число', int: 'целое число', str: 'строка', bool: 'true/false', dict: 'словарь'}
+
+
+def _describe(value):
+    """Вид значения для сообщения об ошибке"""
+    kind = type(value)
+    if kind is float:
+        return f"число {value!r}"
+    if kind is str:
+        return f'строка @"{value}"'
+    if kind is bool:
+        return 'true' if value else 'false'
+    return 'словарь'
+
+
+def _type_error(path, key, spec, value, previous):
+    """Ошибка вида значения; если оно пришло из константы - с её именем для места в тексте"""
+    return ConfigSyntaxError(f"Ключ {_join(path, key)}: ожидалось значение вида «{spec.expected}», "
+                             f"получено {_describe(value)}",
+                             symbol=previous.name if type(previous) is _ConstRef else None)
+
+
+def _join(path, key):
+    """Путь ключа через точку"""
+    return f"{path}.{key}" if path else key
+
+
+class Field:
+    """Простое значение: тип (float, int, str, bool или dict), умолчание и ограничения
+
+    Без default ключ обязателен. min и max - границы числа, choices -
+    допустимые значения. int принимает числа без дробной части и отдаёт
+    int; dict - словарь любого вида, он остаётся обычным словарём.
+    """
+    __slots__ = ('kind', 'default', 'min', 'max', 'choices')
+
+    def __init__(self, kind, default=_MISSING, min=None, max=None, choices=None):
+        if kind not in _KINDS:
+            raise TypeError(f"Неподдерживаемый тип поля: {kind!r}")
+        self.kind = kind
+        self.default = default
+        self.min = min
+        self.max = max
+        self.choices = frozenset(choices) if choices is not None else None
+
+
+class Section:
+    """Словарь с известными ключами: в результате - объект с __slots__
+
+    fields - {ключ: Field, Section, MapOf или тип}. unknown - что делать
+    с ключом не из схемы: 'error' - ошибка, 'skip' - пропустить (словарь
+    под таким ключом не строится). name - имя класса объектов. Секция
+    без обязательных ключей может отсутствовать: тогда она строится из
+    умолчаний.
+    """
+
+    def __init__(self, fields, unknown='error', name=None):
+        if unknown not in ('error', 'skip'):
+            raise ValueError(f"unknown: 'error' или 'skip', получено {unknown!r}")
+        self.fields = dict(fields)
+        self.unknown = unknown
+        self.name = name
+
+
+class MapOf:
+    """Словарь с любыми ключами и значениями одного вида: { имя => секция }
+
+    В результате - обычный словарь. required=False - отсутствующий ключ
+    даёт пустой словарь.
+    """
+
+    def __init__(self, item, required=False):
+        self.item = item
+        self.required = required
+
+
+class Record:
+    """Основа объектов секций: поля в __slots__, доступ и через record['ключ']"""
+    __slots__ = ('_path',)
+
+    _fields = {}
+    _skip_unknown = False
+    _defaults = ()
+    # Обязательные ключи и ключи секций и MapOf, которые проверяются в конце разбора
+    _required = ()
+    _late = ()
+
+    def __init__(self, path=''):
+        self._path = path
+        for name, value in self._defaults:
+            setattr(self, name, dict(value) if type(value) is dict else value)
+
+    def __setitem__(self, key, value):
+        spec = self._fields.get(key)
+        if spec is None:
+            if self._skip_unknown:
+                return
+            raise ConfigSyntaxError(f"Неизвестный ключ: {_join(self._path, key)}")
+        if type(value) is not spec.accepts:
+            if type(value) is _ConstRef:
+                # Значение константы проверяется при подстановке
+                setattr(self, key, value)
+                return
+            previous = getattr(self, key, None)
+            setattr(self, key, _INVALID)
+            raise _type_error(self._path, key, spec, value, previous)
+        if spec.check is not None:
+            try:
+                value = spec.check(self, key, value)
+            except ConfigSyntaxError:
+                setattr(self, key, _INVALID)
+                raise
+        setattr(self, key, value)
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        """Значение ключа или default (как у словаря)"""
+        if key not in self._fields:
+            return default
+        return getattr(self, key, default)
+
+    def keys(self):
+        """Ключи схемы, для которых есть значение"""
+        return [name for name in self._fields if hasattr(self, name)]
+
+    def items(self):
+        """Пары (ключ, значение) в порядке схемы"""
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def to_dict(self):
+        """Дерево обычными словарями, как у ConfigParser.parse; обход без рекурсии"""
+        root = {}
+        stack = [(self, root)]
+        while stack:
+            node, target = stack.pop()
+            for key, value in node.items():
+                if isinstance(value, (Record, dict)):
+                    child = {}
+                    stack.append((value, child))
+                    value = child
+                target[key] = value
+        return root
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.items() == other.items()
+
+    def __repr__(self):
+        inner = ', '.join(f"{key}={value!r}" for key, value in self.items())
+        return f"{type(self).__name__}({inner})"
+
+
+class _MapDict(dict):
+    """Словарь MapOf: каждое значение проверяется по виду элемента"""
+    __slots__ = ('spec', '_path')
+
+    def __init__(self, spec, path):
+        super().__init__()
+        self.spec = spec
+        self._path = path
+
+    def __setitem__(self, key, value):
+        spec = self.spec
+        if type(value) is not spec.accepts:
+            if type(value) is _ConstRef:
+                dict.__setitem__(self, key, value)
+                return
+            raise _type_error(self._path, key, spec, value, self.get(key))
+        if spec.check is not None:
+            value = spec.check(self, key, value)
+        dict.__setitem__(self, key, value)
+
+
+class _Skipped(dict):
+    """Словарь под неизвестным ключом секции с unknown='skip': пары не хранятся"""
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        pass
+
+
+class _Compiled:
+    """Проверка одного значения: accepts - тип значения из разбора, check - ограничения
+
+    kind: 'scalar', 'dict' (свободный словарь), 'record' (record - класс
+    секции) или 'map' (item - вид элементов).
+    """
+    __slots__ = ('kind', 'accepts', 'check', 'expected', 'default', 'record', 'item', 'required')
+
+    def __init__(self, kind, accepts, expected, check=None, default=_MISSING, record=None, item=None,
+                 required=True):
+        self.kind = kind
+        self.accepts = accepts
+        self.expected = expected
+        self.check = check
+        self.default = default
+        self.record = record
+        self.item = item
+        self.required = required
+
+
+def _scalar_check(field):
+    """Функция проверки ограничений поля или None, если их нет"""
+    low, high, choices, integer = field.min, field.max, field.choices, field.kind is int
+    if low is None and high is None and choices is None and not integer:
+        return None
+
+    def check(container, key, value):
+        if integer:
+            if not value.is_integer():
+                raise ConfigSyntaxError(f"Ключ {_join(container._path, key)}: ожидалось целое число, "
+                                        f"получено {value!r}")
+            value = int(value)
+        if low is not None and value < low:
+            raise ConfigSyntaxError(f"Ключ {_join(container._path, key)}: {value!r} меньше {low!r}")
+        if high is not None and value > high:
+            raise ConfigSyntaxError(f"Ключ {_join(container._path, key)}: {value!r} больше {high!r}")
+        if choices is not None and value not in choices:
+            allowed = ', '.join(sorted(map(str, choices)))
+            raise ConfigSyntaxError(f"Ключ {_join(container._path, key)}: недопустимое значение "
+                                    f"{value!r} (допустимо: {allowed})")
+        return value
+    return check
+
+
+def _compile(spec, name):
+    """Описание схемы -> _Compiled; секции превращаются в классы с __slots__"""
+    if isinstance(spec, type) and spec in _KINDS:
+        spec = Field(spec)
+    elif isinstance(spec, dict):
+        spec = Section(spec)
+
+    if isinstance(spec, Field):
+        if spec.kind is dict:
+            return _Compiled('dict', dict, _KIND_NAMES[dict], default=spec.default,
+                             required=spec.default is _MISSING)
+        default = spec.default
+        if spec.kind is int and type(default) is float and default.is_integer():
+            default = int(default)
+        return _Compiled('scalar', _KINDS[spec.kind], _KIND_NAMES[spec.kind], _scalar_check(spec),
+                         default=default, required=default is _MISSING)
+    if isinstance(spec, MapOf):
+        return _Compiled('map', _MapDict, 'словарь', item=_compile(spec.item, name), required=spec.required)
+    if isinstance(spec, Section):
+        record = _record_class(spec, name)
+        return _Compiled('record', record, 'словарь', record=record, required=bool(record._required))
+    raise TypeError(f"Неподдерживаемое описание схемы: {spec!r}")
+
+
+def _record_class(section, name):
+    """Класс объектов секции: поля в __slots__ и таблица их проверок"""
+    fields = {}
+    defaults = []
+    required = []
+    late = []
+    for key, spec in section.fields.items():
+        if not key.isidentifier() or hasattr(Record, key):
+            raise ValueError(f"Ключ {key!r} нельзя использовать как поле секции")
+        compiled = fields[key] = _compile(spec, key)
+        if compiled.kind in ('scalar', 'dict'):
+            if compiled.required:
+                required.append(key)
+            else:
+                defaults.append((key, compiled.default))
+        elif compiled.required:
+            required.append(key)
+        else:
+            late.append(key)
+
+    class_name = section.name or ''.join(part.capitalize() for part in name.split('_')) or 'Config'
+    return type(class_name, (Record,), {
+        '__slots__': tuple(fields),
+        '_fields': fields,
+        '_skip_unknown': section.unknown == 'skip',
+        '_defaults': tuple(defaults),
+        '_required': tuple(required),
+        '_late': tuple(late),
+    })
+
+
+class _SchemaState(_ParseState):
+    """Разбор, в котором словари сразу строятся объектами схемы
+
+    Все уровни идут через open_dict (event_level без ограничения), поэтому
+    значение проверяется в момент, когда парсер кладёт его в контейнер.
+    Объекты, у которых есть обязательные ключи или секции по умолчанию,
+    запоминаются вместе с позицией своей { для проверки в конце разбора.
+    """
+
+    def __init__(self, schema, max_errors=1):
+        super().__init__(event_level=sys.maxsize, max_errors=max_errors)
+        self.schema = schema
+        self.sink = _Skipped()
+        self.checks = []
+
+    def open_dict(self, parent, key, pos):
+        kind = type(parent)
+        if kind is dict:
+            return {}
+        if kind is _Skipped:
+            return parent
+        if parent is None:
+            spec = self.schema.root
+            path = ''
+        elif kind is _MapDict:
+            spec = parent.spec
+            path = _join(parent._path, key)
+        else:
+            spec = parent._fields.get(key)
+            path = _join(parent._path, key)
+            if spec is None:
+                if parent._skip_unknown:
+                    return self.sink
+                raise ConfigSyntaxError(f"Неизвестный ключ: {path}")
+        if spec.kind == 'record':
+            record = spec.record(path)
+            if record._required or record._late:
+                self.checks.append((record, pos))
+            return record
+        if spec.kind == 'map':
+            return _MapDict(spec.item, path)
+        if spec.kind == 'dict':
+            return {}
+        if kind is not _MapDict:
+            setattr(parent, key, _INVALID)
+        raise ConfigSyntaxError(f"Ключ {path}: ожидалось значение вида «{spec.expected}», получен словарь")
+
+    def missing(self):
+        """Ошибки отсутствующих обязательных ключей; умолчания для секций и MapOf"""
+        errors = []
+        checks = self.checks
+        # Секции по умолчанию сами попадают в список и проверяются в том же цикле
+        i = 0
+        while i < len(checks):
+            record, pos = checks[i]
+            i += 1
+            for key in record._required:
+                if getattr(record, key, _MISSING) is _MISSING:
+                    errors.append(ConfigSyntaxError(f"Нет обязательного ключа: {_join(record._path, key)}", pos))
+            for key in record._late:
+                if getattr(record, key, _MISSING) is _MISSING:
+                    spec = record._fields[key]
+                    if spec.kind == 'map':
+                        value = _MapDict(spec.item, _join(record._path, key))
+                    else:
+                        value = spec.record(_join(record._path, key))
+                        if value._required or value._late:
+                            checks.append((value, pos))
+                    setattr(record, key, value)
+        self.checks = []
+        return errors
+
+
+class Schema:
+    """Схема конфигурации, скомпилированная один раз
+
+    root - Section, MapOf или словарь {ключ: описание} (то же, что
+    Section(словарь, unknown=unknown)). parse() и parse_file() разбирают
+    текст сразу в объекты схемы: вид значения, границы и неизвестные
+    ключи проверяются, когда парсер кладёт значение в словарь, без
+    второго обхода дерева. decode() проверяет уже разобранный словарь.
+    """
+
+    def __init__(self, root, unknown='error'):
+        if isinstance(root, dict):
+            root = Section(root, unknown=unknown, name='Config')
+        self.root = _compile(root, 'config')
+        if self.root.kind not in ('record', 'map'):
+            raise TypeError("Корень схемы - Section, MapOf или словарь полей")
+
+    def parser(self, max_errors=1, preamble=None):
+        """SchemaParser этой схемы"""
+        return SchemaParser(self, max_errors=max_errors, preamble=preamble)
+
+    def parse(self, text, max_errors=1):
+        """Разбор текста (str или байты) сразу в объекты схемы"""
+        return SchemaParser(self, max_errors=max_errors).parse(text)
+
+    def parse_file(self, path, max_errors=1):
+        """Разбор файла блоками сразу в объекты схемы"""
+        return SchemaParser(self, max_errors=max_errors).parse_file(path)
+
+    def decode(self, tree):
+        """Объекты схемы из готового словаря (кэш, скомпилированный файл); обход без рекурсии
+
+        Ошибки указывают путь ключа, места в тексте у них нет.
+        """
+        state = _SchemaState(self)
+        root = state.open_dict(None, None, None)
+        stack = [(tree, root)]
+        while stack:
+            source, target = stack.pop()
+            for key, value in source.items():
+                if isinstance(value, dict):
+                    child = state.open_dict(target, key, None)
+                    stack.append((value, child))
+                    value = child
+                target[key] = value
+        errors = state.missing()
+        if errors:
+            errors[0].errors = errors
+            raise errors[0]
+        return root
+
+
+class SchemaParser(ConfigParser):
+    """ConfigParser, который строит результат по схеме
+
+    Поддерживает parse, feed/close и parse_file; ошибки схемы - такие же
+    ConfigSyntaxError с местом в тексте и собираются вместе с
+    синтаксическими при max_errors.
+    """
+
+    def __init__(self, schema, max_errors=1, preamble=None):
+        super().__init__(preamble=preamble, max_errors=max_errors)
+        self.schema = schema
+
+    def _new_state(self):
+        return _SchemaState(self.schema, max_errors=self.max_errors)
+
+    def _finish(self, state):
+        if state.result is None:
+            state.result = state.open_dict(None, None, 0)
+        # Обязательные ключи - до подстановки констант: ссылка тоже считается значением
+        for error in state.missing():
+            if state.errors is None:
+                raise error
+            state._collect(error)
+        return super()._finish(state)
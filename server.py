@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Сервер преобразования (вариант 16)
+Один тёплый процесс на все преобразования: запрос - строка, ответ - строка JSON
+"""
+
+import json
+import os
+import socketserver
+import stat
+
+from errors import ConfigSyntaxError
+from include import ConfigLoader
+from parser import ConfigParser
+
+
+class Converter:
+    """Ответы на запросы; ConfigLoader и ConfigParser общие для всех запросов
+
+    Запрос - строка: путь к файлу или JSON-объект {"path": путь} или
+    {"text": текст конфигурации}, с "documents": true - все документы
+    списком. Ответ - JSON-объект одной строкой: {"result": ...} или
+    {"error": текст, "line": строка, "column": столбец} (место - если
+    известно). Файл, который не менялся, и его включения повторно не
+    разбираются. Запросы можно передавать из разных потоков.
+    """
+
+    def __init__(self, max_errors=1):
+        self.loader = ConfigLoader(max_errors=max_errors)
+        self.parser = ConfigParser(max_errors=max_errors)
+
+    def handle(self, line):
+        """Строка ответа (без перевода строки) на строку запроса"""
+        try:
+            request = _request(line)
+        except ValueError as e:
+            return json.dumps({'error': str(e)}, ensure_ascii=False, separators=(',', ':'))
+        try:
+            documents = bool(request.get('documents'))
+            if 'text' in request:
+                text = request['text']
+                result = self.parser.parse_documents(text) if documents else self.parser.parse(text)
+            else:
+                loaded = self.loader.load(request['path'])
+                result = loaded.documents if documents else loaded.result
+            return json.dumps({'result': result}, ensure_ascii=False, separators=(',', ':'))
+        except Exception as e:
+            return json.dumps(_error(e), ensure_ascii=False, separators=(',', ':'))
+
+    def close(self):
+        self.loader.close()
+
+
+def _request(line):
+    """Запрос из строки: {"path": ...} или {"text": ...}; ValueError - если он неверен"""
+    line = line.strip()
+    if not line.startswith('{'):
+        return {'path': line}
+    try:
+        request = json.loads(line)
+    except ValueError:
+        raise ValueError("Неверный запрос: ожидался путь или JSON-объект") from None
+    if not isinstance(request, dict) or not isinstance(request.get('path', request.get('text')), str):
+        raise ValueError('Неверный запрос: нужен строковый "path" или "text"')
+    return request
+
+
+def _error(error):
+    """Ответ с ошибкой: текст и место первой ошибки разбора"""
+    if isinstance(error, ConfigSyntaxError):
+        answer = {'error': str(error)}
+        if error.lineno is not None:
+            answer['line'] = error.lineno
+            answer['column'] = error.offset
+        return answer
+    if isinstance(error, SyntaxError):
+        return {'error': str(error)}
+    if isinstance(error, (OSError, UnicodeDecodeError)):
+        return {'error': f"Ошибка чтения файла: {error}"}
+    return {'error': f"Ошибка при обработке: {error}"}
+
+
+def serve_stream(inp, out, max_errors=1):
+    """Запросы строками из inp, ответы строками в out до конца inp
+
+    Каждый ответ сбрасывается сразу, поэтому процесс можно держать
+    открытым через каналы и ждать ответа на каждую строку.
+    """
+    converter = Converter(max_errors)
+    try:
+        for line in iter(inp.readline, ''):
+            if line.strip():
+                out.write(converter.handle(line) + '\n')
+                out.flush()
+    finally:
+        converter.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Одно соединение: строки запросов до его закрытия"""
+
+    def handle(self):
+        converter = self.server.converter
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace')
+            if line.strip():
+                self.wfile.write(converter.handle(line).encode('utf-8') + b'\n')
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Сервер на Unix-сокете: каждое соединение в своём потоке, Converter общий"""
+    daemon_threads = True
+
+    def __init__(self, path, max_errors=1):
+        # Сокет от прошлого запуска мешает bind; другие файлы не трогаем
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self.path = path
+        self.converter = Converter(max_errors)
+        super().__init__(path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.converter.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def serve_unix(path, max_errors=1):
+    """Принимаем соединения на Unix-сокете path до прерывания"""
+    with UnixServer(path, max_errors) as server:
+        server.serve_forever()
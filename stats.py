@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Статистика разбора конфигураций (вариант 16)
+Время и выделения памяти по этапам, счётчики токенов, словарей и констант
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+
+from lexer import STRING, WORD, CONST, DEFINE
+
+# Порядок этапов в отчёте
+PHASES = ('cache', 'read', 'tokenize', 'parse', 'constants', 'json')
+
+_PHASE_NAMES = {
+    'cache': 'кэш (загрузка или разбор)',
+    'read': 'чтение файла',
+    'tokenize': 'лексер (комментарии и пробелы)',
+    'parse': 'разбор словарей и define',
+    'constants': 'подстановка констант',
+    'json': 'JSON-вывод',
+}
+
+# Токены, значение которых вырезается из исходного текста
+_COPIED = (STRING, WORD, CONST)
+
+
+class ParseStats:
+    """Статистика одного разбора
+
+    phases - время этапов в секундах, allocations - прирост числа
+    выделенных блоков памяти за этап (sys.getallocatedblocks; отрицательный,
+    если этап больше освободил). Счётчики заполняет ConfigParser(stats=True):
+    лексер и разбор замеряются по кускам потокового разбора, bytes_copied -
+    байты UTF-8 ключей, строк и имён констант.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.allocations = {}
+        self.size = 0
+        self.tokens = 0
+        self.dicts = 0
+        self.max_depth = 0
+        self.constants_defined = 0
+        self.constants_referenced = 0
+        self.bytes_copied = 0
+
+    @contextmanager
+    def phase(self, name):
+        """Замер этапа: время и выделения суммируются при повторе"""
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self.allocations[name] = self.allocations.get(name, 0) + sys.getallocatedblocks() - blocks
+
+    def count_tokens(self, tokens):
+        """Счётчики по списку токенов: токены, define, ссылки, скопированные байты UTF-8"""
+        self.tokens += len(tokens)
+        copied = 0
+        for kind, value, _ in tokens:
+            if kind in _COPIED:
+                copied += len(value) if value.isascii() else len(value.encode('utf-8'))
+            if kind == DEFINE:
+                self.constants_defined += 1
+            elif kind == CONST:
+                self.constants_referenced += 1
+        self.bytes_copied += copied
+
+    def count_tree(self, result):
+        """Число словарей и наибольшая глубина результата (обход без рекурсии)"""
+        stack = [(result, 1)]
+        while stack:
+            node, depth = stack.pop()
+            self.dicts += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+            for value in node.values():
+                if type(value) is dict:
+                    stack.append((value, depth + 1))
+
+    def total(self):
+        """Суммарное время всех этапов"""
+        return sum(self.phases.values())
+
+    def to_dict(self):
+        """Статистика в виде словаря для JSON"""
+        return {
+            'phases': dict(self.phases),
+            'allocations': dict(self.allocations),
+            'size': self.size,
+            'tokens': self.tokens,
+            'dicts': self.dicts,
+            'max_depth': self.max_depth,
+            'constants_defined': self.constants_defined,
+            'constants_referenced': self.constants_referenced,
+            'bytes_copied': self.bytes_copied,
+        }
+
+    def report(self):
+        """Текстовый отчёт для stderr"""
+        lines = ["=== СТАТИСТИКА РАЗБОРА ==="]
+        total = self.total() or 1e-9
+        names = [name for name in PHASES if name in self.phases]
+        names += [name for name in self.phases if name not in PHASES]
+        for name in names:
+            seconds = self.phases[name]
+            title = _PHASE_NAMES.get(name, name)
+            lines.append(f"{title:<32} {seconds * 1000:9.3f} мс {seconds / total:6.1%}"
+                         f"  блоков: {self.allocations.get(name, 0):+d}")
+        lines.append(f"{'всего':<32} {self.total() * 1000:9.3f} мс")
+        lines.append(f"Размер: {self.size} байт, токенов: {self.tokens}, словарей: {self.dicts}, "
+                     f"глубина: {self.max_depth}")
+        lines.append(f"Констант объявлено: {self.constants_defined}, ссылок: {self.constants_referenced}, "
+                     f"скопировано байт: {self.bytes_copied}")
+        return '\n'.join(lines)
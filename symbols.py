@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Таблица констант (вариант 16)
+Константы через другие константы, разрешение с запоминанием, обратный индекс мест использования
+"""
+
+from collections.abc import Mapping
+
+from errors import ConfigSyntaxError
+
+_MISSING = object()
+
+
+class _ConstRef:
+    """Ссылка $имя$, которая разрешается после разбора всего текста"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _cycle(chain, name):
+    """Ошибка циклического определения: цепочка от первого повтора имени"""
+    loop = chain[chain.index(name):] + [name]
+    error = ConfigSyntaxError("Циклическое определение констант: " + ' -> '.join(loop),
+                              symbol=loop[0], define=True)
+    # Один цикл, найденный с разных имён, - одна ошибка (SymbolTable.problems)
+    error.cycle = frozenset(loop)
+    return error
+
+
+def lookup(constants, name):
+    """Значение константы name в словаре определений
+
+    Определение (define b $a$) хранится как _ConstRef; пройденная цепочка
+    заменяется в словаре значениями, поэтому каждая ссылка разрешается один раз.
+    """
+    value = constants.get(name, _MISSING)
+    if type(value) is not _ConstRef:
+        if value is _MISSING:
+            raise ConfigSyntaxError(f"Неопределённая константа: ${name}$", symbol=name)
+        return value
+    chain = [name]
+    while True:
+        target = value.name
+        if target in chain:
+            raise _cycle(chain, target)
+        value = constants.get(target, _MISSING)
+        if value is _MISSING:
+            raise ConfigSyntaxError(f"Неопределённая константа: ${target}$ (в define {chain[-1]})",
+                                    symbol=target)
+        if type(value) is not _ConstRef:
+            break
+        chain.append(target)
+    for link in chain:
+        constants[link] = value
+    return value
+
+
+def resolve_constants(constants):
+    """Заменяем в словаре все определения через другие константы их значениями"""
+    for name, value in list(constants.items()):
+        if type(value) is _ConstRef:
+            lookup(constants, name)
+
+
+class SymbolTable(Mapping):
+    """Таблица констант одного разбора: имя -> значение
+
+    Определение - число, строка или _ConstRef (define b $a$). Значения
+    вычисляются по цепочке ссылок один раз и запоминаются; цикл или
+    ссылка на неизвестную константу - SyntaxError. parent - общая
+    таблица (например, из файла-преамбулы): её значения видны, если имя
+    не определено здесь, и сама она не меняется, поэтому одну преамбулу
+    можно передавать во множество разборов (ConfigParser(preamble=...)).
+
+    Обратный индекс: какие константы определены через данную
+    (dependents) и в каких местах результата она подставлена (users).
+    update() меняет одно определение и пересчитывает только зависящие
+    от него константы и значения.
+    """
+
+    def __init__(self, definitions=None, parent=None):
+        self.parent = parent
+        self._definitions = dict(definitions) if definitions else {}
+        self._values = {}
+        self._refs = []
+        self._users = None
+        self._reverse = None
+        self._roots = []
+        self._paths = None
+
+    def __getitem__(self, name):
+        value = self._values.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+        if name not in self._definitions:
+            if self.parent is not None and name in self.parent:
+                return self.parent[name]
+            raise KeyError(name)
+        return self._resolve(name)
+
+    def __contains__(self, name):
+        return name in self._definitions or (self.parent is not None and name in self.parent)
+
+    def __iter__(self):
+        yield from self._definitions
+        if self.parent is not None:
+            for name in self.parent:
+                if name not in self._definitions:
+                    yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SymbolTable({dict(self)!r})"
+
+    def _resolve(self, name):
+        """Проходим цепочку определений до значения; все звенья запоминаются"""
+        definitions = self._definitions
+        values = self._values
+        chain = []
+        current = name
+        while True:
+            definition = definitions.get(current, _MISSING)
+            if definition is _MISSING:
+                if self.parent is not None and current in self.parent:
+                    value = self.parent[current]
+                    break
+                raise ConfigSyntaxError(f"Неопределённая константа: ${current}$ (в define {chain[-1]})",
+                                        symbol=current)
+            chain.append(current)
+            if type(definition) is not _ConstRef:
+                value = definition
+                break
+            current = definition.name
+            value = values.get(current, _MISSING)
+            if value is not _MISSING:
+                break
+            if current in chain:
+                raise _cycle(chain, current)
+        for link in chain:
+            values[link] = value
+        return value
+
+    def resolve_all(self):
+        """Вычисляем все свои определения: ошибки в неиспользуемых константах тоже видны"""
+        for name in self._definitions:
+            if name not in self._values:
+                self._resolve(name)
+
+    def problems(self, refs=()):
+        """Все ошибки определений и ссылок (словарь, ключ, _ConstRef) списком, без исключения
+
+        Каждая неизвестная константа и каждый цикл - одна ошибка.
+        """
+        found = []
+        seen = set()
+        for name in self._definitions:
+            if name in self._values:
+                continue
+            try:
+                self._resolve(name)
+            except ConfigSyntaxError as e:
+                problem = getattr(e, 'cycle', e.msg)
+                if problem not in seen:
+                    seen.add(problem)
+                    found.append(e)
+        missing = set()
+        for _, _, ref in refs:
+            if ref.name not in self and ref.name not in missing:
+                missing.add(ref.name)
+                found.append(ConfigSyntaxError(f"Неопределённая константа: ${ref.name}$", symbol=ref.name))
+        return found
+
+    def definition(self, name):
+        """Определение константы: значение или _ConstRef; из parent - если здесь его нет"""
+        if name in self._definitions:
+            return self._definitions[name]
+        if isinstance(self.parent, SymbolTable):
+            return self.parent.definition(name)
+        if self.parent is not None and name in self.parent:
+            return self.parent[name]
+        raise KeyError(name)
+
+    def bind(self, refs):
+        """Подставляем значения вместо ссылок (словарь, ключ, _ConstRef) и запоминаем места
+
+        Неизвестная константа - ошибка и в значении, заменённом повторным
+        ключом, как у исходного парсера; такая ссылка не подставляется.
+        Индекс мест использования строится по запомненным ссылкам при
+        первом запросе.
+        """
+        values = self._values
+        dead = []
+        for container, key, ref in refs:
+            value = values.get(ref.name, _MISSING)
+            if value is _MISSING:
+                if ref.name not in self:
+                    raise ConfigSyntaxError(f"Неопределённая константа: ${ref.name}$", symbol=ref.name)
+                value = self[ref.name]
+            if container.get(key) is ref:
+                container[key] = value
+            else:
+                dead.append(ref)
+        self._refs.append((refs, dead))
+        self._users = None
+
+    def _user_index(self):
+        """Имя -> [(словарь, ключ)] по всем подставленным ссылкам"""
+        if self._users is None:
+            users = {}
+            for refs, dead in self._refs:
+                skip = {id(ref) for ref in dead}
+                for container, key, ref in refs:
+                    if id(ref) not in skip:
+                        users.setdefault(ref.name, []).append((container, key))
+            self._users = users
+        return self._users
+
+    def attach(self, tree):
+        """Дерево результата, в котором ищутся пути мест использования"""
+        self._roots.append(tree)
+        self._paths = None
+
+    def dependents(self, name):
+        """Имена констант, определённых через name прямо или по цепочке"""
+        if self._reverse is None:
+            reverse = {}
+            for other, definition in self._definitions.items():
+                if type(definition) is _ConstRef:
+                    reverse.setdefault(definition.name, []).append(other)
+            self._reverse = reverse
+        found = []
+        seen = {name}
+        stack = [name]
+        while stack:
+            for other in self._reverse.get(stack.pop(), ()):
+                if other not in seen:
+                    seen.add(other)
+                    found.append(other)
+                    stack.append(other)
+        return found
+
+    def users(self, name, indirect=True):
+        """Пути через точку, где подставлена константа name (и зависящие от неё)"""
+        names = [name] + (self.dependents(name) if indirect else [])
+        paths = self._container_paths()
+        users = self._user_index()
+        found = []
+        for current in names:
+            for container, key in users.get(current, ()):
+                prefix = paths.get(id(container))
+                if prefix is not None:
+                    found.append(f"{prefix}.{key}" if prefix else key)
+        return found
+
+    def _container_paths(self):
+        """Путь каждого словаря присоединённых деревьев (обход без рекурсии)"""
+        if self._paths is None:
+            paths = {}
+            stack = [(tree, '') for tree in self._roots]
+            while stack:
+                node, path = stack.pop()
+                paths[id(node)] = path
+                for key, value in node.items():
+                    if type(value) is dict:
+                        stack.append((value, f"{path}.{key}" if path else key))
+            self._paths = paths
+        return self._paths
+
+    def update(self, name, value):
+        """Новое определение константы name (значение или _ConstRef)
+
+        Пересчитываются только name и константы, определённые через неё,
+        и только их места использования. Возвращает изменения
+        [(путь, было, стало)]. При ошибке (цикл, неизвестная константа)
+        таблица и результат не меняются.
+        """
+        affected = [name] + self.dependents(name)
+        old_values = {}
+        for current in affected:
+            try:
+                old_values[current] = self[current] if current in self else _MISSING
+            except SyntaxError:
+                old_values[current] = _MISSING
+        old_definition = self._definitions.get(name, _MISSING)
+        self._definitions[name] = value
+        self._reverse = None
+        for current in affected:
+            self._values.pop(current, None)
+        try:
+            new_values = {current: self._resolve(current) for current in affected}
+        except SyntaxError:
+            if old_definition is _MISSING:
+                del self._definitions[name]
+            else:
+                self._definitions[name] = old_definition
+            self._reverse = None
+            for current, old in old_values.items():
+                self._values.pop(current, None)
+                if old is not _MISSING:
+                    self._values[current] = old
+            raise
+
+        paths = self._container_paths()
+        users = self._user_index()
+        changes = []
+        for current in affected:
+            new = new_values[current]
+            old = old_values[current]
+            if type(old) is type(new) and old == new:
+                continue
+            for container, key in users.get(current, ()):
+                before = container[key]
+                container[key] = new
+                prefix = paths.get(id(container))
+                if prefix is not None:
+                    changes.append((f"{prefix}.{key}" if prefix else key, before, new))
+        return changes
@@ -3,13 +3,44 @@
 Тесты для парсера конфигураций (вариант 16)
 """
 
+import asyncio
+import io
 import json
+import pickle
+import random
+import re
+import socket
+import subprocess
 import sys
 import os
+import tempfile
+import threading
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from parser import ConfigParser
+from legacy_parser import LegacyConfigParser
+from cache import ParseCache
+from incremental import IncrementalParser
+import batch
+from async_loader import AsyncConfigLoader
+from compact import freeze, FrozenNode
+from lazy import parse_lazy, LazyNode
+from index import ConfigIndex
+import benchmark
+from stats import ParseStats
+from compiled import compile_file, compile_config, compiled_path, load_compiled, CompiledConfig, CompiledNode
+from json_output import write_json, write_events, format_json
+from include import ConfigLoader
+from symbols import _ConstRef
+from errors import locate
+from schema import Schema, Section, MapOf, Field
+from columnar import ColumnarParser, Table, parse_columnar, load_columnar, write_columnar
+from fuzz import ConfigGenerator, DifferentialRunner, ENGINES, legacy_difference
+from server import Converter, UnixServer, serve_stream
+from watch import ConfigWatcher
+from lexer import tokenize, tokenize_bytes, STRING, NUMBER, WORD, CONST, DEFINE, EOF
 
 
 def run_test(name, config_text, should_pass=True):
@@ -74,6 +105,7 @@ def test_comments():
         ("Комментарий в строке", '{ C тут комментарий\nport => 80.0 }', True),
         ("Многострочный комментарий", '--[[ много\nстрочный\nкомментарий ]] { port => 80.0 }', True),
         ("Несколько комментариев", 'C первый\n--[[ второй ]]\n{ x => 1.0 }', True),
+        ("Пустой комментарий C в конце строки", '{\n a => 1.0,\n C\n b => 2.0\n}', True),
     ]
 
     print("\n=== ТЕСТЫ КОММЕНТАРИЕВ ===")
@@ -81,6 +113,15 @@ def test_comments():
     for name, config, should_pass in tests:
         results.append(run_test(name, config, should_pass))
 
+    # C без текста не должен съедать следующую строку
+    for config in ('{\n a => 1.0,\n C\n b => 2.0\n}', '{ a => 1.0, C\n b => 2.0 }'):
+        expected = LegacyConfigParser().parse(config)
+        ok = expected == {'a': 1.0, 'b': 2.0}
+        ok = ok and ConfigParser().parse(config) == expected
+        ok = ok and ConfigParser().parse(config.encode('utf-8')) == expected
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} Пустой комментарий C: {config!r}")
+
     return all(results)
 
 
@@ -114,6 +155,7 @@ def test_edge_cases():
         ("Пустая строка", '{ x => @"" }', True),
         ("Большое число", '{ x => 999999.999999 }', True),
         ("Ноль", '{ x => 0.0 }', True),
+        ("Непарные скобки в глубине", '{ a => ' * 100 + '{ x => 1.0 }' + ' }' * 99, False),
     ]
 
     print("\n=== КРАЙНИЕ СЛУЧАИ ===")
@@ -121,6 +163,17 @@ def test_edge_cases():
     for name, config, should_pass in tests:
         results.append(run_test(name, config, should_pass))
 
+    # Глубже предела рекурсии: результат не печатаем, json.dumps рекурсивен
+    try:
+        node = ConfigParser().parse('{ a => ' * 5000 + '{ x => 1.0 }' + ' }' * 5000)
+        for _ in range(5000):
+            node = node['a']
+        results.append(node == {'x': 1.0})
+        print("✓ Вложенность 5000 уровней")
+    except (SyntaxError, RecursionError) as e:
+        print(f"✗ Вложенность 5000 уровней: {e}")
+        results.append(False)
+
     return all(results)
 
 
@@ -173,6 +226,1835 @@ def test_real_examples():
     return all(results)
 
 
+def test_lexer():
+    """Тесты лексера и совпадения с исходной реализацией"""
+    print("\n=== ТЕСТЫ ЛЕКСЕРА ===")
+    results = []
+
+    kinds = [tok[0] for tok in tokenize('C x\n(define a -1.5) --[[ y ]] { k => @"C --[[ s" $a$ }')]
+    expected = [DEFINE, WORD, NUMBER, 'RPAREN', 'LBRACE', WORD, 'ARROW', STRING, CONST, 'RBRACE', EOF]
+    if kinds == expected:
+        print("✓ Поток токенов с комментариями")
+        results.append(True)
+    else:
+        print(f"✗ Неожиданные токены: {kinds}")
+        results.append(False)
+
+    samples = [
+        '{ a => $x$ } (define x 1.0)',
+        '(define x 1.0)(define x 2.0) { v => $x$ }',
+        '{ a => @"x" b => 1.0, , c => { d => true },}',
+        '{ s => @"-- text" }',
+        '{ x => 1.0 C комментарий\n}',
+        'заголовок без комментария\n{ x => 1.0 } { y => 2.0 }',
+        '',
+    ]
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        with open(name, 'r', encoding='utf-8') as f:
+            samples.append(f.read())
+
+    matched = []
+    for text in samples:
+        if ConfigParser().parse(text) == LegacyConfigParser().parse(text):
+            matched.append(True)
+        else:
+            print(f"✗ Расхождение с исходным парсером: {text[:40]!r}")
+            matched.append(False)
+    if all(matched):
+        print(f"✓ Совпадение с исходным парсером: {len(matched)}/{len(samples)}")
+    results.extend(matched)
+
+    # Исходный парсер вырезал комментарии даже внутри строк, новый лексер их сохраняет
+    result = ConfigParser().parse('{ s => @"a C b --[[ c ]]" }')
+    if result == {'s': 'a C b --[[ c ]]'}:
+        print("✓ Комментарии внутри строки не вырезаются")
+        results.append(True)
+    else:
+        print(f"✗ Строка испорчена: {result}")
+        results.append(False)
+
+    # Развёрнутый шаблон слова и быстрые проверки первого символа
+    text = 'aCb CCx xC\tкомментарий\n.5 -x +1.5 ٣.٥ -- --[[ c ]]ключ'
+    words = [tok[:2] for tok in tokenize(text)]
+    ok = words == [(WORD, 'aCb'), (WORD, 'CCx'), (WORD, 'x'), ('JUNK', '.'), (WORD, '5'), ('JUNK', '-'),
+                   (WORD, 'x'), (NUMBER, 1.5), (NUMBER, 3.5), ('JUNK', '-'), ('JUNK', '-'), (WORD, 'ключ'), (EOF, None)]
+    ok = ok and [tok[:2] for tok in tokenize_bytes(text.encode('utf-8'))] == words
+    print(f"{'✓' if ok else '✗'} Слова с C, точка и знаки без числа, цифры Unicode")
+    results.append(ok)
+
+    # Исходный парсер остаётся эталоном: значения и сообщения об ошибках
+    legacy = LegacyConfigParser()
+    errors = []
+    for text in ('(define ключ 1.0) { }', '{ ключ => 1.0 }', '{ a => 1.0.0 }', '{ a => $b }', '(define a 1²) { }'):
+        try:
+            legacy.parse(text)
+            errors.append(None)
+        except SyntaxError as e:
+            errors.append(str(e))
+    ok = errors == ["Неправильное имя константы: ключ", "Неправильный идентификатор: ключ",
+                    "Непонятное значение: 1.0.0", "Незакрытая константа: $b", "Некорректное число в define: 1²"]
+    ok = ok and legacy.parse('(define s @"x") { a => { b => $s$ }, c => -2.5, d => true }') == \
+        {'a': {'b': 'x'}, 'c': -2.5, 'd': True}
+    print(f"{'✓' if ok else '✗'} Исходный парсер: значения и сообщения об ошибках")
+    results.append(ok)
+
+    # Намеренные отличия от исходного парсера (readme, «Отличия от исходного парсера»):
+    # текст, результат исходного и нового парсера (словарь или сообщение ошибки)
+    differences = [
+        # В позиции ключа пропускаются только запятые и одиночные посторонние символы
+        ('{)}', {}, "Неправильный идентификатор: )"),
+        ('{ => }', {}, "Неправильный идентификатор: =>"),
+        ('{ { a => 1.0 } }', {'a': 1.0}, "Неправильный идентификатор: {"),
+        # Комментарий разделяет токены и не объявляет константы
+        ('{ c--[[ ]]k => 1.0 }', {'ck': 1.0}, "Ожидалось => после ключа c"),
+        ('C (define p 1.0)\n{ a => $p$ }', {'a': 1.0}, "Неопределённая константа: $p$"),
+        ('(define --[[ порт ]] port 80.0) { p => $port$ }', "Неправильное имя константы: ", {'p': 80.0}),
+        # Строка - непрозрачный текст
+        ('{ s => @"a C b" }', "Непарные фигурные скобки", {'s': 'a C b'}),
+        ('{ s => @"--[[ x ]]" }', {'s': ''}, {'s': '--[[ x ]]'}),
+        ('{ s => @"}" }', "Незакрытая строка", {'s': '}'}),
+        ('{ s => @"(define q 1.0)" }', {'s': ''}, {'s': '(define q 1.0)'}),
+        # Текст вне словарей проходит лексер
+        ('{ a => 1.0 } $', {'a': 1.0}, "Незакрытая константа: $"),
+        ('{ a => 1.0 } @"', {'a': 1.0}, "Незакрытая строка"),
+        # После значения define обязательна ), значение может быть другой константой
+        ('(define x 1.0 junk) { a => $x$ }', {'a': 1.0}, "Ожидалась ) после значения константы x"),
+        ('(define q 1.0', {}, "Ожидалась ) после значения константы q"),
+        ('(define a 1.0)(define b $a$) { v => $b$ }', "Некорректное число в define: ", {'v': 1.0}),
+        # Непонятное значение - это токен, а не текст до запятой
+        ('{ a => 1.0 b => 2.0 }', "Непонятное значение: 1.0 b => 2.0", "Непонятное значение: b"),
+    ]
+    matched = []
+    for text, old, new in differences:
+        got = []
+        for parser in (LegacyConfigParser(), ConfigParser()):
+            try:
+                got.append(parser.parse(text))
+            except SyntaxError as e:
+                got.append(e.msg)
+        matched.append(got == [old, new])
+        if not matched[-1]:
+            print(f"✗ Отличие от исходного парсера {text!r}: {got}")
+    if all(matched):
+        print(f"✓ Отличия от исходного парсера: {len(differences)} задокументированных случаев")
+    results.extend(matched)
+
+    return all(results)
+
+
+def test_streaming():
+    """Тесты инкрементального разбора feed/close и iterparse"""
+    print("\n=== ТЕСТЫ ПОТОКОВОГО РАЗБОРА ===")
+    results = []
+
+    text = (
+        '--[[ многострочный\nкомментарий ]]\n'
+        '(define host @"example.com")\n(define port -8080.0)\n'
+        '{\n  server => { host => $host$, port => $port$, note => @"C --[[ }" },\n'
+        '  C комментарий\n  flags => { debug => true, level => +2.5 }\n}\n'
+    )
+    expected = ConfigParser().parse(text)
+
+    # Любая граница куска: посреди строки, комментария, define и чисел
+    long_text = (
+        '--[[ ' + 'длинный ] комментарий ' * 20 + ']]\nC ' + 'строка ' * 20 + '\n'
+        '{ value => 12345678901.5, x => -123456789012.25, s => @"' + 'текст ' * 20 + '" }\n'
+        '--[[ незакрытый до конца ' + 'x' * 40
+    )
+    chunked = []
+    for sample in (text, long_text):
+        sample_expected = ConfigParser().parse(sample)
+        for data in (sample, sample.encode('utf-8')):
+            for size in range(1, 40):
+                parser = ConfigParser()
+                try:
+                    for i in range(0, len(data), size):
+                        parser.feed(data[i:i + size])
+                    chunked.append(parser.close() == sample_expected)
+                except SyntaxError:
+                    chunked.append(False)
+    if all(chunked):
+        print(f"✓ feed/close по кускам: {len(chunked)}")
+    else:
+        print(f"✗ feed/close по кускам: {sum(chunked)}/{len(chunked)}")
+    results.extend(chunked)
+
+    events = list(ConfigParser().iterparse([text[i:i + 4] for i in range(0, len(text), 4)]))
+    if events == [((), 'server', expected['server']), ((), 'flags', expected['flags'])]:
+        print("✓ iterparse: события по секциям")
+        results.append(True)
+    else:
+        print(f"✗ iterparse: {events}")
+        results.append(False)
+
+    events = list(ConfigParser().iterparse([text], depth=1))
+    if events[:2] == [(('server',), 'host', 'example.com'), (('server',), 'port', -8080.0)]:
+        print("✓ iterparse: события второго уровня")
+        results.append(True)
+    else:
+        print(f"✗ iterparse depth=1: {events}")
+        results.append(False)
+
+    events = list(ConfigParser().iterparse(io.BytesIO(b'{ a => 1.0, b => @"x" }'), block_size=4))
+    if events == [((), 'a', 1.0), ((), 'b', 'x')]:
+        print("✓ iterparse: двоичный файловый объект")
+        results.append(True)
+    else:
+        print(f"✗ iterparse из BytesIO: {events}")
+        results.append(False)
+
+    with open('example_game.conf', 'r', encoding='utf-8') as f:
+        game = f.read()
+    if ConfigParser().parse_file('example_game.conf', block_size=16) == ConfigParser().parse(game):
+        print("✓ parse_file блоками")
+        results.append(True)
+    else:
+        print("✗ parse_file блоками")
+        results.append(False)
+
+    parser = ConfigParser()
+    parser.feed('{ a => @"незакрытая')
+    try:
+        parser.close()
+        print("✗ Незакрытая строка в потоке не обнаружена")
+        results.append(False)
+    except SyntaxError as e:
+        print(f"✓ Ожидаемая ошибка: {e}")
+        results.append(True)
+
+    return all(results)
+
+
+def test_bytes_source():
+    """Тесты разбора байтов: bytes, memoryview и mmap"""
+    print("\n=== ТЕСТЫ БАЙТОВОГО ИСТОЧНИКА ===")
+    results = []
+
+    text = '(define name @"сервер")\n{ title => $name$, C комментарий\n port => 80.0, s => @"ёж --[[ x ]]" }'
+    expected = ConfigParser().parse(text)
+    data = text.encode('utf-8')
+
+    sources = [ConfigParser().parse(source) == expected for source in (data, bytearray(data), memoryview(data))]
+    print(f"{'✓' if all(sources) else '✗'} bytes/bytearray/memoryview: {sum(sources)}/3")
+    results.extend(sources)
+
+    mapped = []
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        if ConfigParser().parse_file(name, use_mmap=True) == ConfigParser().parse_file(name):
+            mapped.append(True)
+        else:
+            print(f"✗ mmap: {name}")
+            mapped.append(False)
+    if all(mapped):
+        print("✓ parse_file через mmap")
+    results.extend(mapped)
+
+    # Не-ASCII символы вне строк: байты должны разбираться так же, как str
+    samples = [
+        '{ a => 1.0, « b => 2.0 }',
+        '{ a => 1.0,\xa0b => 2.0 }',
+        '{ a => 1.0,\u2028b => 2.0\x1c}',
+        '{ a => 1.0 — b => @"ёж" }',
+        '{ a => 1.0, b => 1\u0663.5, c => 2.0ё }',
+        '{ a => ё1.5 }',
+        '{ ключ => 1.0 }',
+    ]
+    differential = []
+    for text in samples:
+        outcomes = []
+        for source in (text, text.encode('utf-8')):
+            try:
+                outcomes.append(ConfigParser().parse(source))
+            except SyntaxError as e:
+                outcomes.append(str(e))
+        if outcomes[0] == outcomes[1]:
+            differential.append(True)
+        else:
+            print(f"✗ str и bytes расходятся на {text!r}: {outcomes}")
+            differential.append(False)
+    if all(differential):
+        print(f"✓ str и bytes совпадают на не-ASCII вводе: {len(differential)}")
+    results.extend(differential)
+
+    tests = [
+        ("Кириллический ключ в байтах", '{ ключ => 1.0 }'.encode('utf-8'), False),
+        ("Незакрытая строка в байтах", b'{ a => @"x', False),
+        ("Многобайтовые символы в строке", '{ a => @"日本" }'.encode('utf-8'), True),
+    ]
+    for name, config, should_pass in tests:
+        results.append(run_test(name, config, should_pass))
+
+    return all(results)
+
+
+def test_cache():
+    """Тесты кэша результатов разбора"""
+    print("\n=== ТЕСТЫ КЭША ===")
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = os.path.join(tmp, 'first.conf')
+        second = os.path.join(tmp, 'second.conf')
+        with open(first, 'w', encoding='utf-8') as f:
+            f.write('{ a => 1.0 }')
+        with open(second, 'w', encoding='utf-8') as f:
+            f.write('{ b => 2.0 }')
+
+        cache = ParseCache(max_entries=1)
+        cache.load(first)
+        results.append(cache.load(first) == {'a': 1.0} and cache.hits == 1)
+        cache.load(second)
+        results.append(cache.evictions == 1)
+
+        # Изменённый файл разбирается заново
+        with open(first, 'w', encoding='utf-8') as f:
+            f.write('{ a => 10.0, c => 3.0 }')
+        results.append(cache.load(first) == {'a': 10.0, 'c': 3.0})
+        print(f"✓ LRU в памяти: {cache.stats()}")
+
+        cache_dir = os.path.join(tmp, 'cache')
+        ParseCache(cache_dir=cache_dir, key='content').load(first)
+        warm = ParseCache(cache_dir=cache_dir, key='content')
+        results.append(warm.load(first) == {'a': 10.0, 'c': 3.0} and warm.disk_hits == 1)
+        print("✓ Тёплый старт с диска")
+
+        # Повреждённый файл кэша отбрасывается
+        for folder, _, names in os.walk(cache_dir):
+            for name in names:
+                with open(os.path.join(folder, name), 'r+b') as f:
+                    f.seek(-1, os.SEEK_END)
+                    f.write(b'\x00')
+        cold = ParseCache(cache_dir=cache_dir, key='content')
+        results.append(cold.load(first) == {'a': 10.0, 'c': 3.0} and cold.disk_hits == 0)
+        print("✓ Повреждённый кэш разбирается заново")
+
+        # На диске остаётся только последняя запись каждого файла
+        stat_dir = os.path.join(tmp, 'stat')
+        for version in range(3):
+            with open(first, 'w', encoding='utf-8') as f:
+                f.write(f'{{ a => {version}.0 }}')
+            os.utime(first, ns=(version * 10 ** 9, version * 10 ** 9))
+            ParseCache(cache_dir=stat_dir).load(first)
+        stored = [name for _, _, names in os.walk(stat_dir) for name in names]
+        warm = ParseCache(cache_dir=stat_dir)
+        pruned = len(stored) == 1 and warm.load(first) == {'a': 2.0} and warm.disk_hits == 1
+        results.append(pruned)
+        print(f"{'✓' if pruned else '✗'} Устаревшие записи удаляются: файлов {len(stored)}")
+
+    if not all(results):
+        print(f"✗ Кэш: {results}")
+    return all(results)
+
+
+def test_incremental():
+    """Тесты инкрементального повторного разбора"""
+    print("\n=== ТЕСТЫ ИНКРЕМЕНТАЛЬНОГО РАЗБОРА ===")
+    results = []
+
+    text = '(define k 1.0)\n{ a => 1.0, kk => $k$, b => { c => $k$ } }'
+    inc = IncrementalParser()
+    inc.parse(text)
+    text = text.replace('a => 1.0', 'a => 2.0')
+    result, changes = inc.update(text)
+    results.append(changes == [('changed', 'a', 1.0, 2.0)] and inc.full_parses == 1)
+
+    # Ссылка прямо в основном словаре должна пережить пересборку словаря
+    pos = text.index('a => 2.0,') + len('a => 2.0,')
+    result, changes = inc.update(edit=(pos, pos, '(define k 3.0)'))
+    ok = result == {'a': 2.0, 'kk': 3.0, 'b': {'c': 3.0}} and inc.full_parses == 1
+    results.append(ok and sorted(changes) == [('changed', 'b.c', 1.0, 3.0), ('changed', 'kk', 1.0, 3.0)])
+    print(f"{'✓' if all(results) else '✗'} Правка значения и define без полного разбора")
+
+    # Удалённая константа: ошибка, а дерево и текст остаются прежними
+    inc = IncrementalParser()
+    old_text = '(define k 1.0)(define q 1.0)\n{ a => $k$, b => $q$ }'
+    inc.parse(old_text)
+    try:
+        inc.update('(define k 5.0)\n{ a => $k$, b => $q$ }')
+        print("✗ Удалённая константа не обнаружена")
+        results.append(False)
+    except SyntaxError as e:
+        unchanged = inc.text == old_text and inc.result == {'a': 1.0, 'b': 1.0}
+        print(f"{'✓' if unchanged else '✗'} Ожидаемая ошибка без частичных изменений: {e}")
+        results.append(unchanged)
+
+    # Случайные правки: результат всегда совпадает с полным разбором
+    base = (
+        '(define k 1.0)\n(define s @"x")\n'
+        '{ a => 1.0, kk => $k$, b => { c => $s$, d => 2.0 }, (define k 2.0) e => $k$, f => @"y" }\n'
+        '(define s @"z")\n'
+    )
+    snippets = ['', ' ', '1', ',', '}', '(define k 3.0)', '(define s @"w")', 'g => $k$,',
+                'x => { y => $s$ },', '$k$', 'C c\n', '--[[ ]]']
+
+    def full(source):
+        try:
+            return ConfigParser().parse(source)
+        except SyntaxError:
+            return None
+
+    rng = random.Random(16)
+    matched = []
+    for _ in range(300):
+        inc = IncrementalParser()
+        inc.parse(base)
+        current = base
+        for _ in range(8):
+            start = rng.randrange(len(current) + 1)
+            end = min(len(current), start + rng.choice([0, 1, 3]))
+            replacement = rng.choice(snippets)
+            new = current[:start] + replacement + current[end:]
+            expected = full(new)
+            try:
+                if rng.random() < 0.5:
+                    result = inc.update(new)[0]
+                else:
+                    result = inc.update(edit=(start, end, replacement))[0]
+            except SyntaxError:
+                result = None
+            if expected is not None:
+                current = new
+            matched.append(result == expected and inc.result == full(current))
+    if all(matched):
+        print(f"✓ Случайные правки совпадают с полным разбором: {len(matched)}")
+    else:
+        print(f"✗ Случайные правки: {sum(matched)}/{len(matched)}")
+    results.extend(matched)
+
+    return all(results)
+
+
+def test_batch():
+    """Тесты пакетного преобразования"""
+    print("\n=== ТЕСТЫ ПАКЕТНОГО РЕЖИМА ===")
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'configs')
+        os.makedirs(os.path.join(source, 'nested'))
+        for name in ('example_server.conf', 'example_game.conf'):
+            with open(name, 'r', encoding='utf-8') as f:
+                text = f.read()
+            with open(os.path.join(source, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        with open(os.path.join(source, 'nested', 'small.conf'), 'w', encoding='utf-8') as f:
+            f.write('{ a => 1.0 }')
+        with open(os.path.join(source, 'broken.conf'), 'w', encoding='utf-8') as f:
+            f.write('{ Bad => 1.0 }')
+
+        tasks = batch.expand_inputs([source, os.path.join(source, '*.conf')])
+        results.append(len(tasks) == 4)
+
+        output_dir = os.path.join(tmp, 'out')
+        errors = io.StringIO()
+        summary = batch.convert_many(tasks, jobs=2, chunk=1, output_dir=output_dir, err=errors)
+        with open(os.path.join(output_dir, 'nested', 'small.json'), encoding='utf-8') as f:
+            nested = json.load(f)
+        with open(os.path.join(output_dir, 'example_game.json'), encoding='utf-8') as f:
+            game = json.load(f)
+        ok = summary['failed'] == 1 and 'broken.conf' in errors.getvalue()
+        ok = ok and nested == {'a': 1.0} and game == ConfigParser().parse_file('example_game.conf')
+        print(f"{'✓' if ok else '✗'} Пул процессов, --output-dir: {batch.format_summary(summary)}")
+        results.append(ok)
+
+        # NDJSON и список путей в stdin
+        listing = io.StringIO('\n'.join(path for path, _ in tasks) + '\n')
+        out = io.StringIO()
+        summary = batch.convert_many(batch.expand_inputs(['-'], stdin=listing), jobs=1, out=out, err=io.StringIO())
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        ok = summary['failed'] == 1 and len(lines) == 3 and lines[-1]['result'] == {'a': 1.0}
+        print(f"{'✓' if ok else '✗'} NDJSON из списка в stdin: {len(lines)} строк")
+        results.append(ok)
+
+    return all(results)
+
+
+def test_async_loader():
+    """Тесты асинхронной загрузки"""
+    print("\n=== ТЕСТЫ АСИНХРОННОЙ ЗАГРУЗКИ ===")
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(5):
+            path = os.path.join(tmp, f'config_{i}.conf')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f'(define n {i}.0)\n{{ index => $n$, name => @"файл {i}" }}')
+            paths.append(path)
+        broken = os.path.join(tmp, 'broken.conf')
+        with open(broken, 'w', encoding='utf-8') as f:
+            f.write('{ a => }')
+
+        async def scenario():
+            loader = AsyncConfigLoader(max_workers=2)
+            try:
+                loaded = await loader.load_many(paths)
+                ok = [r['index'] for r in loaded] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+                # Одновременные запросы одного файла делят один разбор
+                before = loader.parses
+                same = await asyncio.gather(*(loader.load(paths[0]) for _ in range(10)))
+                ok = ok and loader.parses == before + 1 and all(r is same[0] for r in same)
+
+                mixed = await loader.load_many([paths[1], broken], return_exceptions=True)
+                ok = ok and mixed[0]['index'] == 1.0 and isinstance(mixed[1], SyntaxError)
+
+                # Исполнитель занят: ожидание прерывается таймаутом, потом файл грузится
+                blocker = loader._executor.submit(time.sleep, 0.3)
+                loader._executor.submit(time.sleep, 0.3)
+                try:
+                    await loader.load(paths[2], timeout=0.05)
+                    ok = False
+                except asyncio.TimeoutError:
+                    pass
+
+                # Отмена одного ожидающего не отменяет разбор для остальных
+                first = asyncio.ensure_future(loader.load(paths[3]))
+                second = asyncio.ensure_future(loader.load(paths[3]))
+                await asyncio.sleep(0)
+                first.cancel()
+                ok = ok and (await second)['index'] == 3.0 and first.cancelled()
+                blocker.result()
+                ok = ok and (await loader.load(paths[2]))['index'] == 2.0
+                return ok
+            finally:
+                loader.close()
+
+        ok = asyncio.run(scenario())
+        print(f"{'✓' if ok else '✗'} load/load_many: общий разбор, таймаут, отмена")
+        results.append(ok)
+
+    return all(results)
+
+
+def test_compact():
+    """Тесты компактного неизменяемого дерева"""
+    print("\n=== ТЕСТЫ КОМПАКТНОГО ДЕРЕВА ===")
+    results = []
+
+    game = ConfigParser().parse_file('example_game.conf')
+    frozen = freeze(game)
+    enemies = frozen['enemies']
+    ok = frozen == game and frozen.to_dict() == game and type(frozen.to_dict()['enemies']) is dict
+    ok = ok and enemies['zombie']._shape is enemies['boss']._shape
+    ok = ok and type(enemies['boss']._values).__name__ == 'array' and enemies['boss']['health'] == 500.0
+    ok = ok and frozen['graphics']['vsync'] is True and 'physics' in frozen and len(frozen) == len(game)
+    print(f"{'✓' if ok else '✗'} Mapping, to_dict, общий набор ключей, массив чисел")
+    results.append(ok)
+
+    tree = ConfigParser().parse('{ a => { x => 1.0, y => true }, b => { x => 1.0, y => true }, c => { x => 1.0, y => 1.0 } }')
+    frozen = freeze(tree)
+    ok = frozen['a'] is frozen['b'] and frozen['c'] is not frozen['a'] and frozen['a']['y'] is True
+    try:
+        frozen['a'] = 1
+        ok = False
+    except TypeError:
+        pass
+    print(f"{'✓' if ok else '✗'} Одинаковые поддеревья общие, true не смешивается с 1.0")
+    results.append(ok)
+
+    deep = ConfigParser().parse('{ a => ' * 5000 + '{ x => 1.0 }' + ' }' * 5000)
+    node = freeze(deep)
+    for _ in range(5000):
+        node = node['a']
+    ok = type(node) is FrozenNode and node['x'] == 1.0
+    print(f"{'✓' if ok else '✗'} Вложенность 5000 уровней без рекурсии")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_lazy():
+    """Тесты ленивого разбора"""
+    print("\n=== ТЕСТЫ ЛЕНИВОГО РАЗБОРА ===")
+    results = []
+
+    ok = True
+    for path in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        lazy = parse_lazy(text)
+        ok = ok and lazy.to_dict() == ConfigParser().parse(text)
+        lazy.validate()
+    print(f"{'✓' if ok else '✗'} Результат совпадает с полным разбором на примерах")
+    results.append(ok)
+
+    text = ('{ server => { port => 80.0, name => $host$ }, '
+            'broken => { a => => }, '
+            'defs => { (define host @"srv") x => 1.0 } }')
+    lazy = parse_lazy(text)
+    ok = lazy.get('server.port') == 80.0 and lazy.get('server.name') == 'srv'
+    ok = ok and lazy.get('server.missing', 'нет') == 'нет' and lazy.get('defs.x') == 1.0
+    ok = ok and type(lazy['server']) is LazyNode and lazy['server'] is lazy['server']
+    print(f"{'✓' if ok else '✗'} get() по пути, константа из define в соседнем словаре")
+    results.append(ok)
+
+    errors = 0
+    try:
+        lazy['broken']['a']
+    except SyntaxError:
+        errors += 1
+    try:
+        lazy.validate()
+    except SyntaxError:
+        errors += 1
+    ok = errors == 2
+    print(f"{'✓' if ok else '✗'} Ошибка в неоткрытом словаре - при обращении и в validate()")
+    results.append(ok)
+
+    lazy = parse_lazy('{ a => { b => { c => $late$ } } }\n(define late 2.5)')
+    ok = lazy.get('a.b.c') == 2.5 and lazy.to_dict() == {'a': {'b': {'c': 2.5}}}
+    try:
+        parse_lazy('{ a => { b => 1.0 }')
+        ok = False
+    except SyntaxError:
+        pass
+    print(f"{'✓' if ok else '✗'} define после основного словаря, непарная скобка")
+    results.append(ok)
+
+    return all(results)
+
+
+def _flatten(tree):
+    """Пути через точку и значения дерева (обход для проверки индекса)"""
+    flat = {}
+    stack = [('', tree)]
+    while stack:
+        prefix, node = stack.pop()
+        for key, value in node.items():
+            path = prefix + key
+            flat[path] = value
+            if type(value) is dict:
+                stack.append((path + '.', value))
+    return flat
+
+
+def test_index():
+    """Тесты индекса путей"""
+    print("\n=== ТЕСТЫ ИНДЕКСА ПУТЕЙ ===")
+    results = []
+
+    ok = True
+    for path in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        parser = ConfigParser(build_index=True)
+        result = parser.parse(text)
+        index = parser.index
+        flat = _flatten(result)
+        ok = ok and type(index) is ConfigIndex and dict(index.prefix('')) == flat
+        ok = ok and all(index.get(p) is v or index.get(p) == v for p, v in flat.items())
+        streamed = ConfigParser(build_index=True)
+        streamed.parse_file(path, block_size=7)
+        ok = ok and dict(streamed.index.prefix('')) == flat
+        ok = ok and all(streamed.index.offset(p) == index.offset(p) for p in flat)
+    ok = ok and ConfigParser().parse('{ a => 1.0 }') == {'a': 1.0}
+    print(f"{'✓' if ok else '✗'} Индекс совпадает с деревом, в том числе при разборе блоками")
+    results.append(ok)
+
+    parser = ConfigParser(build_index=True)
+    parser.parse_file('example_game.conf')
+    index = parser.index
+    ok = index.get('enemies.boss.health') == 500.0 and index.get('enemies.boss.nope', -1) == -1
+    ok = ok and list(index.glob('enemies.*.speed')) == [('enemies.zombie.speed', 2.0), ('enemies.boss.speed', 3.0)]
+    ok = ok and index.paths('speed') == ['player.speed', 'enemies.zombie.speed', 'enemies.boss.speed']
+    ok = ok and [p for p, _ in index.glob('enemies.boss.*')] == ['enemies.boss.damage', 'enemies.boss.health', 'enemies.boss.speed']
+    ok = ok and [p for p, _ in index.glob('*.[fg]*')] == ['graphics.fps_limit', 'physics.friction', 'physics.gravity']
+    ok = ok and [p for p, _ in index.prefix('enemies.zombie')] == ['enemies.zombie.damage', 'enemies.zombie.health', 'enemies.zombie.speed']
+    print(f"{'✓' if ok else '✗'} get, glob, пути по имени ключа, обход по префиксу")
+    results.append(ok)
+
+    text = '{ a => { b => 1.0 }, a => 2.0, c => $x$, c => @"s", d => $x$ }\n(define x 5.0)'
+    parser = ConfigParser(build_index=True)
+    parser.parse(text)
+    index = parser.index
+    ok = dict(index.prefix('')) == {'a': 2.0, 'c': 's', 'd': 5.0} and index.paths('b') == []
+    ok = ok and text[index.offset('d'):].startswith('$x$') and text[index.offset('c'):].startswith('@"s"')
+    print(f"{'✓' if ok else '✗'} Повторные ключи, константы после словаря, позиции в тексте")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_benchmark_suite():
+    """Тесты генератора и сравнения набора замеров"""
+    print("\n=== ТЕСТЫ НАБОРА ЗАМЕРОВ ===")
+    results = []
+
+    text = benchmark.generate_synthetic(keys=300, width=5, depth=4, string_length=40,
+                                        comment_density=0.5, constants=7, refs=0.3, seed=3)
+    result = ConfigParser().parse(text)
+    flat = _flatten(result)
+    leaves = [p for p, v in flat.items() if type(v) is not dict]
+    deepest = max(p.count('.') for p in flat) + 1
+    ok = text == benchmark.generate_synthetic(keys=300, width=5, depth=4, string_length=40,
+                                              comment_density=0.5, constants=7, refs=0.3, seed=3)
+    ok = ok and len(leaves) == 300 and deepest == 5 and text.count('(define') == 7
+    ok = ok and 'C комментарий' in text and '--[[' in text and '$const_' in text
+    ok = ok and all(len(v) == 40 for v in flat.values() if type(v) is str and v[0] != 'v')
+    ok = ok and LegacyConfigParser().parse(text) == result
+    print(f"{'✓' if ok else '✗'} Генератор: число пар, глубина, define, комментарии, повторяемость")
+    results.append(ok)
+
+    baseline = {'cases': {'wide': {'seconds': {'parse': 1.0, 'json': 0.5}}}}
+    current = {'cases': {'wide': {'seconds': {'parse': 1.1, 'json': 0.8, 'tokenize': 0.3}},
+                         'new': {'seconds': {'parse': 1.0}}}}
+    rows = benchmark.compare_reports(current, baseline, threshold=0.15)
+    flags = {(name, stage): regressed for name, stage, _, _, _, regressed in rows}
+    ok = flags == {('wide', 'parse'): False, ('wide', 'json'): True}
+    report = benchmark.run_suite(repeat=1, scale=0.01, legacy=False, cases=['wide'])
+    ok = ok and set(report['cases']) == {'wide'} and 'parse' in report['cases']['wide']['seconds']
+    ok = ok and json.loads(json.dumps(report)) == report
+    print(f"{'✓' if ok else '✗'} JSON-отчёт и поиск регрессий относительно эталона")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_stats():
+    """Тесты статистики разбора"""
+    print("\n=== ТЕСТЫ СТАТИСТИКИ РАЗБОРА ===")
+    results = []
+
+    with open('example_game.conf', 'r', encoding='utf-8') as f:
+        text = f.read()
+    parser = ConfigParser(stats=True)
+    result = parser.parse_file('example_game.conf')
+    stats = parser.stats
+    ok = result == ConfigParser().parse(text) and type(stats) is ParseStats
+    ok = ok and list(stats.phases) == ['read', 'tokenize', 'parse', 'constants']
+    ok = ok and all(t >= 0 for t in stats.phases.values()) and set(stats.allocations) == set(stats.phases)
+    ok = ok and stats.tokens == len(list(tokenize(text))) and stats.dicts == 8 and stats.max_depth == 3
+    ok = ok and stats.constants_defined == 3 and stats.constants_referenced == 3
+    ok = ok and stats.size == len(text.encode('utf-8')) and stats.bytes_copied > 0
+    print(f"{'✓' if ok else '✗'} Этапы и счётчики для example_game.conf")
+    results.append(ok)
+
+    parser = ConfigParser(stats=True)
+    result = parser.parse('{ a => { b => { c => 1.0 } } }'.encode('utf-8'))
+    with parser.stats.phase('json'):
+        json.dumps(result)
+    report = parser.stats.report()
+    ok = parser.stats.max_depth == 3 and parser.stats.dicts == 3 and 'JSON-вывод' in report
+    ok = ok and json.loads(json.dumps(parser.stats.to_dict()))['tokens'] == parser.stats.tokens
+    ok = ok and ConfigParser().stats is None
+    print(f"{'✓' if ok else '✗'} Разбор байтов, замер JSON, отчёт и to_dict")
+    results.append(ok)
+
+    # Тот же потоковый путь, что без статистики: блоки любого размера, байты UTF-8
+    text = '(define имя @"Сервер")\n{ title => @"Привет, мир", name => $имя$, n => 1.0 }'.replace('имя', 'name')
+    expected = ConfigParser().parse(text)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'ru.conf')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        ok = True
+        for block_size in (1, 7, 1 << 16):
+            parser = ConfigParser(stats=True)
+            ok = ok and parser.parse_file(path, block_size=block_size) == expected
+            ok = ok and parser.stats.tokens == len(list(tokenize(text)))
+            ok = ok and parser.stats.bytes_copied == len('title' 'Привет, мир' 'name' 'Сервер' 'name' 'name' 'n'
+                                                         .encode('utf-8'))
+        for source in (text, text.encode('utf-8')):
+            parser = ConfigParser(stats=True)
+            ok = ok and parser.parse(source) == expected and parser.stats.bytes_copied > len('Привет, мир Сервер')
+            ok = ok and 'read' not in parser.stats.phases and parser.stats.size == len(text.encode('utf-8'))
+        for bad in ('{ a => 1.0, b => $x$ }', '{ a => 1.0, b => @"x }', '{ a => 1.0, B => 2.0, @"x'):
+            for block_size in (3, 1 << 16):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(bad)
+                try:
+                    ConfigParser(stats=True).parse_file(path, block_size=block_size)
+                    ok = False
+                except SyntaxError as e:
+                    try:
+                        ConfigParser().parse_file(path, block_size=block_size)
+                    except SyntaxError as plain:
+                        ok = ok and str(e) == str(plain)
+    print(f"{'✓' if ok else '✗'} Статистика на потоковом пути: блоки, байты UTF-8, те же ошибки")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_compiled():
+    """Тесты скомпилированного двоичного формата"""
+    print("\n=== ТЕСТЫ СКОМПИЛИРОВАННОГО ФОРМАТА ===")
+    results = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        ok = True
+        for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+            target = compile_file(name, os.path.join(folder, name + 'c'))
+            expected = ConfigParser().parse_file(name)
+            with CompiledConfig.open(target) as config:
+                root = config.root()
+                ok = ok and root.to_dict() == expected and list(root) == list(expected)
+                ok = ok and config.is_fresh(name) and config.is_fresh(name, check='content')
+        print(f"{'✓' if ok else '✗'} Дерево и порядок ключей совпадают с разбором")
+        results.append(ok)
+
+        tree = {'b': {'x': 1.5, 'flag': True, 'off': False}, 'a': 'строка', 'c': {}, 'z': 'строка'}
+        config = CompiledConfig(compile_config(tree))
+        root = config.root()
+        ok = root['b']['flag'] is True and root['b']['off'] is False and root['a'] == 'строка'
+        ok = ok and root.get('b.x') == 1.5 and root.get('b.nope', 0) == 0 and root.get('a.x') is None
+        ok = ok and 'c' in root and 'q' not in root and len(root['c']) == 0 and type(root['b']) is CompiledNode
+        try:
+            root['q']
+            ok = False
+        except KeyError:
+            pass
+        print(f"{'✓' if ok else '✗'} Поиск по ключу, путь через точку, типы значений")
+        results.append(ok)
+
+        source = os.path.join(folder, 'app.conf')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('{ port => 80.0 }')
+        compile_file(source)
+        artifact = os.path.join(folder, 'app.confc')
+        ok = type(load_compiled(source)) is CompiledNode and load_compiled(source)['port'] == 80.0
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('{ port => 81.0 }')
+        stale = load_compiled(source)
+        ok = ok and type(stale) is CompiledNode and stale == {'port': 81.0} and stale.get('port') == 81.0
+        with CompiledConfig.open(artifact) as config:
+            ok = ok and config.is_fresh(source)
+        with open(artifact, 'r+b') as f:
+            f.seek(8 + 8 + 8 + 32)
+            f.write(b'\0' * 32)
+        ok = ok and type(load_compiled(source)) is CompiledNode
+        with open(artifact, 'wb') as f:
+            f.write(b'CFGB\1')
+        ok = ok and load_compiled(source) == {'port': 81.0} and os.path.getsize(artifact) > 5
+        elsewhere = load_compiled(source, os.path.join(folder, 'missing', 'app.confc'))
+        ok = ok and type(elsewhere) is CompiledNode and elsewhere.get('port') == 81.0
+        os.unlink(source)
+        ok = ok and load_compiled(source)['port'] == 81.0
+        print(f"{'✓' if ok else '✗'} Устаревший, чужой версии и повреждённый файл - компиляция заново, тот же CompiledNode")
+        results.append(ok)
+
+        with load_compiled(source) as config:
+            ok = config.get('port') == 81.0
+        try:
+            config['port']
+            ok = False
+        except ValueError:
+            pass
+        config = load_compiled(source)
+        config.close()
+        config.close()
+        print(f"{'✓' if ok else '✗'} Отображение закрывается через with и close()")
+        results.append(ok)
+
+    return all(results)
+
+
+def test_json_output():
+    """Тесты потокового JSON-вывода"""
+    print("\n=== ТЕСТЫ JSON-ВЫВОДА ===")
+    results = []
+
+    ok = True
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        result = ConfigParser().parse_file(name)
+        out = io.StringIO()
+        write_json(result, out)
+        ok = ok and out.getvalue() == json.dumps(result, indent=2, ensure_ascii=False) + '\n'
+        ok = ok and format_json(result, None) == json.dumps(result, ensure_ascii=False, separators=(',', ':'))
+        ok = ok and format_json(result, 4) == json.dumps(result, indent=4, ensure_ascii=False)
+    print(f"{'✓' if ok else '✗'} Текст совпадает с json.dumps (отступ 2, 4 и компактный)")
+    results.append(ok)
+
+    tree = {'s': 'кавычка " и \\ и \n', 'n': -0.5, 'big': 1e300, 't': True, 'f': False, 'e': {}, 'd': {'x': {}}}
+    ok = format_json(tree) == json.dumps(tree, indent=2, ensure_ascii=False)
+    ok = ok and format_json({}) == '{}' and format_json({}, None) == '{}'
+    deep = node = {}
+    for _ in range(3000):
+        node['a'] = {}
+        node = node['a']
+    node['x'] = 1.0
+    text = format_json(deep, None)
+    ok = ok and text.startswith('{"a":{"a":') and text.endswith('"x":1.0' + '}' * 3001)
+    ok = ok and format_json(deep).count('\n') == 2 * 3001
+    print(f"{'✓' if ok else '✗'} Экранирование, пустые словари и вложенность глубже предела рекурсии")
+    results.append(ok)
+
+    class Recorder:
+        def __init__(self):
+            self.chunks = []
+
+        def write(self, text):
+            self.chunks.append(text)
+
+    tree = {f'section_{i}': {'name': f'имя {i}', 'value': float(i), 'on': i % 2 == 0} for i in range(5000)}
+    recorder = Recorder()
+    write_json(tree, recorder, None)
+    expected = json.dumps(tree, ensure_ascii=False, separators=(',', ':')) + '\n'
+    ok = ''.join(recorder.chunks) == expected and len(recorder.chunks) > 2
+    ok = ok and max(len(chunk) for chunk in recorder.chunks) < len(expected) // 2
+    print(f"{'✓' if ok else '✗'} Компактный вывод пишется частями, текст как у json.dumps с (',', ':')")
+    results.append(ok)
+
+    ok = True
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        expected = json.dumps(ConfigParser().parse_file(name), indent=2, ensure_ascii=False) + '\n'
+        for depth in (0, 1, sys.maxsize):
+            out = io.StringIO()
+            write_events(ConfigParser().iterparse(name, depth=depth), out)
+            ok = ok and out.getvalue() == expected
+    text = '{ a => {} b => { c => { } d => 1.0 } e => @"x" }'
+    events = list(ConfigParser().iterparse([text], depth=5))
+    ok = ok and ((), 'a', {}) in events and (('b',), 'c', {}) in events
+    out = io.StringIO()
+    write_events(iter(events), out, None)
+    ok = ok and out.getvalue() == '{"a":{},"b":{"c":{},"d":1.0},"e":"x"}\n'
+    out = io.StringIO()
+    write_events(iter(()), out)
+    ok = ok and out.getvalue() == '{}\n'
+    print(f"{'✓' if ok else '✗'} Вывод из событий iterparse, включая пустые словари")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_include():
+    """Тесты нескольких документов и включений"""
+    print("\n=== ТЕСТЫ ДОКУМЕНТОВ И ВКЛЮЧЕНИЙ ===")
+    results = []
+
+    text = '(include @"common.conf") { a => $x$ } (define x 1.0) { b => { c => @"s" } } {}'
+    parser = ConfigParser()
+    documents = parser.parse_documents(text)
+    ok = documents == [{'a': 1.0}, {'b': {'c': 's'}}, {}] and parser.includes == ['common.conf']
+    ok = ok and ConfigParser().parse(text) == {'a': 1.0} and ConfigParser().parse(text.encode('utf-8')) == {'a': 1.0}
+    ok = ok and [t[0] for t in tokenize_bytes(b'(include @"x")')][:3] == ['INCLUDE', STRING, 'RPAREN']
+    for bad in ('(include x) {}', '(include @"x" {}'):
+        try:
+            ConfigParser().parse(bad)
+            ok = False
+        except SyntaxError:
+            pass
+    print(f"{'✓' if ok else '✗'} Несколько документов, (include) в тексте и его ошибки")
+    results.append(ok)
+
+    with tempfile.TemporaryDirectory() as folder:
+        def write(name, content):
+            path = os.path.join(folder, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            return path
+
+        write('shared/base.conf', '(define timeout 30.0)\n(define host @"base")\n')
+        write('shared/common.conf', '(include @"base.conf")\n(define host @"common")\n(define port 80.0)\n')
+        first = write('a.conf', '(include @"shared/common.conf")\n{ host => $host$, t => $timeout$ }\n{ port => $port$ }')
+        second = write('b.conf', '(include @"shared/common.conf")\n(define port 81.0)\n{ port => $port$ }')
+
+        loader = ConfigLoader()
+        a, b = loader.load_many([first, second])
+        ok = a.documents == [{'host': 'common', 't': 30.0}, {'port': 80.0}] and b.result == {'port': 81.0}
+        ok = ok and loader.parses == 4 and a.includes == [os.path.realpath(os.path.join(folder, 'shared/common.conf'))]
+        ok = ok and loader.load(first) is a and loader.parses == 4
+        print(f"{'✓' if ok else '✗'} Общее включение разбирается один раз, свои define важнее включённых")
+        results.append(ok)
+
+        time.sleep(0.01)
+        write('shared/base.conf', '(define timeout 31.0)\n(define host @"base")\n')
+        a = loader.load(first)
+        ok = a.result == {'host': 'common', 't': 31.0} and loader.parses == 4 + 3
+        with ConfigLoader(jobs=2) as parallel:
+            ok = ok and [c.documents for c in parallel.load_many([first, second])] == [a.documents, [{'port': 81.0}]]
+        print(f"{'✓' if ok else '✗'} Изменённое включение пересобирает зависящие файлы, параллельный обход")
+        results.append(ok)
+
+        write('shared/base.conf', '(include @"../a.conf")\n')
+        try:
+            loader.load(first)
+            ok = False
+        except SyntaxError as e:
+            ok = str(e).startswith('Циклическое включение: ') and str(e).count('a.conf') == 2
+        write('shared/base.conf', '(include @"missing.conf")\n')
+        try:
+            loader.load(first)
+            ok = False
+        except FileNotFoundError as e:
+            ok = ok and 'missing.conf' in str(e) and 'base.conf' in str(e)
+        write('shared/base.conf', '')
+        try:
+            loader.load(first)
+            ok = False
+        except SyntaxError as e:
+            ok = ok and e.msg == 'Неопределённая константа: $timeout$' and e.filename.endswith('a.conf')
+            ok = ok and e.lineno == 2 and 'a.conf, строка 2, столбец 24)' in str(e)
+        write('shared/base.conf', '(define timeout 1.0)')
+        ok = ok and loader.load(first).result == {'host': 'common', 't': 1.0}
+        print(f"{'✓' if ok else '✗'} Цикл, отсутствующий файл и неопределённая константа")
+        results.append(ok)
+
+    # Включения подставляются на всех путях загрузки файла, не только в ConfigLoader
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as folder:
+        common = os.path.join(folder, 'common.conf')
+        main = os.path.join(folder, 'main.conf')
+        with open(common, 'w', encoding='utf-8') as f:
+            f.write('(define port 8080.0)\n')
+        with open(main, 'w', encoding='utf-8') as f:
+            f.write('(include @"common.conf")\n{ port => $port$ }\n')
+        expected = {'port': 8080.0}
+
+        async def load_async():
+            async_loader = AsyncConfigLoader(max_workers=1)
+            try:
+                return await async_loader.load(main)
+            finally:
+                async_loader.close()
+
+        parser = ConfigParser()
+        loaded = [
+            parser.parse_file(main),
+            ConfigParser().parse_file(main, use_mmap=True),
+            ConfigParser(stats=True).parse_file(main),
+            {key: value for _, key, value in ConfigParser().iterparse(main)},
+            load_columnar(main),
+            load_columnar(main, documents=True)[0],
+            ParseCache().load(main),
+            ParseCache(key='content').load(main),
+            asyncio.run(load_async()),
+            json.loads(batch._convert_chunk([(main, 'main.conf')], None, None)[0][1])['result'],
+            dict(load_compiled(os.path.join(folder, 'missing.conf'), compile_file(main))),
+        ]
+        ok = all(result == expected for result in loaded) and parser.dependencies == [os.path.realpath(common)]
+        for flags in (['--mmap'], ['--stats'], ['--cache-dir', os.path.join(folder, 'cache')],
+                      ['--stream'], ['--columnar'], ['--batch']):
+            run = subprocess.run([sys.executable, os.path.join(here, 'cli.py'), '--input', main, '--compact'] + flags,
+                                 capture_output=True, text=True, cwd=here)
+            output = json.loads(run.stdout) if run.returncode == 0 else None
+            if flags == ['--batch'] and output is not None:
+                output = output['result']
+            if output != expected:
+                print(f"  cli.py {' '.join(flags)}: {run.stderr.strip()}")
+                ok = False
+        print(f"{'✓' if ok else '✗'} (include) в parse_file, --mmap, --stats, iterparse, столбцах, кэше, async, batch и compiled")
+        results.append(ok)
+
+        cache = ParseCache(cache_dir=os.path.join(folder, 'cache'))
+        contents = ParseCache(key='content')
+        ok = cache.load(main) == expected and contents.load(main) == expected and cache.disk_hits == 1
+        compile_file(main)
+        ok = ok and type(load_compiled(main)) is CompiledNode
+        time.sleep(0.01)
+        with open(common, 'w', encoding='utf-8') as f:
+            f.write('(define port 9090.0)\n')
+        changed = {'port': 9090.0}
+        ok = ok and cache.load(main) == changed and cache.disk_hits == 1 and contents.load(main) == changed
+        ok = ok and ParseCache(cache_dir=os.path.join(folder, 'cache')).load(main) == changed
+        with CompiledConfig.open(compiled_path(main)) as config:
+            ok = ok and not config.is_fresh(main) and not config.is_fresh(main, check='content')
+        ok = ok and dict(load_compiled(main)) == changed
+        os.unlink(common)
+        with CompiledConfig.open(compiled_path(main)) as config:
+            ok = ok and not config.is_fresh(main)
+        print(f"{'✓' if ok else '✗'} Кэш и скомпилированный файл устаревают при изменении включённого файла")
+        results.append(ok)
+
+        with open(main, 'w', encoding='utf-8') as f:
+            f.write('(include @"main.conf")\n{ port => 1.0 }\n')
+        try:
+            ConfigParser().parse_file(main)
+            ok = False
+        except SyntaxError as e:
+            ok = str(e).startswith('Циклическое включение: ')
+        with open(main, 'w', encoding='utf-8') as f:
+            f.write('(include @"common.conf")\n{ port => 1.0 }\n')
+        try:
+            ConfigParser().parse_file(main, use_mmap=True)
+            ok = False
+        except FileNotFoundError as e:
+            ok = ok and 'common.conf' in str(e) and 'main.conf' in str(e)
+        print(f"{'✓' if ok else '✗'} parse_file: цикл через сам файл и отсутствующее включение")
+        results.append(ok)
+
+    return all(results)
+
+
+def test_watch():
+    """Тесты слежения за файлами"""
+    print("\n=== ТЕСТЫ СЛЕЖЕНИЯ ЗА ФАЙЛАМИ ===")
+    results = []
+
+    for backend in ('poll', 'auto'):
+        with tempfile.TemporaryDirectory() as folder:
+            def write(name, content):
+                with open(os.path.join(folder, name), 'w', encoding='utf-8') as f:
+                    f.write(content)
+
+            write('base.inc', '(define x 1.0)')
+            write('a.conf', '(include @"base.inc")\n{ a => $x$ }')
+            write('b.conf', '{ b => 2.0 }')
+            events = []
+            arrived = threading.Condition()
+
+            def collect(event):
+                with arrived:
+                    events.append(event)
+                    arrived.notify_all()
+
+            def wait_for(count):
+                with arrived:
+                    arrived.wait_for(lambda: len(events) >= count, timeout=5)
+                time.sleep(0.25)
+                return events[:]
+
+            watcher = ConfigWatcher([folder], collect, debounce=0.1, interval=0.02, backend=backend)
+            thread = threading.Thread(target=watcher.run)
+            thread.start()
+            try:
+                first = wait_for(2)
+                ok = sorted(os.path.basename(e.path) for e in first) == ['a.conf', 'b.conf']
+                ok = ok and all(e.error is None for e in first)
+
+                for n in range(5):
+                    write('base.inc', f'(define x {n}.5)')
+                burst = wait_for(3)[2:]
+                ok = ok and len(burst) == 1 and burst[0].config.result == {'a': 4.5}
+                ok = ok and burst[0].latency > 0 and watcher.loader.parses == 5
+
+                write('b.conf', '{ b => }')
+                os.unlink(os.path.join(folder, 'a.conf'))
+                changed = wait_for(5)[3:]
+                ok = ok and len(changed) == 2 and all(e.config is None for e in changed)
+                ok = ok and {e.error.split(':')[0] for e in changed} == {'Файл удалён', 'Синтаксическая ошибка'}
+
+                write('c.conf', '{ c => 3.0 }')
+                created = wait_for(6)[5:]
+                ok = ok and len(created) == 1 and created[0].config.result == {'c': 3.0}
+            finally:
+                watcher.stop()
+                thread.join()
+            print(f"{'✓' if ok else '✗'} {watcher.backend}: серия записей - одна перезагрузка, "
+                  f"включения, ошибки, удаление и новый файл")
+            results.append(ok)
+
+    return all(results)
+
+
+def test_symbols():
+    """Тесты таблицы констант"""
+    print("\n=== ТЕСТЫ ТАБЛИЦЫ КОНСТАНТ ===")
+    results = []
+
+    # Константа через константу, в том числе через объявленную позже
+    text = ('(define base 8080.0)(define port $base$)(define alt $late$)(define late @"x")\n'
+            '{ a => $port$, b => { c => $alt$, d => $base$ } }')
+    parser = ConfigParser()
+    result = parser.parse(text)
+    ok = result == {'a': 8080.0, 'b': {'c': 'x', 'd': 8080.0}}
+    ok = ok and parser.constants == {'base': 8080.0, 'port': 8080.0, 'alt': 'x', 'late': 'x'}
+    ok = ok and parser.parse(text.encode('utf-8')) == result
+    ok = ok and ConfigParser().parse('(define b $a$){ x => $b$ }(define a 1.0)') == {'x': 1.0}
+    events = list(ConfigParser().iterparse(io.StringIO(text), depth=sys.maxsize))
+    ok = ok and events[0] == ((), 'a', 8080.0) and ((('b',), 'c', 'x')) in events
+    ok = ok and parse_lazy(text).to_dict() == result
+    print(f"{'✓' if ok else '✗'} Цепочки define во всех режимах разбора")
+    results.append(ok)
+
+    for bad, expected in (('(define a $b$)(define b $a$){ x => 1.0 }', 'Циклическое определение констант: a -> b -> a'),
+                          ('(define a $a$){}', 'Циклическое определение констант: a -> a'),
+                          ('(define a $nope$){}', 'Неопределённая константа: $nope$ (в define a)')):
+        try:
+            ConfigParser().parse(bad)
+            message = None
+        except SyntaxError as e:
+            message = e.msg
+        ok = message == expected
+        print(f"{'✓' if ok else '✗'} Ошибка: {message}")
+        results.append(ok)
+
+    # Неизвестная константа - ошибка и в значении, заменённом повторным ключом (как у исходного парсера)
+    text = '{ a => $nope$, a => 1.0 }'
+    messages = set()
+    for parse in (ConfigParser().parse, ConfigParser(max_errors=None).parse, LegacyConfigParser().parse,
+                  lambda t: parse_lazy(t).validate(), lambda t: IncrementalParser().parse(t)):
+        try:
+            parse(text)
+            messages.add(None)
+        except SyntaxError as e:
+            messages.add(e.msg)
+    inc = IncrementalParser()
+    inc.parse('{ a => 2.0, b => 1.0 }')
+    try:
+        inc.update('{ a => 2.0, b => $nope$, b => 1.0 }')
+        messages.add(None)
+    except SyntaxError as e:
+        messages.add(e.msg)
+    ok = messages == {'Неопределённая константа: $nope$'}
+    print(f"{'✓' if ok else '✗'} Неопределённая константа в заменённом значении: {messages}")
+    results.append(ok)
+
+    # Зависимости, места использования и пересчёт одной цепочки
+    parser = ConfigParser()
+    result = parser.parse('(define a 1.0)(define b $a$)(define c $b$)(define d 2.0)\n'
+                          '{ x => $c$, y => { z => $b$, w => $d$ }, v => $a$ }')
+    symbols = parser.symbols
+    ok = symbols.dependents('a') == ['b', 'c'] and symbols.dependents('d') == []
+    ok = ok and sorted(symbols.users('a')) == ['v', 'x', 'y.z'] and symbols.users('a', indirect=False) == ['v']
+    changes = symbols.update('a', 5.0)
+    ok = ok and sorted(changes) == [('v', 1.0, 5.0), ('x', 1.0, 5.0), ('y.z', 1.0, 5.0)]
+    ok = ok and result == {'x': 5.0, 'y': {'z': 5.0, 'w': 2.0}, 'v': 5.0} and symbols['c'] == 5.0
+    ok = ok and symbols.update('d', 2.0) == []
+    try:
+        symbols.update('a', _ConstRef('c'))
+        ok = False
+    except SyntaxError:
+        ok = ok and symbols['a'] == 5.0 and symbols['c'] == 5.0 and symbols.dependents('a') == ['b', 'c']
+    print(f"{'✓' if ok else '✗'} dependents, users и update только зависящих значений")
+    results.append(ok)
+
+    # Общая преамбула: разбирается один раз, свои define важнее
+    preamble = ConfigParser()
+    preamble.parse('(define host @"localhost")(define port 80.0)(define url $host$){}')
+    first = ConfigParser(preamble=preamble.symbols)
+    second = ConfigParser(preamble=preamble.symbols)
+    ok = first.parse('(define port 8080.0){ h => $url$, p => $port$ }') == {'h': 'localhost', 'p': 8080.0}
+    ok = ok and second.parse('{ p => $port$ }') == {'p': 80.0} and preamble.symbols['port'] == 80.0
+    ok = ok and first.constants['port'] == 8080.0 and first.constants['host'] == 'localhost'
+    ok = ok and second.parse('(define alias $port$){ a => $alias$ }') == {'a': 80.0}
+    events = list(ConfigParser(preamble=preamble.symbols).iterparse(io.StringIO('{ u => $url$ }')))
+    ok = ok and events == [((), 'u', 'localhost')]
+    print(f"{'✓' if ok else '✗'} Преамбула констант для нескольких разборов")
+    results.append(ok)
+
+    # Инкрементальный разбор и включения: правка базовой константы меняет цепочку
+    inc = IncrementalParser()
+    text = '(define a 1.0)(define b $a$)\n{ x => $b$, y => 3.0 }'
+    inc.parse(text)
+    result, changes = inc.update(text.replace('(define a 1.0)', '(define a 2.0)'))
+    ok = result == {'x': 2.0, 'y': 3.0} and changes == [('changed', 'x', 1.0, 2.0)]
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, 'base.inc'), 'w', encoding='utf-8') as f:
+            f.write('(define a 1.0)(define b $a$)')
+        with open(os.path.join(folder, 'main.conf'), 'w', encoding='utf-8') as f:
+            f.write('(include @"base.inc")(define c $b$){ x => $c$ }')
+        loaded = ConfigLoader().load(os.path.join(folder, 'main.conf'))
+        ok = ok and loaded.result == {'x': 1.0} and loaded.constants == {'c': 1.0, 'a': 1.0, 'b': 1.0}
+    print(f"{'✓' if ok else '✗'} Цепочки в инкрементальном разборе и через включения")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_errors():
+    """Тесты места ошибок и сбора нескольких ошибок"""
+    print("\n=== ТЕСТЫ МЕСТА ОШИБОК ===")
+    results = []
+
+    def error_of(func, *args):
+        try:
+            func(*args)
+        except SyntaxError as e:
+            return e
+        return None
+
+    text = '(define a 1.0)\n{\n\tключ => 1.0,\n  b => @"ё"\n}'
+    located = []
+    for source in (text, text.encode('utf-8')):
+        e = error_of(ConfigParser().parse, source)
+        located.append((e.msg, e.lineno, e.offset, e.text, str(e), e.snippet()))
+    ok = located[0] == located[1] and located[0][1:4] == (3, 2, '\tключ => 1.0,')
+    ok = ok and located[0][4] == 'Неправильный идентификатор: ключ (строка 3, столбец 2)'
+    ok = ok and located[0][5] == '    \tключ => 1.0,\n    \t^'
+    e = error_of(ConfigParser().parse, '{ a => @"ёж }\n')
+    ok = ok and (e.msg, e.lineno, e.offset) == ('Незакрытая строка', 1, 8)
+    e = error_of(ConfigParser().parse, '{ a => 1.0,\n  b => 2.0')
+    ok = ok and (e.msg, e.lineno) == ('Непарные фигурные скобки', 2)
+    print(f"{'✓' if ok else '✗'} Строка, столбец и фрагмент; str и байты совпадают")
+    results.append(ok)
+
+    # Ошибки подстановки находятся по имени константы
+    e = error_of(ConfigParser().parse, '{\n  a => 1.0,\n  b => $nope$\n}')
+    ok = (e.msg, e.lineno, e.offset) == ('Неопределённая константа: $nope$', 3, 8)
+    e = error_of(ConfigParser().parse, '{ x => 1.0 }\n(define a $b$)\n(define b $a$)')
+    ok = ok and e.msg.startswith('Циклическое определение') and (e.lineno, e.offset) == (2, 1)
+    print(f"{'✓' if ok else '✗'} Место неопределённой константы и цикла define")
+    results.append(ok)
+
+    # Потоковый разбор: текста уже нет в памяти, файл перечитывается только при ошибке
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bad.conf')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{\n' + 'k => 1.0,\n' * 300 + '  broken 2.0\n}')
+        outcomes = [error_of(ConfigParser().parse_file, path, 7),
+                    error_of(lambda: ConfigParser().parse_file(path, use_mmap=True)),
+                    error_of(lambda: list(ConfigParser().iterparse(path))),
+                    error_of(ConfigLoader().load, path)]
+        ok = all((e.lineno, e.offset, e.text, os.path.realpath(e.filename)) == (302, 10, '  broken 2.0', os.path.realpath(path))
+                 for e in outcomes)
+        e = error_of(compile_file, path)
+        ok = ok and e.filename == path and e.lineno == 302
+    parser = ConfigParser()
+    e = error_of(lambda: [parser.feed('{ a => 1.0 '), parser.feed('b => 2.0 }'), parser.close()])
+    ok = ok and e.lineno is None and e.pos == 11 and str(e) == 'Непонятное значение: b'
+    ok = ok and locate(e, '{ a => 1.0 b => 2.0 }').offset == 12
+    copy = pickle.loads(pickle.dumps(outcomes[0]))
+    ok = ok and (copy.msg, copy.lineno, copy.offset, copy.filename) == \
+        (outcomes[0].msg, 302, 10, outcomes[0].filename) and copy.errors[0] is copy
+    print(f"{'✓' if ok else '✗'} Файл блоками, mmap, iterparse, включения, feed и pickle")
+    results.append(ok)
+
+    # Сбор ошибок: после ошибки разбор продолжается с запятой или скобки
+    text = ('{\n  a => 1.0 b => 2.0,\n  ключ => 1.0,\n  c => { d => , e => 3.0 },\n'
+            '  (define 5 1.0)\n  f => $nope$,\n  g => { h => 1.0 }\n}')
+    e = error_of(ConfigParser(max_errors=None).parse, text)
+    found = [(err.msg.split(':')[0], err.lineno) for err in e.errors]
+    ok = found == [('Непонятное значение', 2), ('Неправильный идентификатор', 3), ('Непонятное значение', 4),
+                   ('Неправильное имя константы', 5), ('Неопределённая константа', 6)]
+    ok = ok and str(e).endswith('(и ещё ошибок: 4)') and e.report().count('^') == 5
+    e = error_of(ConfigParser(max_errors=2).parse, text)
+    ok = ok and len(e.errors) == 2 and e.errors[1].lineno == 3
+    e = error_of(ConfigParser(max_errors=None).parse, '{ a => , b => @"x }')
+    ok = ok and [err.msg for err in e.errors] == ['Непонятное значение: ,', 'Незакрытая строка']
+    e = error_of(ConfigParser(max_errors=None).parse, '(define a $b$)(define b $a$)(define c $x$){ y => $z$ }')
+    ok = ok and len(e.errors) == 3
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        ok = ok and ConfigParser(max_errors=None).parse_file(name) == ConfigParser().parse_file(name)
+    print(f"{'✓' if ok else '✗'} Сбор нескольких ошибок и тот же результат на верном тексте")
+    results.append(ok)
+
+    # Инкрементальный и ленивый разбор тоже указывают место
+    inc = IncrementalParser()
+    inc.parse('(define k 1.0)\n{\n  a => $k$,\n  b => 2.0\n}')
+    e = error_of(inc.update, '(define q 1.0)\n{\n  a => $k$,\n  b => 2.0\n}')
+    ok = e is not None and (e.lineno, e.offset) == (3, 8)
+    e = error_of(parse_lazy, '{\n  a => { b => 1.0 c => 2.0 },\n  d => 1.0\n}')
+    ok = ok and e is None
+    e = error_of(parse_lazy('{\n  a => { b => 1.0 c => 2.0 },\n  d => 1.0\n}').validate)
+    ok = ok and (e.lineno, e.offset) == (2, 19)
+    print(f"{'✓' if ok else '✗'} Инкрементальный и ленивый разбор")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_schema():
+    """Тесты разбора по схеме"""
+    print("\n=== ТЕСТЫ СХЕМЫ ===")
+    results = []
+
+    def error_of(func, *args):
+        try:
+            func(*args)
+        except SyntaxError as e:
+            return e
+        return None
+
+    schema = Schema({
+        'name': str,
+        'port': Field(int, min=1.0, max=65535.0),
+        'debug': Field(bool, default=False),
+        'mode': Field(str, default='fast', choices=['fast', 'safe']),
+        'limits': Section({'rps': Field(float, default=10.0)}),
+        'hosts': MapOf({'addr': str, 'weight': Field(int, default=1.0)}),
+        'extra': Field(dict, default={}),
+    })
+    text = ('(define p 8080.0)\n{\n  name => @"api",\n  port => $p$,\n'
+            '  hosts => { main => { addr => @"10.0.0.1" } },\n  extra => { any => { thing => 1.0 } }\n}')
+    config = schema.parse(text)
+    ok = (config.name, config.port, config.debug, config.mode, config.limits.rps) == ('api', 8080, False, 'fast', 10.0)
+    ok = ok and type(config.port) is int and config.hosts['main'].weight == 1 and config['extra'] == {'any': {'thing': 1.0}}
+    ok = ok and not hasattr(config, '__dict__') and config.to_dict() == {
+        'name': 'api', 'port': 8080, 'debug': False, 'mode': 'fast', 'limits': {'rps': 10.0},
+        'hosts': {'main': {'addr': '10.0.0.1', 'weight': 1}}, 'extra': {'any': {'thing': 1.0}}}
+    ok = ok and schema.parse(text.encode('utf-8')) == config
+    ok = ok and schema.decode(ConfigParser().parse(text)) == config
+    print(f"{'✓' if ok else '✗'} Типы, умолчания, секции, MapOf и объекты с __slots__")
+    results.append(ok)
+
+    # Ошибки схемы указывают ключ и место значения в тексте
+    cases = [
+        ('{\n  name => @"a",\n  port => 0.0\n}', 'Ключ port: 0 меньше 1.0', 3, 11),
+        ('{\n  name => @"a",\n  port => 1.5\n}', 'Ключ port: ожидалось целое число, получено 1.5', 3, 11),
+        ('{ name => 5.0, port => 1.0 }', 'Ключ name: ожидалось значение вида «строка», получено число 5.0', 1, 11),
+        ('{ name => @"a", port => 1.0, mode => @"slow" }',
+         "Ключ mode: недопустимое значение 'slow' (допустимо: fast, safe)", 1, 38),
+        ('{ name => @"a", port => { } }', 'Ключ port: ожидалось значение вида «целое число», получен словарь', 1, 25),
+        ('{ name => @"a", port => 1.0, zz => 1.0 }', 'Неизвестный ключ: zz', 1, 36),
+        ('{ port => 1.0 }', 'Нет обязательного ключа: name', 1, 1),
+        ('{ name => @"a", port => 1.0, hosts => { h => { } } }', 'Нет обязательного ключа: hosts.h.addr', 1, 46),
+        ('(define p @"x")\n{ name => @"a",\n  port => $p$ }', 'Ключ port: ожидалось значение вида «целое число», '
+         'получено строка @"x"', 3, 11),
+    ]
+    for source, message, line, column in cases:
+        e = error_of(schema.parse, source)
+        ok = e is not None and (e.msg, e.lineno, e.offset) == (message, line, column)
+        print(f"{'✓' if ok else '✗'} Ошибка: {message}")
+        results.append(ok)
+
+    # Сбор ошибок: синтаксические и ошибки схемы вместе, неверный ключ не считается отсутствующим
+    e = error_of(schema.parse, '{ port => 0.0, zz => 1.0, name => 5.0 b => 1.0, hosts => { h => { } } }', None)
+    ok = e is not None and [err.msg.split(':')[0] for err in e.errors] == [
+        'Ключ port', 'Неизвестный ключ', 'Ключ name', 'Нет обязательного ключа']
+    ok = ok and e.errors[-1].msg.endswith('hosts.h.addr')
+    print(f"{'✓' if ok else '✗'} Сбор ошибок схемы вместе с синтаксическими")
+    results.append(ok)
+
+    # Пропуск неизвестных ключей: словари под ними не строятся, ссылки в них не подставляются
+    skipping = Schema(Section({'key': float}, unknown='skip'))
+    config = skipping.parse('(define c 2.0)\n{ key => $c$, other => { deep => { x => $c$ } }, tail => @"t" }')
+    ok = config.to_dict() == {'key': 2.0}
+    # Схема на весь файл, поток и файл блоками дают одно и то же
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'app.conf')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        ok = ok and schema.parse_file(path) == schema.parse(text)
+        parser = schema.parser()
+        for i in range(0, len(text), 7):
+            parser.feed(text[i:i + 7])
+        ok = ok and parser.close() == schema.parse(text)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{\n  name => @"a",\n  port => 99999.0\n}')
+        e = error_of(schema.parse_file, path)
+        ok = ok and e is not None and (e.filename, e.lineno, e.offset) == (path, 3, 11)
+    print(f"{'✓' if ok else '✗'} Пропуск неизвестных ключей, поток и файл блоками")
+    results.append(ok)
+
+    # Реальные примеры: свободные словари разбираются так же, как без схемы
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        tree = ConfigParser().parse_file(name)
+        loose = Schema(Section({key: Field(dict) if isinstance(value, dict) else type(value)
+                                for key, value in tree.items()}))
+        ok = loose.parse_file(name).to_dict() == tree
+        print(f"{'✓' if ok else '✗'} {name} по схеме")
+        results.append(ok)
+
+    # Ошибки самой схемы - при её построении
+    ok = True
+    try:
+        Schema({'items': str})
+        ok = False
+    except ValueError:
+        pass
+    try:
+        Field(list)
+        ok = False
+    except TypeError:
+        pass
+    print(f"{'✓' if ok else '✗'} Неверное описание схемы")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_threads():
+    """Стресс-тест: много потоков разбирают разные тексты одним экземпляром"""
+    print("\n=== ТЕСТЫ МНОГОПОТОЧНОГО РАЗБОРА ===")
+    results = []
+
+    def config(i):
+        return (f'(define name @"svc_{i}")\n(define port {8000 + i}.0)\n(define alias $name$)\n'
+                f'{{\n  id => {i}.0,\n  name => $alias$,\n  port => $port$,\n'
+                f'  nested => {{ deep => {{ level => {i % 7}.0, base => $base$ }} }}\n}}')
+
+    base = ConfigParser()
+    base.parse('(define base @"shared"){}')
+    parser = ConfigParser(preamble=base.symbols)
+    texts = [config(i) for i in range(64)]
+    expected = [ConfigParser(preamble=base.symbols).parse(text) for text in texts]
+    failures = []
+    start = threading.Barrier(16)
+
+    def worker(number):
+        start.wait()
+        for round_number in range(20):
+            i = (number * 5 + round_number) % len(texts)
+            text = texts[i]
+            try:
+                # Полный разбор, байты и feed() кусками; итоги разбора - свои у потока
+                if parser.parse(text) != expected[i] or parser.constants['port'] != 8000.0 + i:
+                    failures.append(('parse', i))
+                if parser.parse(text.encode('utf-8')) != expected[i]:
+                    failures.append(('bytes', i))
+                for offset in range(0, len(text), 11):
+                    parser.feed(text[offset:offset + 11])
+                if parser.close() != expected[i] or parser.symbols.users('name') != ['name']:
+                    failures.append(('feed', i))
+            except Exception as e:
+                failures.append((type(e).__name__, i))
+
+    # Частое переключение потоков, чтобы разборы перемежались внутри consume
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    ok = not failures
+    print(f"{'✓' if ok else '✗'} 16 потоков, один ConfigParser с общей преамбулой: parse, байты, feed/close")
+    results.append(ok)
+
+    ok = parser.parse_many(texts, jobs=8) == expected and parser.parse_many(texts, jobs=1) == expected
+    ok = ok and parser.parse_many([]) == []
+    broken = texts[:10] + ['{ a => }'] + texts[10:]
+    try:
+        parser.parse_many(broken, jobs=4)
+        ok = False
+    except SyntaxError as e:
+        ok = ok and e.msg == 'Непонятное значение: }' and e.lineno == 1
+    print(f"{'✓' if ok else '✗'} parse_many: порядок результатов и первая ошибка")
+    results.append(ok)
+
+    # Итоги разбора в одном потоке не видны в другом
+    seen = []
+    parser.parse(texts[3])
+    thread = threading.Thread(target=lambda: seen.append((parser.constants, parser.symbols)))
+    thread.start()
+    thread.join()
+    ok = seen == [({}, None)] and parser.constants['port'] == 8003.0
+    print(f"{'✓' if ok else '✗'} Итоги последнего разбора - свои у каждого потока")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_server():
+    """Тесты быстрого запуска CLI и режима --serve"""
+    print("\n=== ТЕСТЫ ЗАПУСКА CLI И СЕРВЕРА ===")
+    results = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    cli = os.path.join(here, 'cli.py')
+
+    converter = Converter()
+    answers = [json.loads(converter.handle(line)) for line in (
+        'example_server.conf\n',
+        json.dumps({'path': 'example_server.conf'}),
+        json.dumps({'text': '(define a 1.0)\n{ x => $a$ }'}),
+        json.dumps({'text': '{ x => 1.0 }\n{ y => 2.0 }', 'documents': True}),
+        json.dumps({'text': '{\n  x => }'}),
+        'missing.conf',
+        '{"text": 5}',
+    )]
+    expected = ConfigParser().parse_file('example_server.conf')
+    ok = answers[0] == answers[1] == {'result': expected} and answers[2] == {'result': {'x': 1.0}}
+    ok = ok and answers[3] == {'result': [{'x': 1.0}, {'y': 2.0}]}
+    ok = ok and answers[4] == {'error': 'Непонятное значение: } (строка 2, столбец 8)', 'line': 2, 'column': 8}
+    ok = ok and answers[5]['error'].startswith('Ошибка чтения файла') and answers[6]['error'].startswith('Неверный запрос')
+    ok = ok and converter.loader.parses == 1
+    converter.close()
+    print(f"{'✓' if ok else '✗'} Запросы: путь, JSON с path и text, документы, ошибки с местом")
+    results.append(ok)
+
+    out = io.StringIO()
+    serve_stream(io.StringIO('example_game.conf\n\n{"text": "{ a => @\\"b\\" }"}\n'), out)
+    lines = out.getvalue().splitlines()
+    ok = [json.loads(line) for line in lines] == [{'result': ConfigParser().parse_file('example_game.conf')},
+                                                 {'result': {'a': 'b'}}]
+    print(f"{'✓' if ok else '✗'} Строки запросов из потока, ответы по строке")
+    results.append(ok)
+
+    # Unix-сокет: несколько соединений одновременно, один общий загрузчик
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'conv.sock')
+        server = UnixServer(path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        replies = []
+
+        def client(name):
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.connect(path)
+                stream = sock.makefile('rwb')
+                for _ in range(5):
+                    stream.write(name.encode('utf-8') + b'\n')
+                    stream.flush()
+                    replies.append((name, json.loads(stream.readline())))
+
+        try:
+            clients = [threading.Thread(target=client, args=(name,))
+                       for name in ('example_server.conf', 'example_app.conf') * 3]
+            for worker in clients:
+                worker.start()
+            for worker in clients:
+                worker.join()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        ok = len(replies) == 30 and all(reply == {'result': ConfigParser().parse_file(name)} for name, reply in replies)
+        ok = ok and server.converter.loader.parses == 2 and not os.path.exists(path)
+    print(f"{'✓' if ok else '✗'} Unix-сокет: 6 соединений, каждый файл разобран один раз")
+    results.append(ok)
+
+    # Процесс cli.py: --serve через каналы и быстрый путь без argparse
+    run = subprocess.run([sys.executable, cli, '--serve'], input='example_app.conf\n{"text": "{ }"}\n',
+                         capture_output=True, text=True, encoding='utf-8', cwd=here)
+    ok = run.returncode == 0 and [json.loads(line) for line in run.stdout.splitlines()] == [
+        {'result': ConfigParser().parse_file('example_app.conf')}, {'result': {}}]
+    probe = ('import sys, io, contextlib; import cli\n'
+             'with contextlib.redirect_stdout(io.StringIO()): code = cli.quick_main(["--input", "example_game.conf"])\n'
+             'heavy = ("argparse", "concurrent.futures", "pstats", "cache", "batch", "watch", "compiled", "hashlib")\n'
+             'print(code, [name for name in heavy if name in sys.modules])')
+    run = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, cwd=here)
+    ok = ok and run.stdout.strip() == '0 []'
+    quick = subprocess.run([sys.executable, cli, '--input', 'example_game.conf', '--compact'],
+                           capture_output=True, text=True, encoding='utf-8', cwd=here)
+    full = subprocess.run([sys.executable, cli, '--input', 'example_game.conf', '--compact', '--max-errors', '1'],
+                          capture_output=True, text=True, encoding='utf-8', cwd=here)
+    ok = ok and quick.returncode == 0 and quick.stdout == full.stdout
+    ok = ok and json.loads(quick.stdout) == ConfigParser().parse_file('example_game.conf')
+    with tempfile.TemporaryDirectory() as folder:
+        broken = os.path.join(folder, 'broken.conf')
+        with open(broken, 'w', encoding='utf-8') as f:
+            f.write('{\n  Bad => 1.0\n}')
+        run = subprocess.run([sys.executable, cli, '--input', broken], capture_output=True, text=True,
+                             encoding='utf-8', cwd=here)
+        ok = ok and run.returncode == 1 and 'строка 2, столбец 3' in run.stderr
+    print(f"{'✓' if ok else '✗'} cli.py: --serve в процессе, быстрый путь без тяжёлых модулей")
+    results.append(ok)
+
+    # Запуск самого parser.py: json импортируется лениво, пример разбирается
+    run = subprocess.run([sys.executable, os.path.join(here, 'parser.py')], capture_output=True, text=True,
+                         encoding='utf-8', cwd=here)
+    ok = run.returncode == 0 and run.stdout.startswith('✅') and '"port": 8080.0' in run.stdout
+    print(f"{'✓' if ok else '✗'} python parser.py: встроенный пример без NameError")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_columnar():
+    """Тесты столбцового представления однородных секций"""
+    print("\n=== ТЕСТЫ СТОЛБЦОВОГО ЭКСПОРТА ===")
+    results = []
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def plain(tree):
+        if isinstance(tree, Table):
+            return tree.to_dict()
+        if isinstance(tree, dict):
+            return {key: plain(value) for key, value in tree.items()}
+        return tree
+
+    def same(text, **options):
+        # Сравниваем и порядок ключей: JSON-текст, а не словари
+        expected = json.dumps(ConfigParser().parse(text))
+        return json.dumps(plain(parse_columnar(text, **options))) == expected
+
+    # Примеры: enemies - таблица, остальное - как у ConfigParser.parse
+    ok = True
+    for name in ('example_server.conf', 'example_game.conf', 'example_app.conf'):
+        with open(os.path.join(here, name), encoding='utf-8') as f:
+            ok = ok and same(f.read())
+    game = load_columnar(os.path.join(here, 'example_game.conf'), numpy=False)
+    enemies = game['enemies']
+    ok = ok and isinstance(enemies, Table) and isinstance(game['player'], dict)
+    ok = ok and enemies.names == ['zombie', 'boss'] and enemies.fields == ('health', 'damage', 'speed')
+    ok = ok and enemies.column('health').tolist() == [50.0, 500.0] and enemies.position('boss') == 1
+    ok = ok and enemies['boss'] == {'health': 500.0, 'damage': 25.0, 'speed': 3.0} and 'zombie' in enemies
+    ok = ok and repr(enemies) == 'Table(2 секций, поля: health, damage, speed)'
+    print(f"{'✓' if ok else '✗'} Примеры: однородные секции - Table, остальное без изменений")
+    results.append(ok)
+
+    # Что таблицей не становится: другие поля, порядок, нечисловые значения, повторы
+    text = ('(define hp 7.5)(define name @"x")\n{\n'
+            '  a => { p => { x => 1.0, y => 2.0 }, q => { x => $hp$, y => 4.0 } },\n'
+            '  b => { p => { x => 1.0, y => 2.0 }, q => { y => 4.0, x => 3.0 } },\n'
+            '  c => { p => { x => 1.0 }, q => { x => $name$ } },\n'
+            '  d => { p => { x => 1.0 }, q => { x => 2.0, x => 5.0 }, r => { x => 3.0 } },\n'
+            '  e => { p => { x => 1.0 }, p => { x => 2.0 } },\n'
+            '  f => { p => { x => 1.0 }, q => { x => { y => 1.0 } } },\n'
+            '  g => { p => { x => 1.0 } }\n}')
+    tree = parse_columnar(text)
+    kinds = {key: type(value).__name__ for key, value in tree.items()}
+    ok = kinds == {'a': 'Table', 'b': 'dict', 'c': 'dict', 'd': 'Table', 'e': 'dict', 'f': 'dict', 'g': 'dict'}
+    ok = ok and tree['a'].column('x').tolist() == [1.0, 7.5] and tree['d']['q'] == {'x': 5.0}
+    ok = ok and same(text) and same(text, min_rows=1) and same(text, min_rows=3)
+    ok = ok and isinstance(parse_columnar(text, min_rows=1)['g'], Table)
+    ok = ok and isinstance(parse_columnar('{ a => { x => 1.0 }, b => { x => 2.0 } }'), Table)
+    print(f"{'✓' if ok else '✗'} Однородность: те же числовые поля в том же порядке, min_rows")
+    results.append(ok)
+
+    # Случайные тексты: то же дерево, что у ConfigParser.parse
+    rnd = random.Random(24)
+
+    def section(fields, depth):
+        pairs = []
+        for field in fields:
+            roll = rnd.random()
+            value = (f'{rnd.randint(-9, 9)}.5' if roll < 0.8 else '$p$' if roll < 0.9
+                     else '$s$' if roll < 0.95 else 'true')
+            pairs.append(f'{field} => {value}')
+        if depth < 3 and rnd.random() < 0.05:
+            pairs.append('z => ' + tree_text(depth + 1))
+        return '{ ' + ', '.join(pairs) + ' }'
+
+    def tree_text(depth):
+        fields = rnd.sample('abcd', rnd.randint(1, 3))
+        pairs = []
+        for _ in range(rnd.randint(0, 4)):
+            key = rnd.choice('abcdef')
+            if depth < 3 and rnd.random() < 0.6:
+                own = list(fields)
+                if rnd.random() < 0.1:
+                    rnd.shuffle(own)
+                if rnd.random() < 0.1:
+                    own = own[:-1]
+                pairs.append(f'{key} => ' + section(own, depth))
+            else:
+                pairs.append(f'{key} => ' + rnd.choice(('1.5', '$p$', '@"v"', tree_text(depth + 1) if depth < 3 else '{ }')))
+        return '{ ' + ', '.join(pairs) + ' }'
+
+    ok = all(same('(define p 3.5)(define s @"q")' + tree_text(0), min_rows=rnd.randint(1, 2)) for _ in range(1500))
+    print(f"{'✓' if ok else '✗'} 1500 случайных текстов совпадают с ConfigParser.parse")
+    results.append(ok)
+
+    # Источники: байты, feed по кускам, документы; ошибки с местом
+    parser = ColumnarParser(numpy=False)
+    source = '{ a => { x => 1.0, y => 2.0 }, b => { x => 3.0, y => 4.0 } }'
+    for i in range(0, len(source), 7):
+        parser.feed(source[i:i + 7])
+    streamed = parser.close()
+    ok = streamed.to_dict() == parse_columnar(source.encode('utf-8')).to_dict() == ConfigParser().parse(source)
+    documents = parser.parse_documents(source + ' { c => 1.0 }')
+    ok = ok and isinstance(documents[0], Table) and documents[1] == {'c': 1.0}
+    errors = []
+    for broken in ('{ a => { x => $nope$ }, b => { x => 1.0 } }', '{ a => { x => 1.0 }, b => { x => 1.0 y => 2.0 } }'):
+        try:
+            parse_columnar(broken)
+        except SyntaxError as e:
+            errors.append((e.msg, e.lineno, e.offset))
+    ok = ok and errors == [('Неопределённая константа: $nope$', 1, 15), ('Непонятное значение: y', 1, 38)]
+    print(f"{'✓' if ok else '✗'} Байты, feed, документы; ошибки с местом")
+    results.append(ok)
+
+    # JSON: таблица - имена и столбцы; то же через cli.py --columnar
+    out = io.StringIO()
+    write_columnar(game, out, indent=None)
+    exported = json.loads(out.getvalue())
+    ok = exported['enemies'] == {'names': ['zombie', 'boss'], 'columns': {
+        'health': [50.0, 500.0], 'damage': [10.0, 25.0], 'speed': [2.0, 3.0]}}
+    ok = ok and exported['player'] == game['player']
+    run = subprocess.run([sys.executable, os.path.join(here, 'cli.py'), '--input', 'example_game.conf', '--columnar'],
+                         capture_output=True, text=True, encoding='utf-8', cwd=here)
+    ok = ok and run.returncode == 0 and json.loads(run.stdout) == exported
+    print(f"{'✓' if ok else '✗'} JSON-вывод столбцами и cli.py --columnar")
+    results.append(ok)
+
+    return all(results)
+
+
+def test_fuzz():
+    """Тесты генератора конфигураций и сверки путей разбора"""
+    print("\n=== ТЕСТЫ СВЕРКИ ПУТЕЙ РАЗБОРА ===")
+    results = []
+
+    # Генератор воспроизводим и даёт нужные крайние случаи
+    first, generator = ConfigGenerator(25), ConfigGenerator(25)
+    ok = [first.generate() for _ in range(3)] == [generator.generate() for _ in range(3)]
+    strings = signed = 0
+    for _ in range(300):
+        previous = None
+        try:
+            for kind, value, _ in tokenize(generator.generate()):
+                strings += kind == STRING and ('--[[' in value or 'C ' in value)
+                if kind == NUMBER and previous == WORD and value < 0:
+                    signed += 1
+                previous = kind
+        except SyntaxError:
+            pass
+    ok = ok and strings > 0 and signed > 0
+    print(f"{'✓' if ok else '✗'} Генератор: то же зерно - те же тексты, комментарии в строках, define со знаком")
+    results.append(ok)
+
+    with DifferentialRunner() as runner:
+        # Случаи, на которых пути разбора расходились с ConfigParser.parse
+        cases = [
+            '{ s => @"--[[ x ]] C y" }',
+            'C\n{ a => 1.0 }\nC',
+            '(define n -1.5)(define m +2.0){ a => $n$, b => $m$ }',
+            '{ a => 1.0 } --[[ открыт',
+            '{c=>0.٥\n',
+            '{c=>--[[]]{',
+            '{c=>--[[]]{s}',
+            '{$$$',
+            '{ a => $nope$, a => 1.0 }',
+            '{ a => { b => $nope$, b => 2.0 } }',
+            '{ x => { k => $$ }, t => { 0 } }',
+            '{ a => { x => 1.0 }, b => { x => $nope$ }, c => $other$ }',
+            '(define v $v$){ k => 0.0 ne }',
+        ]
+        differing = [(text, runner.check(text)) for text in cases]
+        differing = [(text, found) for text, found in differing if found]
+        ok = not differing
+        for text, found in differing:
+            print(f"  {text!r}: {[name for name, _, _ in found]}")
+        print(f"{'✓' if ok else '✗'} Найденные расхождения исправлены: {len(cases)} случаев, {len(ENGINES)} путей")
+        results.append(ok)
+
+        # Прогон по времени: каждый путь сверен, расхождений нет
+        report = runner.run(budget=2.0, seed=25)
+        ok = report.ok and report.cases > 100 and all(report.checks.values())
+        print(f"{'✓' if ok else '✗'} {report.summary()}")
+        results.append(ok)
+
+    # Исходный парсер: каждое намеренное отличие объясняется своим пунктом списка, прочие - расхождение
+    documented = [
+        ('{)}', 'key'),
+        ('{ c--[[ ]]k => 1.0 }', 'comments'),
+        ('C (define p 1.0)\n{ a => $p$ }', 'comments'),
+        ('(define --[[ порт ]] port 80.0) { p => $port$ }', 'comments'),
+        ('{ s => @"--[[ x ]]" }', 'strings'),
+        ('{ a => 1.0 } $', 'outside'),
+        ('(define x 1.0 junk) { a => $x$ }', 'define'),
+        ('(define a 1.0)(define b $a$) { v => $b$ }', 'define'),
+        ('{ a => 1.0 b => 2.0 }', 'messages'),
+        ('{ (include @"x") a => 1.0 }', 'include'),
+    ]
+    with DifferentialRunner({'legacy': ENGINES['legacy']}) as runner:
+        explained = []
+        for text, name in documented:
+            outcomes = []
+            for parser in (ConfigParser(), LegacyConfigParser()):
+                try:
+                    outcomes.append(('ok', parser.parse(text)))
+                except SyntaxError as e:
+                    outcomes.append(('error', e.msg))
+            explained.append(outcomes[0] != outcomes[1] and legacy_difference(text, *outcomes) == name
+                             and not runner.check(text))
+        ok = all(explained) and not runner.check('(define n -1.5)(define s @"x") { a => $n$, b => { c => $s$ } }')
+        report = runner.run(budget=1.0, seed=25)
+        ok = ok and report.ok and report.checks['legacy'] > 100 and set(report.allowed) <= {
+            'messages', 'key', 'comments', 'strings', 'outside', 'define', 'include'}
+
+    def extra(text, folder):
+        return dict(LegacyConfigParser().parse(text), extra=1.0)
+
+    # Отличие не из списка - расхождение, даже у пути с именем legacy
+    with DifferentialRunner({'legacy': extra}) as runner:
+        ok = ok and [name for name, _, _ in runner.check('{ a => 1.0 }')] == ['legacy']
+    print(f"{'✓' if ok else '✗'} Исходный парсер: {len(documented)} намеренных отличий, прочее - расхождение; "
+          f"{report.summary()}")
+    results.append(ok)
+
+    # Сжатие: путь, который вырезает C-комментарии и внутри строк, сводится к короткому тексту
+    def broken(text, folder):
+        return ConfigParser().parse(re.sub(r'C[ \t][^\n]*', '', text))
+
+    with DifferentialRunner({'broken': broken}) as runner:
+        report = runner.run(budget=5.0, seed=25, max_mismatches=1)
+        found = report.mismatches[0] if report.mismatches else None
+        ok = found is not None and len(found.text) < len(found.original) and len(found.text) <= 12
+        ok = ok and runner.differs('broken', found.text) and 'C' in found.text
+    print(f"{'✓' if ok else '✗'} Сжатие расхождения: {found.text if found else None!r}")
+    results.append(ok)
+
+    return all(results)
+
+
 def main():
     """Основная функция тестирования"""
     print("ЗАПУСК ТЕСТОВ ДЛЯ ПАРСЕРА КОНФИГУРАЦИЙ (ВАРИАНТ 16)")
@@ -189,6 +2071,29 @@ def main():
         ("Константы", test_constants),
         ("Крайние случаи", test_edge_cases),
         ("Реальные примеры", test_real_examples),
+        ("Лексер", test_lexer),
+        ("Потоковый разбор", test_streaming),
+        ("Байтовый источник", test_bytes_source),
+        ("Кэш", test_cache),
+        ("Инкрементальный разбор", test_incremental),
+        ("Пакетный режим", test_batch),
+        ("Асинхронная загрузка", test_async_loader),
+        ("Компактное дерево", test_compact),
+        ("Ленивый разбор", test_lazy),
+        ("Индекс путей", test_index),
+        ("Набор замеров", test_benchmark_suite),
+        ("Статистика разбора", test_stats),
+        ("Скомпилированный формат", test_compiled),
+        ("JSON-вывод", test_json_output),
+        ("Документы и включения", test_include),
+        ("Слежение за файлами", test_watch),
+        ("Таблица констант", test_symbols),
+        ("Место ошибок", test_errors),
+        ("Схема", test_schema),
+        ("Многопоточный разбор", test_threads),
+        ("Запуск CLI и сервер", test_server),
+        ("Столбцовый экспорт", test_columnar),
+        ("Сверка путей разбора", test_fuzz),
     ]
 
     for suite_name, suite_func in test_suites:
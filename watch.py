@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Слежение за конфигурациями (вариант 16)
+Изменения ловятся через inotify или опросом mtime, после паузы разбираются только изменённые файлы
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+import time
+
+import batch
+from include import ConfigLoader, _stamp
+
+# Пауза после последней записи перед разбором, секунды
+DEBOUNCE = 0.1
+
+# Период опроса mtime и наибольшее время ожидания события, секунды
+INTERVAL = 0.5
+
+# Флаги inotify (linux/inotify.h)
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+            | _IN_CREATE | _IN_DELETE)
+
+
+class _Inotify:
+    """Каталоги под наблюдением inotify через libc (только Linux)
+
+    Следим за каталогами, а не за файлами: редакторы часто сохраняют
+    файл через запись копии и переименование, и слежение за самим файлом
+    на этом теряется. Содержимое событий не разбирается: какой файл
+    изменился, выясняет проверка отметок после паузы.
+    """
+
+    def __init__(self):
+        name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(name, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._folders = set()
+
+    def watch(self, folder):
+        """Добавляем каталог; исчезнувший каталог пропускается"""
+        if folder not in self._folders and self._add_watch(self.fd, os.fsencode(folder), _IN_MASK) >= 0:
+            self._folders.add(folder)
+
+    def wait(self, timeout):
+        """Ждём событий до timeout секунд; True, если они были (очередь вычитывается)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ReloadEvent:
+    """Результат перезагрузки одного файла
+
+    config - LoadedConfig или None при ошибке, error - текст ошибки,
+    latency - секунды от последней записи в файл или его включения до
+    готового результата (включая паузу debounce); при первой загрузке -
+    время разбора, для удалённого файла - от обнаружения удаления.
+    """
+    __slots__ = ('path', 'config', 'error', 'latency')
+
+    def __init__(self, path, config, error, latency):
+        self.path = path
+        self.config = config
+        self.error = error
+        self.latency = latency
+
+    def __repr__(self):
+        state = self.error if self.error is not None else 'ok'
+        return f"ReloadEvent({self.path!r}, {state}, {self.latency * 1000:.1f} мс)"
+
+
+class ConfigWatcher:
+    """Перезагрузка конфигураций при изменении файлов
+
+    inputs - файлы, каталоги (обходятся рекурсивно, новые .conf
+    подхватываются) и шаблоны, как в пакетном режиме CLI. Первый запуск
+    загружает все файлы, дальше на каждую серию записей, после которой
+    debounce секунд не было изменений, перезагружаются только файлы,
+    которые изменились сами или через включения; остальные берутся из
+    кэша ConfigLoader. callback получает ReloadEvent; удалённый файл
+    приходит событием с config=None.
+
+    backend: 'auto' - inotify, если доступен, иначе опрос; 'inotify';
+    'poll' - сравнение mtime и размера раз в interval секунд.
+    """
+
+    def __init__(self, inputs, callback, debounce=DEBOUNCE, interval=INTERVAL,
+                 backend='auto', loader=None):
+        if backend not in ('auto', 'inotify', 'poll'):
+            raise ValueError(f"Неизвестный способ слежения: {backend}")
+        self.inputs = list(inputs)
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.loader = loader if loader is not None else ConfigLoader()
+        self.reloads = 0
+        self._roots = []
+        self._deps = {}
+        self._stamps = {}
+        self._written = {}
+        self._stop = threading.Event()
+
+        self._inotify = None
+        if backend != 'poll':
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                if backend == 'inotify':
+                    raise
+        self.backend = 'inotify' if self._inotify is not None else 'poll'
+
+    def run(self):
+        """Загружаем все файлы и следим за ними до stop()"""
+        try:
+            self._reload(self._scan(), initial=True)
+            if self._inotify is not None:
+                self._run_inotify()
+            else:
+                self._run_poll()
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def stop(self):
+        """Останавливаем run(); можно вызывать из другого потока и из callback"""
+        self._stop.set()
+
+    def _run_inotify(self):
+        """События inotify: после паузы без событий - проверка файлов"""
+        last = None
+        while not self._stop.is_set():
+            if last is None:
+                timeout = self.interval
+            else:
+                timeout = max(0.0, last + self.debounce - time.monotonic())
+            if self._inotify.wait(timeout):
+                last = time.monotonic()
+            elif last is not None and time.monotonic() - last >= self.debounce:
+                last = None
+                self._reload(self._scan())
+
+    def _run_poll(self):
+        """Опрос mtime: изменения копятся, пока файлы продолжают меняться"""
+        pending = set()
+        last = 0.0
+        while not self._stop.wait(min(self.interval, self.debounce) if pending else self.interval):
+            changed = self._scan()
+            if changed:
+                pending |= changed
+                last = time.monotonic()
+            elif pending and time.monotonic() - last >= self.debounce:
+                self._reload(pending)
+                pending = set()
+
+    def _scan(self):
+        """Сравниваем отметки всех файлов под наблюдением; возвращает изменившиеся пути"""
+        roots = [os.path.realpath(path) for path, _ in batch.expand_inputs(self.inputs)]
+        files = set(roots)
+        for root in roots:
+            files |= self._deps.get(root, set())
+        # Пропавшие корневые файлы тоже считаются изменёнными
+        files |= set(self._roots)
+        self._roots = roots
+
+        now = time.time()
+        changed = set()
+        for path in files:
+            try:
+                stamp = _stamp(path)
+            except OSError:
+                stamp = None
+            if path not in self._stamps or self._stamps[path] != stamp:
+                self._stamps[path] = stamp
+                self._written[path] = stamp[0] / 1e9 if stamp is not None else now
+                changed.add(path)
+        if self._inotify is not None:
+            self._watch_folders(files)
+        return changed
+
+    def _watch_folders(self, files):
+        """Каталоги файлов и каталоги-входы со всеми подкаталогами"""
+        for path in files:
+            self._inotify.watch(os.path.dirname(path))
+        for item in self.inputs:
+            if os.path.isdir(item):
+                for folder, _, _ in os.walk(item):
+                    self._inotify.watch(os.path.realpath(folder))
+
+    def _reload(self, changed, initial=False):
+        """Перезагружаем корневые файлы, затронутые изменениями changed"""
+        roots = set(self._roots)
+        for path in sorted(changed):
+            if path in self._deps and path not in roots:
+                # Корневой файл удалён или больше не подходит под входы
+                del self._deps[path]
+                self._emit(ReloadEvent(path, None, "Файл удалён", time.time() - self._written[path]))
+
+        for root in self._roots:
+            deps = self._deps.get(root)
+            if deps is not None and not (deps & changed):
+                continue
+            started = time.time()
+            try:
+                config = self.loader.load(root)
+                error = None
+            except SyntaxError as e:
+                config, error = None, f"Синтаксическая ошибка: {e}"
+            except (OSError, UnicodeDecodeError) as e:
+                config, error = None, f"Ошибка чтения файла: {e}"
+            # После ошибки следим и за прежними включениями, чтобы заметить исправление
+            self._deps[root] = self.loader.dependencies(root) | (deps or set())
+            for path in self._deps[root]:
+                if path not in self._stamps:
+                    try:
+                        self._stamps[path] = _stamp(path)
+                    except OSError:
+                        self._stamps[path] = None
+            # Первая загрузка - время разбора, дальше - от последней записи
+            if initial:
+                written = started
+            else:
+                written = max((self._written[path] for path in (deps or {root}) & changed), default=started)
+            latency = time.time() - written
+            self._emit(ReloadEvent(root, config, error, max(0.0, latency)))
+
+    def _emit(self, event):
+        """Отдаём событие в callback"""
+        self.reloads += 1
+        self.callback(event)
+